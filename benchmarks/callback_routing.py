@@ -0,0 +1,156 @@
+"""
+Микробенчмарк маршрутизации callback запросов
+
+Сравнивает прежнюю регистрацию обработчиков с фильтрами F.data == ... и
+F.data.startswith(...), которые проверяются по очереди, с таблицей
+CallbackDispatcher по коду действия. Обработчики пустые, поэтому измеряется
+только путь обновления через Dispatcher: FSM, фильтры и вызов обработчика.
+
+Запуск из корня проекта:
+    python -m benchmarks.callback_routing --updates 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_workdir = tempfile.mkdtemp(prefix="bench_callbacks_")
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", os.path.join(_workdir, "bot.log"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, F, Router  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, Message, Update, User  # noqa: E402
+
+from filters.admin_filter import AdminFilter  # noqa: E402
+from keyboards import callbacks as cb  # noqa: E402
+from routers.dispatch import CallbackDispatcher  # noqa: E402
+from states.admin_states import BanState, BroadcastState, UnbanState  # noqa: E402
+from states.quote_states import DeleteConfirmationState  # noqa: E402
+
+USER_ID = 1
+QUOTE_ID = "zen_-4611686018427387904"
+
+# Обработчики в порядке регистрации в routers/commands.py и routers/admin.py:
+# (роутер, фильтр прежнего формата, фабрика, доп. фильтр, пример прежних данных)
+ROUTES = [
+    ("commands", F.data.startswith("set_language_"), cb.SetLanguage, None, "set_language_en"),
+    ("commands", F.data.startswith("add_favorite_"), cb.AddFavorite, None, f"add_favorite_{QUOTE_ID}"),
+    ("commands", F.data.startswith("remove_favorite_"), cb.RemoveFavorite, None, f"remove_favorite_{QUOTE_ID}"),
+    ("commands", F.data.startswith("favorites_page_"), cb.FavoritesPage, None, "favorites_page_2"),
+    ("commands", F.data == "get_another_quote", cb.AnotherQuote, None, "get_another_quote"),
+    ("commands", F.data.startswith("already_favorite_"), cb.AlreadyFavorite, None, f"already_favorite_{QUOTE_ID}"),
+    ("commands", F.data.startswith("confirm_delete_"), cb.ConfirmDelete,
+     DeleteConfirmationState.waiting_for_confirmation, None),
+    ("commands", F.data == "cancel_delete", cb.CancelDelete, DeleteConfirmationState.waiting_for_confirmation, None),
+    ("commands", F.data == "clear_all_favorites", cb.ClearAllFavorites, None, "clear_all_favorites"),
+    ("commands", F.data == "confirm_clear_all", cb.ConfirmClearAll,
+     DeleteConfirmationState.waiting_for_clear_all_confirmation, None),
+    ("commands", F.data == "cancel_clear_all", cb.CancelClearAll,
+     DeleteConfirmationState.waiting_for_clear_all_confirmation, None),
+    ("admin", F.data == "admin_main", cb.AdminMain, None, "admin_main"),
+    ("admin", F.data == "admin_stats", cb.AdminStats, None, "admin_stats"),
+    ("admin", F.data == "admin_users", cb.AdminUsers, None, "admin_users"),
+    ("admin", F.data.startswith("admin_users_page_"), cb.AdminUsersPage, "admin", "admin_users_page_fav_all_1"),
+    ("admin", F.data == "admin_users_noop", cb.AdminUsersNoop, None, "admin_users_noop"),
+    ("admin", F.data == "admin_clear_cache", cb.AdminClearCache, None, "admin_clear_cache"),
+    ("admin", F.data == "admin_broadcast", cb.AdminBroadcast, None, "admin_broadcast"),
+    ("admin", F.data == "confirm_broadcast", cb.ConfirmBroadcast, BroadcastState.waiting_for_confirmation, None),
+    ("admin", F.data == "cancel_broadcast", cb.CancelBroadcast, BroadcastState.waiting_for_confirmation, None),
+    ("admin", F.data == "edit_broadcast", cb.EditBroadcast, BroadcastState.waiting_for_confirmation, None),
+    ("admin", F.data == "admin_bans", cb.AdminBans, None, "admin_bans"),
+    ("admin", F.data == "admin_ban_user", cb.AdminBanUser, None, "admin_ban_user"),
+    ("admin", F.data.startswith("confirm_ban_"), cb.ConfirmBan, BanState.waiting_for_confirmation, None),
+    ("admin", F.data == "cancel_ban", cb.CancelBan, BanState.waiting_for_confirmation, None),
+    ("admin", F.data == "admin_unban_user", cb.AdminUnbanUser, None, "admin_unban_user"),
+    ("admin", F.data.startswith("confirm_unban_"), cb.ConfirmUnban, UnbanState.waiting_for_confirmation, None),
+    ("admin", F.data == "cancel_unban", cb.CancelUnban, UnbanState.waiting_for_confirmation, None),
+    ("admin", F.data == "admin_banned_list", cb.AdminBannedList, None, "admin_banned_list"),
+]
+
+
+async def _noop_handler(callback: CallbackQuery) -> None:
+    return None
+
+
+def _extra_filters(extra):
+    if extra is None:
+        return ()
+    if extra == "admin":
+        return (AdminFilter([USER_ID]),)
+    return (extra,)
+
+
+def _build_dispatcher(compact: bool) -> Dispatcher:
+    """Dispatcher с пустыми обработчиками в прежнем или компактном формате"""
+    dispatcher = Dispatcher(storage=MemoryStorage())
+    routers = {"commands": Router(name="commands"), "admin": Router(name="admin")}
+    tables = {name: CallbackDispatcher(router) for name, router in routers.items()} if compact else {}
+
+    for router_name, legacy_filter, factory, extra, _ in ROUTES:
+        if compact:
+            tables[router_name].route(factory, *_extra_filters(extra))(_noop_handler)
+        else:
+            routers[router_name].callback_query(legacy_filter, *_extra_filters(extra))(_noop_handler)
+
+    dispatcher.include_router(routers["commands"])
+    dispatcher.include_router(routers["admin"])
+    return dispatcher
+
+
+def _make_update(update_id: int, data: str) -> Update:
+    user = User(id=USER_ID, is_bot=False, first_name="Bench")
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=USER_ID, type="private"), text="-")
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(id=str(update_id), from_user=user, chat_instance="bench",
+                                     message=message, data=data)
+    )
+
+
+async def _measure(dispatcher: Dispatcher, bot: Bot, updates, count: int) -> float:
+    """Среднее время маршрутизации одного callback в микросекундах"""
+    start = time.perf_counter()
+    for index in range(count):
+        await dispatcher.feed_update(bot, updates[index % len(updates)])
+    return (time.perf_counter() - start) / count * 1_000_000
+
+
+async def main(count: int) -> None:
+    bot = Bot("0:bench")
+
+    # Нажатия кнопок, доступных без состояния FSM (как в обычной работе бота)
+    legacy_data = [data for *_, data in ROUTES if data]
+    compact_data = [cb.upgrade_legacy(data) for data in legacy_data]
+    legacy_updates = [_make_update(index, data) for index, data in enumerate(legacy_data)]
+    compact_updates = [_make_update(index, data) for index, data in enumerate(compact_data)]
+
+    legacy = _build_dispatcher(compact=False)
+    compact = _build_dispatcher(compact=True)
+
+    # Прогрев обоих вариантов
+    await _measure(legacy, bot, legacy_updates, len(legacy_updates) * 10)
+    await _measure(compact, bot, compact_updates, len(compact_updates) * 10)
+
+    legacy_us = await _measure(legacy, bot, legacy_updates, count)
+    compact_us = await _measure(compact, bot, compact_updates, count)
+    await bot.session.close()
+
+    legacy_len = sum(len(data.encode()) for data in legacy_data) / len(legacy_data)
+    compact_len = sum(len(data.encode()) for data in compact_data) / len(compact_data)
+
+    print(f"callbacks={count} actions={len(legacy_data)}")
+    print(f"sequential F.data filters: {legacy_us:8.1f} us/callback, {legacy_len:5.1f} bytes of data")
+    print(f"CallbackDispatcher:        {compact_us:8.1f} us/callback, {compact_len:5.1f} bytes of data")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20000, help="Количество callback запросов")
+    args = parser.parse_args()
+    asyncio.run(main(args.updates))
@@ -0,0 +1,101 @@
+"""
+Микробенчмарк накладных расходов middleware на одно обновление
+
+Сравнивает прежнюю цепочку UserManagementMiddleware -> LoggingMiddleware ->
+ThrottlingMiddleware с объединенным ContextMiddleware. Хранилище создается
+во временной директории, рабочие файлы бота не затрагиваются.
+
+Запуск из корня проекта:
+    python -m benchmarks.middleware_overhead --updates 20000 --users 500
+"""
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_workdir = tempfile.mkdtemp(prefix="bench_middleware_")
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", os.path.join(_workdir, "bot.log"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.types import Chat, Message, User  # noqa: E402
+
+from middlewares.context import ContextMiddleware  # noqa: E402
+from middlewares.logger import LoggingMiddleware, ThrottlingMiddleware  # noqa: E402
+from middlewares.user_management import UserManagementMiddleware  # noqa: E402
+
+# Лимиты, которые не срабатывают: измеряется только стоимость проверки
+UNLIMITED = {"message": (1e9, 1e9), "callback": (1e9, 1e9)}
+
+
+async def _noop_handler(event, data):
+    return None
+
+
+def _build_chain(middlewares):
+    """Цепочка middleware в том же порядке вызова, что и в aiogram"""
+    handler = _noop_handler
+    for middleware in reversed(middlewares):
+        handler = functools.partial(middleware, handler)
+    return handler
+
+
+def _make_messages(users: int):
+    """Сообщения от разных пользователей (команда /help без отдельного лимита)"""
+    return [
+        Message(
+            message_id=user_id,
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=User(id=user_id, is_bot=False, first_name=f"User{user_id}", username=f"user{user_id}"),
+            text="/help"
+        )
+        for user_id in range(1, users + 1)
+    ]
+
+
+async def _measure(chain, messages, updates: int) -> float:
+    """Среднее время одного обновления в микросекундах"""
+    start = time.perf_counter()
+    for index in range(updates):
+        await chain(messages[index % len(messages)], {})
+    return (time.perf_counter() - start) / updates * 1_000_000
+
+
+async def main(updates: int, users: int) -> None:
+    os.chdir(_workdir)
+    messages = _make_messages(users)
+
+    separate = _build_chain([
+        UserManagementMiddleware(),
+        LoggingMiddleware(),
+        ThrottlingMiddleware(limits=UNLIMITED),
+    ])
+    fused = _build_chain([
+        ContextMiddleware(ThrottlingMiddleware(limits=UNLIMITED), LoggingMiddleware()),
+    ])
+
+    # Прогрев: регистрация всех пользователей и загрузка кэшей
+    for message in messages:
+        await separate(message, {})
+        await fused(message, {})
+
+    separate_us = await _measure(separate, messages, updates)
+    fused_us = await _measure(fused, messages, updates)
+
+    print(f"updates={updates} users={users} storage={_workdir}")
+    print(f"separate middlewares: {separate_us:8.1f} us/update")
+    print(f"ContextMiddleware:    {fused_us:8.1f} us/update")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20000, help="Количество обновлений")
+    parser.add_argument("--users", type=int, default=500, help="Количество разных пользователей")
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.users))
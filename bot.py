@@ -5,11 +5,31 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
 from config import BOT_TOKEN
-from routers import commands, admin
-from utils.logger import logger
+from routers import commands, admin, inline
+from routers.dispatch import get_registered_commands
+from utils.logger import logger, stop_logging
+from utils.analytics import flush_analytics, analytics_flush_scheduler, set_known_commands
+from utils.user_management import ban_expiry_scheduler, flush_users, users_flush_scheduler
+from utils.subscriptions import flush_subscriptions, subscriptions_flush_scheduler
 from middlewares.logger import LoggingMiddleware, ThrottlingMiddleware
-from middlewares.user_management import UserManagementMiddleware
-from config.settings import RATE_LIMIT
+from middlewares.context import ContextMiddleware
+from middlewares.metrics import MetricsMiddleware
+from middlewares.tracing import (
+    TracingMiddleware, TracedMiddleware, HandlerTracingMiddleware, BotApiTracingMiddleware
+)
+from config.settings import (
+    RATE_LIMIT, THROTTLE_MESSAGE_BURST, THROTTLE_CALLBACK_BURST,
+    THROTTLE_CALLBACK_RATE, THROTTLE_INLINE_BURST, THROTTLE_INLINE_RATE, THROTTLE_COMMAND_LIMITS,
+    RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_REDIS_URL,
+    TRACE_ENABLED, METRICS_ENABLED, METRICS_HOST, METRICS_PORT,
+    LOOP_WATCHDOG_ENABLED, LOOP_LAG_THRESHOLD_MS
+)
+from utils.rate_limiter import create_rate_limiter
+from utils.watchdog import start_loop_watchdog
+from utils.task_queue import background_tasks
+from services.metrics_server import start_metrics_server
+from services.daily_quotes import daily_quote_scheduler
+from services.broadcast import broadcast_engine
 
 
 async def set_commands(bot: Bot):
@@ -20,6 +40,8 @@ async def set_commands(bot: Bot):
         BotCommand(command="quote", description="Get a random inspirational quote"),
         BotCommand(command="favorites", description="View favorite quotes"),
         BotCommand(command="language", description="Change interface language"),
+        BotCommand(command="subscribe", description="Daily quote at a set time (HH:MM [timezone])"),
+        BotCommand(command="unsubscribe", description="Stop daily quotes"),
     ]
     
     await bot.set_my_commands(commands)
@@ -33,19 +55,80 @@ async def main():
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
     
-    # Подключение middleware
-    dp.message.middleware(UserManagementMiddleware())
-    dp.callback_query.middleware(UserManagementMiddleware())
-    dp.message.middleware(LoggingMiddleware())
-    dp.callback_query.middleware(LoggingMiddleware())
-    dp.message.middleware(ThrottlingMiddleware(rate_limit=RATE_LIMIT))
+    # Метрики: количество и время обработки обновлений по типу
+    if METRICS_ENABLED:
+        dp.update.outer_middleware(MetricsMiddleware())
+    
+    # Трассировка обновлений: ID трассы, этапы middleware, обработчика и вызовов Bot API
+    if TRACE_ENABLED:
+        dp.update.outer_middleware(TracingMiddleware())
+        bot.session.middleware(BotApiTracingMiddleware())
+    
+    # Один экземпляр на сообщения, callback и inline-запросы, чтобы корзины были общими
+    rate_limiter = create_rate_limiter(
+        RATE_LIMIT_BACKEND,
+        sqlite_path=RATE_LIMIT_SQLITE_PATH,
+        redis_url=RATE_LIMIT_REDIS_URL
+    )
+    throttling = ThrottlingMiddleware(
+        limits={
+            "message": (THROTTLE_MESSAGE_BURST, 1.0 / RATE_LIMIT),
+            "callback": (THROTTLE_CALLBACK_BURST, THROTTLE_CALLBACK_RATE),
+            "inline": (THROTTLE_INLINE_BURST, THROTTLE_INLINE_RATE),
+        },
+        command_limits=THROTTLE_COMMAND_LIMITS,
+        backend=rate_limiter
+    )
+    # Бан, регистрация, логирование и антиспам за один проход
+    # (обертка TracedMiddleware вне трассы ничего не делает)
+    context_middleware = TracedMiddleware(ContextMiddleware(throttling, LoggingMiddleware()))
+    dp.message.middleware(context_middleware)
+    dp.callback_query.middleware(context_middleware)
+    dp.inline_query.middleware(context_middleware)
+    dp.message.middleware(HandlerTracingMiddleware())
+    dp.callback_query.middleware(HandlerTracingMiddleware())
+    dp.inline_query.middleware(HandlerTracingMiddleware())
     
     # Регистрация роутеров
     dp.include_router(commands.router)
     dp.include_router(admin.router)
+    dp.include_router(inline.router)
+    # Аналитика по командам ведется только для зарегистрированных команд
+    set_known_commands(get_registered_commands(dp))
     # Логирование старта бота
     logger.info("Bot is starting...")
-    logger.info(f"Rate limiting enabled: {RATE_LIMIT} seconds between messages")
+    logger.info(
+        f"Rate limiting enabled: {RATE_LIMIT} seconds between messages "
+        f"(burst {THROTTLE_MESSAGE_BURST:g}), {THROTTLE_CALLBACK_RATE:g} callbacks/s "
+        f"(burst {THROTTLE_CALLBACK_BURST:g}), backend: {RATE_LIMIT_BACKEND}"
+    )
+    
+    # Фоновое снятие временных банов
+    ban_scheduler_task = asyncio.create_task(ban_expiry_scheduler())
+    
+    # Периодическое сохранение скетчей DAU/WAU/MAU, пользователей и подписок вне обработки событий
+    analytics_flush_task = asyncio.create_task(analytics_flush_scheduler())
+    users_flush_task = asyncio.create_task(users_flush_scheduler())
+    subscriptions_flush_task = asyncio.create_task(subscriptions_flush_scheduler())
+    
+    # Цитата дня по подпискам
+    daily_quote_task = asyncio.create_task(daily_quote_scheduler(bot))
+    
+    # Воркеры фоновых задач обработчиков (запись избранного после ответа на нажатие)
+    background_tasks.start()
+    
+    # Замер задержки event loop и захват стека при блокировке
+    watchdog_task = None
+    if LOOP_WATCHDOG_ENABLED:
+        watchdog_task = start_loop_watchdog(LOOP_LAG_THRESHOLD_MS / 1000)
+    
+    # Эндпоинт /metrics
+    metrics_runner = None
+    if METRICS_ENABLED:
+        try:
+            metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            logger.error(f"Failed to start metrics server on {METRICS_HOST}:{METRICS_PORT}: {e}")
     
     try:
         # Установка команд бота
@@ -56,6 +139,23 @@ async def main():
     except Exception as e:
         logger.error(f"Error occurred: {e}")
     finally:
+        ban_scheduler_task.cancel()
+        analytics_flush_task.cancel()
+        users_flush_task.cancel()
+        subscriptions_flush_task.cancel()
+        daily_quote_task.cancel()
+        if watchdog_task:
+            watchdog_task.cancel()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        # Останавливаем незавершенную рассылку (итоги остаются в сообщении администратора)
+        await broadcast_engine.shutdown()
+        # Дожидаемся поставленных в очередь изменений избранного
+        await background_tasks.stop()
+        await rate_limiter.close()
+        flush_analytics()
+        flush_users()
+        flush_subscriptions()
         await bot.session.close()
 
 
@@ -65,4 +165,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except KeyboardInterrupt:
-        logger.info("Bot stopped by user")
\ No newline at end of file
+        logger.info("Bot stopped by user")
+    finally:
+        # Дописываем оставшиеся в очереди записи лога
+        stop_logging()
\ No newline at end of file
@@ -13,9 +13,90 @@ QUOTABLE_API_URL = "https://api.quotable.io"
 # Настройки логирования
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")  # size или time
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Размер файла для ротации по размеру
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))  # Количество архивных файлов
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")  # Период для ротации по времени
+
+
+def _parse_sampling(value: str) -> dict:
+    """Разбор строки вида "logger.name=0.1,other=0.5" """
+    sampling = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            try:
+                sampling[name.strip()] = float(rate)
+            except ValueError:
+                pass
+    return sampling
+
+
+# Доля INFO-записей, которые пишутся для горячих логгеров (WARNING и выше пишутся всегда).
+# По умолчанию сэмплируются только логгеры *.access с записями о каждом запросе,
+# события вроде бана или регистрации пишутся всегда
+LOG_SAMPLING = _parse_sampling(os.getenv(
+    "LOG_SAMPLING",
+    "utils.storage.access=0.1,services.api_client.access=0.2"
+))
+
+# Трассировка обновлений (JSON-строки со временем этапов обработки), по умолчанию выключена
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_BACKUP_COUNT = int(os.getenv("TRACE_BACKUP_COUNT", "3"))
+TRACE_SLOW_UPDATE_MS = float(os.getenv("TRACE_SLOW_UPDATE_MS", "1000"))  # Предупреждение о медленных обновлениях
+
+# Метрики в формате Prometheus (локальный HTTP-эндпоинт /metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Контроль задержки event loop: при блокировке дольше порога в лог пишется стек
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "200"))
+
+# Inline-режим (поиск цитат через @bot запрос)
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "30"))  # Сколько Telegram и бот кэшируют результаты (сек)
+INLINE_RESULTS_PER_PAGE = int(os.getenv("INLINE_RESULTS_PER_PAGE", "20"))  # Результатов в ответе (не больше 50)
+INLINE_MAX_RESULTS = int(os.getenv("INLINE_MAX_RESULTS", "100"))  # Максимум результатов на запрос
+INLINE_RESULT_CACHE_SIZE = int(os.getenv("INLINE_RESULT_CACHE_SIZE", "1000"))  # Запросов в кэше результатов
+
+# Максимум цитат в одной команде /quote N
+QUOTE_BATCH_MAX = int(os.getenv("QUOTE_BATCH_MAX", "5"))
+
+# Массовая отправка (цитата дня, рассылки): общий лимит с запасом до ~30 сообщений/сек Bot API
+DELIVERY_RATE = float(os.getenv("DELIVERY_RATE", "25"))  # Сообщений в секунду
+DELIVERY_CONCURRENCY = int(os.getenv("DELIVERY_CONCURRENCY", "10"))  # Одновременных запросов
+DELIVERY_CHAT_INTERVAL = float(os.getenv("DELIVERY_CHAT_INTERVAL", "1.0"))  # Интервал сообщений в один чат (сек)
+DAILY_QUOTE_BATCH_SIZE = int(os.getenv("DAILY_QUOTE_BATCH_SIZE", "10"))  # Разных цитат на одну минуту доставки
+
+# Фоновые задачи обработчиков (запись избранного и т.п.)
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))  # Одновременно выполняемых задач
+
+# Рассылка администратора (общий лимит DELIVERY_RATE)
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "20"))  # Одновременных запросов рассылки
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))  # Период обновления прогресса (сек)
 
 # Настройки администраторов
 ADMIN_IDS = os.getenv("ADMIN_IDS", "")  # Список ID админов через запятую
 
 # Настройки middleware
 RATE_LIMIT = float(os.getenv("RATE_LIMIT", "1.0"))  # Ограничение частоты запросов (сек)
+
+# Корзины токенов: (burst, токенов в секунду)
+THROTTLE_MESSAGE_BURST = float(os.getenv("THROTTLE_MESSAGE_BURST", "3"))  # Сообщений подряд без ожидания
+THROTTLE_CALLBACK_BURST = float(os.getenv("THROTTLE_CALLBACK_BURST", "5"))  # Нажатий подряд без ожидания
+THROTTLE_CALLBACK_RATE = float(os.getenv("THROTTLE_CALLBACK_RATE", "2.0"))  # Нажатий в секунду в среднем
+THROTTLE_INLINE_BURST = float(os.getenv("THROTTLE_INLINE_BURST", "10"))  # Inline-запросов подряд (набор текста)
+THROTTLE_INLINE_RATE = float(os.getenv("THROTTLE_INLINE_RATE", "3.0"))  # Inline-запросов в секунду в среднем
+
+# Дополнительные лимиты для отдельных команд
+THROTTLE_COMMAND_LIMITS = {
+    "quote": (3.0, 0.5),
+}
+
+# Хранилище лимитов: memory (один процесс), sqlite (процессы на одном хосте) или redis
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "storage/rate_limits.sqlite3")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
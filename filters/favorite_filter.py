@@ -4,6 +4,7 @@
 from typing import Dict, Any
 from aiogram import types
 from aiogram.filters import Filter
+from keyboards.callbacks import AddFavorite, RemoveFavorite, action_code
 from utils.storage import is_quote_in_favorites
 
 
@@ -31,11 +32,11 @@ class FavoriteFilter(Filter):
             bool: True если условие выполнено, False в противном случае
         """
         try:
-            if not callback.data or not callback.data.startswith('add_favorite_'):
+            if not callback.data or action_code(callback.data) != AddFavorite.__prefix__:
                 return False
             
             # Извлекаем ID цитаты из callback данных
-            quote_id = callback.data.replace('add_favorite_', '')
+            quote_id = AddFavorite.unpack(callback.data).quote_id
             user_id = callback.from_user.id
             
             # Проверяем, есть ли цитата в избранном
@@ -66,7 +67,7 @@ class RemoveFavoriteFilter(Filter):
         """
         try:
             return bool(callback.data and 
-                        callback.data.startswith('remove_favorite_'))
+                        action_code(callback.data) == RemoveFavorite.__prefix__)
         except Exception:
             return False
 
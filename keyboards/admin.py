@@ -1,8 +1,12 @@
 """
 Клавиатуры для административных команд
+
+Подписи админ-панели не локализованы, поэтому клавиатуры кэшируются
+с пустым кодом языка: меню строятся один раз, остальные - по параметрам.
 """
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from utils.localization import get_text
+from keyboards import callbacks as cb
+from keyboards.cache import cached_keyboard
 
 
 def get_admin_main_keyboard(user_id: int = 0) -> InlineKeyboardMarkup:
@@ -15,31 +19,36 @@ def get_admin_main_keyboard(user_id: int = 0) -> InlineKeyboardMarkup:
     Returns:
         InlineKeyboardMarkup: Главная админ-клавиатура
     """
+    return cached_keyboard("admin_main", "", "", (), _build_admin_main_keyboard)
+
+
+def _build_admin_main_keyboard() -> InlineKeyboardMarkup:
+    """Построение главной админ-клавиатуры"""
     buttons = [
         [
             InlineKeyboardButton(
                 text="📊 Статистика",
-                callback_data="admin_stats"
+                callback_data=cb.AdminStats().pack()
             ),
             InlineKeyboardButton(
                 text="👥 Пользователи",
-                callback_data="admin_users"
+                callback_data=cb.AdminUsers().pack()
             )
         ],
         [
             InlineKeyboardButton(
                 text="📢 Рассылка",
-                callback_data="admin_broadcast"
+                callback_data=cb.AdminBroadcast().pack()
             ),
             InlineKeyboardButton(
                 text="🚫 Управление банами",
-                callback_data="admin_bans"
+                callback_data=cb.AdminBans().pack()
             )
         ],
         [
             InlineKeyboardButton(
                 text="🗑️ Очистить кэш",
-                callback_data="admin_clear_cache"
+                callback_data=cb.AdminClearCache().pack()
             )
         ]
     ]
@@ -57,23 +66,55 @@ def get_broadcast_confirmation_keyboard(user_id: int = 0) -> InlineKeyboardMarku
     Returns:
         InlineKeyboardMarkup: Клавиатура подтверждения рассылки
     """
+    return cached_keyboard("broadcast_confirmation", "", "", (), _build_broadcast_confirmation_keyboard)
+
+
+def _build_broadcast_confirmation_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры подтверждения рассылки"""
     buttons = [
         [
             InlineKeyboardButton(
                 text="✅ Отправить рассылку",
-                callback_data="confirm_broadcast"
+                callback_data=cb.ConfirmBroadcast().pack()
             )
         ],
         [
             InlineKeyboardButton(
                 text="❌ Отменить",
-                callback_data="cancel_broadcast"
+                callback_data=cb.CancelBroadcast().pack()
             )
         ],
         [
             InlineKeyboardButton(
                 text="✏️ Изменить текст",
-                callback_data="edit_broadcast"
+                callback_data=cb.EditBroadcast().pack()
+            )
+        ]
+    ]
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_broadcast_progress_keyboard(user_id: int = 0) -> InlineKeyboardMarkup:
+    """
+    Клавиатура сообщения с прогрессом рассылки
+    
+    Args:
+        user_id: ID пользователя для локализации
+        
+    Returns:
+        InlineKeyboardMarkup: Клавиатура с кнопкой остановки рассылки
+    """
+    return cached_keyboard("broadcast_progress", "", "", (), _build_broadcast_progress_keyboard)
+
+
+def _build_broadcast_progress_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры прогресса рассылки"""
+    buttons = [
+        [
+            InlineKeyboardButton(
+                text="⏹ Остановить рассылку",
+                callback_data=cb.StopBroadcast().pack()
             )
         ]
     ]
@@ -91,29 +132,34 @@ def get_ban_management_keyboard(user_id: int = 0) -> InlineKeyboardMarkup:
     Returns:
         InlineKeyboardMarkup: Клавиатура управления банами
     """
+    return cached_keyboard("ban_management", "", "", (), _build_ban_management_keyboard)
+
+
+def _build_ban_management_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры управления банами"""
     buttons = [
         [
             InlineKeyboardButton(
                 text="🚫 Заблокировать пользователя",
-                callback_data="admin_ban_user"
+                callback_data=cb.AdminBanUser().pack()
             )
         ],
         [
             InlineKeyboardButton(
                 text="✅ Разблокировать пользователя",
-                callback_data="admin_unban_user"
+                callback_data=cb.AdminUnbanUser().pack()
             )
         ],
         [
             InlineKeyboardButton(
                 text="📋 Список заблокированных",
-                callback_data="admin_banned_list"
+                callback_data=cb.AdminBannedList().pack()
             )
         ],
         [
             InlineKeyboardButton(
                 text="⬅️ Назад",
-                callback_data="admin_main"
+                callback_data=cb.AdminMain().pack()
             )
         ]
     ]
@@ -132,22 +178,25 @@ def get_ban_confirmation_keyboard(user_id: int, target_user_id: int) -> InlineKe
     Returns:
         InlineKeyboardMarkup: Клавиатура подтверждения блокировки
     """
-    buttons = [
-        [
-            InlineKeyboardButton(
-                text="✅ Подтвердить блокировку",
-                callback_data=f"confirm_ban_{target_user_id}"
-            )
-        ],
-        [
-            InlineKeyboardButton(
-                text="❌ Отменить",
-                callback_data="cancel_ban"
-            )
+    def build() -> InlineKeyboardMarkup:
+        buttons = [
+            [
+                InlineKeyboardButton(
+                    text="✅ Подтвердить блокировку",
+                    callback_data=cb.ConfirmBan.of(target_user_id).pack()
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="❌ Отменить",
+                    callback_data=cb.CancelBan().pack()
+                )
+            ]
         ]
-    ]
+        
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
     
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return cached_keyboard("ban_confirmation", "", "", (target_user_id,), build)
 
 
 def get_unban_confirmation_keyboard(user_id: int, target_user_id: int) -> InlineKeyboardMarkup:
@@ -161,17 +210,104 @@ def get_unban_confirmation_keyboard(user_id: int, target_user_id: int) -> Inline
     Returns:
         InlineKeyboardMarkup: Клавиатура подтверждения разблокировки
     """
-    buttons = [
-        [
+    def build() -> InlineKeyboardMarkup:
+        buttons = [
+            [
+                InlineKeyboardButton(
+                    text="✅ Подтвердить разблокировку",
+                    callback_data=cb.ConfirmUnban.of(target_user_id).pack()
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="❌ Отменить",
+                    callback_data=cb.CancelUnban().pack()
+                )
+            ]
+        ]
+        
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+    
+    return cached_keyboard("unban_confirmation", "", "", (target_user_id,), build)
+
+
+def get_admin_users_keyboard(
+    user_id: int = 0,
+    sort: str = "fav",
+    user_filter: str = "all",
+    page: int = 0,
+    total_pages: int = 1
+) -> InlineKeyboardMarkup:
+    """
+    Клавиатура постраничного просмотра пользователей
+    
+    Args:
+        user_id: ID пользователя для локализации
+        sort: Текущий ключ сортировки ('fav', 'seen', 'msg')
+        user_filter: Текущий фильтр ('all', 'active', 'banned')
+        page: Текущая страница (начиная с 0)
+        total_pages: Общее количество страниц
+        
+    Returns:
+        InlineKeyboardMarkup: Клавиатура просмотра пользователей
+    """
+    return cached_keyboard(
+        "admin_users", "", "", (sort, user_filter, page, total_pages),
+        lambda: _build_admin_users_keyboard(sort, user_filter, page, total_pages)
+    )
+
+
+def _build_admin_users_keyboard(sort: str, user_filter: str, page: int, total_pages: int) -> InlineKeyboardMarkup:
+    """Построение клавиатуры просмотра пользователей"""
+    def mark(text: str, selected: bool) -> str:
+        return f"• {text}" if selected else text
+    
+    sort_buttons = [
+        InlineKeyboardButton(
+            text=mark(text, sort == key),
+            callback_data=cb.AdminUsersPage(sort=key, user_filter=user_filter, page=0).pack()
+        )
+        for key, text in (("fav", "⭐ Избранное"), ("seen", "🕒 Активность"), ("msg", "💬 Сообщения"))
+    ]
+    
+    filter_buttons = [
+        InlineKeyboardButton(
+            text=mark(text, user_filter == key),
+            callback_data=cb.AdminUsersPage(sort=sort, user_filter=key, page=0).pack()
+        )
+        for key, text in (("all", "Все"), ("active", "Активные"), ("banned", "🚫 Заблокированные"))
+    ]
+    
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(
             InlineKeyboardButton(
-                text="✅ Подтвердить разблокировку",
-                callback_data=f"confirm_unban_{target_user_id}"
+                text="⬅️",
+                callback_data=cb.AdminUsersPage(sort=sort, user_filter=user_filter, page=page - 1).pack()
             )
-        ],
+        )
+    nav_buttons.append(
+        InlineKeyboardButton(
+            text=f"{page + 1}/{max(total_pages, 1)}",
+            callback_data=cb.AdminUsersNoop().pack()
+        )
+    )
+    if page < total_pages - 1:
+        nav_buttons.append(
+            InlineKeyboardButton(
+                text="➡️",
+                callback_data=cb.AdminUsersPage(sort=sort, user_filter=user_filter, page=page + 1).pack()
+            )
+        )
+    
+    buttons = [
+        sort_buttons,
+        filter_buttons,
+        nav_buttons,
         [
             InlineKeyboardButton(
-                text="❌ Отменить",
-                callback_data="cancel_unban"
+                text="⬅️ Назад в админ-панель",
+                callback_data=cb.AdminMain().pack()
             )
         ]
     ]
@@ -189,11 +325,16 @@ def get_back_to_admin_keyboard(user_id: int = 0) -> InlineKeyboardMarkup:
     Returns:
         InlineKeyboardMarkup: Клавиатура возврата
     """
+    return cached_keyboard("back_to_admin", "", "", (), _build_back_to_admin_keyboard)
+
+
+def _build_back_to_admin_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры возврата"""
     buttons = [
         [
             InlineKeyboardButton(
                 text="⬅️ Назад в админ-панель",
-                callback_data="admin_main"
+                callback_data=cb.AdminMain().pack()
             )
         ]
     ]
@@ -0,0 +1,123 @@
+"""
+Кэш готовых inline клавиатур
+"""
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from utils.metrics import CACHE_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+KEYBOARD_CACHE_SIZE = 4096  # Максимум клавиатур с параметрами (ID цитат, страницы)
+
+# Ключ клавиатуры: (вид, язык, вариант, параметры)
+KeyboardKey = Tuple[str, str, str, Tuple[Hashable, ...]]
+
+
+class KeyboardCache:
+    """
+    Кэш построенных InlineKeyboardMarkup
+
+    Одна и та же клавиатура отправляется в разные сообщения. Модели aiogram
+    изменяемые (InlineKeyboardMarkup не frozen), поэтому возвращенную
+    клавиатуру нельзя менять: правка отразится во всех следующих сообщениях.
+    Для другой раскладки нужен отдельный variant. Клавиатуры без параметров
+    (выбор языка, меню админ-панели) строятся один раз на язык и не вытесняются,
+    клавиатуры с параметрами хранятся в LRU ограниченного размера.
+    """
+
+    def __init__(self, max_size: int = KEYBOARD_CACHE_SIZE):
+        """
+        Args:
+            max_size: Сколько клавиатур с параметрами держать в памяти
+        """
+        self.max_size = max_size
+        self.static: Dict[KeyboardKey, InlineKeyboardMarkup] = {}
+        self.dynamic: "OrderedDict[KeyboardKey, InlineKeyboardMarkup]" = OrderedDict()
+
+    def get(
+        self,
+        kind: str,
+        language: str,
+        variant: str,
+        params: Tuple[Hashable, ...],
+        builder: Callable[[], InlineKeyboardMarkup]
+    ) -> InlineKeyboardMarkup:
+        """
+        Получение клавиатуры из кэша или ее построение
+
+        Args:
+            kind: Вид клавиатуры (например, 'quote')
+            language: Код языка подписей ('' для нелокализованных клавиатур)
+            variant: Вариант клавиатуры (например, состояние избранного)
+            params: Параметры, от которых зависят кнопки
+            builder: Функция построения клавиатуры при промахе
+
+        Returns:
+            InlineKeyboardMarkup: Общая для всех вызовов клавиатура (не изменять)
+        """
+        key = (kind, language, variant, params)
+        store = self.dynamic if params else self.static
+
+        keyboard = store.get(key)
+        if keyboard is not None:
+            CACHE_REQUESTS_TOTAL.labels("keyboard", "hit").inc()
+            if params:
+                self.dynamic.move_to_end(key)
+            return keyboard
+
+        CACHE_REQUESTS_TOTAL.labels("keyboard", "miss").inc()
+        keyboard = builder()
+        store[key] = keyboard
+        if params and len(self.dynamic) > self.max_size:
+            self.dynamic.popitem(last=False)
+        return keyboard
+
+    def clear(self) -> None:
+        """Очистка кэша"""
+        self.static.clear()
+        self.dynamic.clear()
+        logger.info("Keyboard cache cleared")
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Статистика кэша
+
+        Returns:
+            Dict[str, int]: Количество статических и параметризованных клавиатур
+        """
+        return {
+            "static": len(self.static),
+            "dynamic": len(self.dynamic),
+            "max_size": self.max_size,
+        }
+
+
+# Глобальный кэш клавиатур
+keyboard_cache = KeyboardCache()
+
+
+def cached_keyboard(
+    kind: str,
+    language: str,
+    variant: str,
+    params: Tuple[Hashable, ...],
+    builder: Callable[[], InlineKeyboardMarkup]
+) -> InlineKeyboardMarkup:
+    """
+    Удобная функция получения клавиатуры из глобального кэша
+
+    Args:
+        kind: Вид клавиатуры
+        language: Код языка подписей
+        variant: Вариант клавиатуры
+        params: Параметры клавиатуры
+        builder: Функция построения клавиатуры
+
+    Returns:
+        InlineKeyboardMarkup: Клавиатура
+    """
+    return keyboard_cache.get(kind, language, variant, params, builder)
@@ -0,0 +1,359 @@
+"""
+Компактные callback data для inline кнопок
+
+Каждое действие - фабрика CallbackData с односимвольным префиксом (кодом
+действия), ID цитат и пользователей упаковываются в base62. Маршрутизация
+по коду действия - routers.dispatch.CallbackDispatcher.
+"""
+import re
+import string
+from typing import Annotated, Callable, Dict, Optional, Tuple, Type
+
+from aiogram.filters.callback_data import CallbackData
+from pydantic import AfterValidator
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+_BASE62_INDEX = {char: index for index, char in enumerate(BASE62_ALPHABET)}
+
+# ID цитат ZenQuotes: "zen_" + hash() текста (знаковое 64-битное число)
+_ZEN_QUOTE_ID = re.compile(r"zen_(-?)(\d+)")
+
+
+def encode_int(value: int) -> str:
+    """
+    Упаковка целого числа в base62
+
+    Args:
+        value: Число (отрицательные - с префиксом '-')
+
+    Returns:
+        str: Строка base62
+    """
+    if value < 0:
+        return "-" + encode_int(-value)
+    digits = []
+    while True:
+        value, remainder = divmod(value, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+        if not value:
+            return "".join(reversed(digits))
+
+
+def decode_int(text: str) -> int:
+    """
+    Распаковка целого числа из base62
+
+    Args:
+        text: Строка base62
+
+    Returns:
+        int: Число
+
+    Raises:
+        ValueError: Если строка не в формате base62
+    """
+    if text.startswith("-"):
+        return -decode_int(text[1:])
+    if not text:
+        raise ValueError("Empty base62 value")
+    value = 0
+    for char in text:
+        try:
+            value = value * 62 + _BASE62_INDEX[char]
+        except KeyError:
+            raise ValueError(f"Invalid base62 value: {text}")
+    return value
+
+
+def pack_quote_id(quote_id: str) -> str:
+    """
+    Упаковка ID цитаты: "zen_<число>" -> "z<base62>", прочие ID -> "~<ID>"
+
+    Args:
+        quote_id: ID цитаты
+
+    Returns:
+        str: Упакованный ID
+    """
+    match = _ZEN_QUOTE_ID.fullmatch(quote_id)
+    if match:
+        number = int(match.group(1) + match.group(2))
+        # Упаковываем, только если ID восстанавливается без изменений (нет ведущих нулей, "-0")
+        if f"zen_{number}" == quote_id:
+            return "z" + encode_int(number)
+    return "~" + quote_id
+
+
+def unpack_quote_id(packed: str) -> str:
+    """
+    Распаковка ID цитаты
+
+    Args:
+        packed: Упакованный ID
+
+    Returns:
+        str: Исходный ID цитаты
+
+    Raises:
+        ValueError: Если формат не распознан
+    """
+    if packed.startswith("z"):
+        return f"zen_{decode_int(packed[1:])}"
+    if packed.startswith("~"):
+        return packed[1:]
+    raise ValueError(f"Invalid packed quote ID: {packed}")
+
+
+def _check_packed_quote_id(packed: str) -> str:
+    """Проверка упакованного ID цитаты при распаковке callback data"""
+    unpack_quote_id(packed)
+    return packed
+
+
+def _check_packed_int(packed: str) -> str:
+    """Проверка числа base62 при распаковке callback data"""
+    decode_int(packed)
+    return packed
+
+
+# Поля с упакованными ID: некорректные значения отклоняются при unpack()
+PackedQuoteId = Annotated[str, AfterValidator(_check_packed_quote_id)]
+PackedInt = Annotated[str, AfterValidator(_check_packed_int)]
+
+
+class _QuoteAction:
+    """Действие над цитатой: упакованный ID в поле q"""
+
+    @classmethod
+    def of(cls, quote_id: str):
+        return cls(q=pack_quote_id(quote_id))
+
+    @property
+    def quote_id(self) -> str:
+        return unpack_quote_id(self.q)
+
+
+class _UserAction:
+    """Действие над пользователем: ID в base62 в поле u"""
+
+    @classmethod
+    def of(cls, user_id: int):
+        return cls(u=encode_int(user_id))
+
+    @property
+    def user_id(self) -> int:
+        return decode_int(self.u)
+
+
+# Избранное и цитаты
+
+class SetLanguage(CallbackData, prefix="L"):
+    language: str
+
+
+class AddFavorite(_QuoteAction, CallbackData, prefix="a"):
+    q: PackedQuoteId
+
+
+class RemoveFavorite(_QuoteAction, CallbackData, prefix="r"):
+    q: PackedQuoteId
+
+
+class AlreadyFavorite(_QuoteAction, CallbackData, prefix="f"):
+    q: PackedQuoteId
+
+
+class FavoritesPage(CallbackData, prefix="p"):
+    page: int
+
+
+class AnotherQuote(CallbackData, prefix="n"):
+    pass
+
+
+class ConfirmDelete(_QuoteAction, CallbackData, prefix="d"):
+    q: PackedQuoteId
+
+
+class CancelDelete(CallbackData, prefix="x"):
+    pass
+
+
+class ClearAllFavorites(CallbackData, prefix="c"):
+    pass
+
+
+class ConfirmClearAll(CallbackData, prefix="C"):
+    pass
+
+
+class CancelClearAll(CallbackData, prefix="X"):
+    pass
+
+
+# Админ-панель
+
+class AdminMain(CallbackData, prefix="m"):
+    pass
+
+
+class AdminStats(CallbackData, prefix="s"):
+    pass
+
+
+class AdminUsers(CallbackData, prefix="u"):
+    pass
+
+
+class AdminUsersPage(CallbackData, prefix="U"):
+    sort: str
+    user_filter: str
+    page: int
+
+
+class AdminUsersNoop(CallbackData, prefix="_"):
+    pass
+
+
+class AdminClearCache(CallbackData, prefix="k"):
+    pass
+
+
+class AdminBroadcast(CallbackData, prefix="b"):
+    pass
+
+
+class ConfirmBroadcast(CallbackData, prefix="B"):
+    pass
+
+
+class CancelBroadcast(CallbackData, prefix="y"):
+    pass
+
+
+class EditBroadcast(CallbackData, prefix="e"):
+    pass
+
+
+class StopBroadcast(CallbackData, prefix="S"):
+    pass
+
+
+class AdminBans(CallbackData, prefix="h"):
+    pass
+
+
+class AdminBanUser(CallbackData, prefix="j"):
+    pass
+
+
+class ConfirmBan(_UserAction, CallbackData, prefix="J"):
+    u: PackedInt
+
+
+class CancelBan(CallbackData, prefix="w"):
+    pass
+
+
+class AdminUnbanUser(CallbackData, prefix="o"):
+    pass
+
+
+class ConfirmUnban(_UserAction, CallbackData, prefix="O"):
+    u: PackedInt
+
+
+class CancelUnban(CallbackData, prefix="v"):
+    pass
+
+
+class AdminBannedList(CallbackData, prefix="l"):
+    pass
+
+
+# Все действия по коду (коды уникальны - проверяется при импорте)
+ACTIONS: Dict[str, Type[CallbackData]] = {}
+for _factory in (
+    SetLanguage, AddFavorite, RemoveFavorite, AlreadyFavorite, FavoritesPage, AnotherQuote,
+    ConfirmDelete, CancelDelete, ClearAllFavorites, ConfirmClearAll, CancelClearAll,
+    AdminMain, AdminStats, AdminUsers, AdminUsersPage, AdminUsersNoop, AdminClearCache,
+    AdminBroadcast, ConfirmBroadcast, CancelBroadcast, EditBroadcast, StopBroadcast, AdminBans, AdminBanUser,
+    ConfirmBan, CancelBan, AdminUnbanUser, ConfirmUnban, CancelUnban, AdminBannedList,
+):
+    if len(_factory.__prefix__) != 1 or _factory.__prefix__ in ACTIONS:
+        raise ValueError(f"Callback action code {_factory.__prefix__!r} of {_factory.__name__} is not unique")
+    ACTIONS[_factory.__prefix__] = _factory
+
+
+def action_code(data: str) -> str:
+    """
+    Код действия из callback data
+
+    Args:
+        data: Callback data
+
+    Returns:
+        str: Код действия (для прежнего формата - вся строка до первого ':')
+    """
+    return data.split(":", 1)[0]
+
+
+# Прежний формат callback data (кнопки в уже отправленных сообщениях)
+_LEGACY_EXACT: Dict[str, CallbackData] = {
+    "get_another_quote": AnotherQuote(),
+    "cancel_delete": CancelDelete(),
+    "clear_all_favorites": ClearAllFavorites(),
+    "confirm_clear_all": ConfirmClearAll(),
+    "cancel_clear_all": CancelClearAll(),
+    "admin_main": AdminMain(),
+    "admin_stats": AdminStats(),
+    "admin_users": AdminUsers(),
+    "admin_users_noop": AdminUsersNoop(),
+    "admin_clear_cache": AdminClearCache(),
+    "admin_broadcast": AdminBroadcast(),
+    "confirm_broadcast": ConfirmBroadcast(),
+    "cancel_broadcast": CancelBroadcast(),
+    "edit_broadcast": EditBroadcast(),
+    "admin_bans": AdminBans(),
+    "admin_ban_user": AdminBanUser(),
+    "cancel_ban": CancelBan(),
+    "admin_unban_user": AdminUnbanUser(),
+    "cancel_unban": CancelUnban(),
+    "admin_banned_list": AdminBannedList(),
+}
+
+_LEGACY_PREFIXES: Tuple[Tuple[str, Callable[[str], CallbackData]], ...] = (
+    ("set_language_", lambda value: SetLanguage(language=value)),
+    ("add_favorite_", AddFavorite.of),
+    ("remove_favorite_", RemoveFavorite.of),
+    ("already_favorite_", AlreadyFavorite.of),
+    ("favorites_page_", lambda value: FavoritesPage(page=int(value or "0"))),
+    ("confirm_delete_", ConfirmDelete.of),
+    ("admin_users_page_", lambda value: AdminUsersPage(
+        **dict(zip(("sort", "user_filter", "page"), value.split("_"))))),
+    ("confirm_ban_", lambda value: ConfirmBan.of(int(value))),
+    ("confirm_unban_", lambda value: ConfirmUnban.of(int(value))),
+)
+
+
+def upgrade_legacy(data: str) -> Optional[str]:
+    """
+    Перевод callback data прежнего формата в компактный
+
+    Args:
+        data: Callback data вида "add_favorite_<id>", "admin_main" и т.п.
+
+    Returns:
+        Optional[str]: Компактная callback data или None, если формат не распознан
+    """
+    callback_data = _LEGACY_EXACT.get(data)
+    if callback_data is not None:
+        return callback_data.pack()
+
+    for prefix, convert in _LEGACY_PREFIXES:
+        if data.startswith(prefix):
+            try:
+                return convert(data[len(prefix):]).pack()
+            except (TypeError, ValueError):
+                return None
+    return None
@@ -1,10 +1,15 @@
 """
 Inline клавиатуры для бота
+
+Клавиатуры берутся из кэша keyboards.cache: ключ - вид клавиатуры, язык
+подписей, вариант и параметры, а подписи переводятся только при построении.
 """
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from keyboards import callbacks as cb
+from keyboards.cache import cached_keyboard
 from utils.storage import is_quote_in_favorites
-from utils.localization import get_text, get_supported_languages
+from utils.localization import get_language_text, get_supported_languages, get_user_language
 
 
 def get_language_keyboard() -> InlineKeyboardMarkup:
@@ -14,6 +19,12 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
     Returns:
         InlineKeyboardMarkup: Клавиатура с языками
     """
+    # Названия языков не переводятся - клавиатура одна для всех
+    return cached_keyboard("language", "", "", (), _build_language_keyboard)
+
+
+def _build_language_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры выбора языка"""
     buttons = []
     
     # Получаем поддерживаемые языки
@@ -23,7 +34,7 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
         buttons.append([
             InlineKeyboardButton(
                 text=lang_name,
-                callback_data=f"set_language_{lang_code}"
+                callback_data=cb.SetLanguage(language=lang_code).pack()
             )
         ])
     
@@ -42,44 +53,84 @@ def get_quote_keyboard(quote_id: str, user_id: int, show_remove: bool = False) -
     Returns:
         InlineKeyboardMarkup: Клавиатура для цитаты
     """
-    buttons = []
+    # Состояние избранного проверяется при каждом вызове и выбирает вариант клавиатуры
+    if show_remove:
+        variant = "remove"
+    elif is_quote_in_favorites(user_id, quote_id):
+        variant = "already"
+    else:
+        variant = "add"
+    
+    language = get_user_language(user_id)
+    return cached_keyboard(
+        "quote", language, variant, (quote_id,),
+        lambda: _build_quote_keyboard(language, variant, quote_id)
+    )
+
+
+def get_new_quote_keyboard(quote_id: str, language: str) -> InlineKeyboardMarkup:
+    """
+    Клавиатура для только что полученной цитаты при массовой отправке
+    
+    В отличие от get_quote_keyboard не проверяет избранное (это чтение
+    хранилища на каждого получателя): кнопка всегда "добавить", повторное
+    добавление обработчик воспринимает как успешное.
+    
+    Args:
+        quote_id: ID цитаты
+        language: Код языка получателя
+        
+    Returns:
+        InlineKeyboardMarkup: Клавиатура для цитаты
+    """
+    return cached_keyboard(
+        "quote", language, "add", (quote_id,),
+        lambda: _build_quote_keyboard(language, "add", quote_id)
+    )
+
+
+def _build_quote_keyboard(language: str, variant: str, quote_id: str) -> InlineKeyboardMarkup:
+    """
+    Построение клавиатуры для цитаты
     
-    # Проверяем, есть ли цитата в избранном
-    is_favorite = is_quote_in_favorites(user_id, quote_id)
+    Args:
+        language: Код языка подписей
+        variant: 'add', 'already' или 'remove'
+        quote_id: ID цитаты
+        
+    Returns:
+        InlineKeyboardMarkup: Клавиатура для цитаты
+    """
+    buttons = []
     
     # Кнопка избранного
-    if is_favorite or show_remove:
-        if show_remove:
-            remove_text = get_text(user_id, "keyboard.remove_from_favorites")
-            buttons.append([
-                InlineKeyboardButton(
-                    text=remove_text,
-                    callback_data=f"remove_favorite_{quote_id}"
-                )
-            ])
-        else:
-            already_text = get_text(user_id, "keyboard.already_in_favorites")
-            buttons.append([
-                InlineKeyboardButton(
-                    text=already_text,
-                    callback_data=f"already_favorite_{quote_id}"
-                )
-            ])
+    if variant == "remove":
+        buttons.append([
+            InlineKeyboardButton(
+                text=get_language_text(language, "keyboard.remove_from_favorites"),
+                callback_data=cb.RemoveFavorite.of(quote_id).pack()
+            )
+        ])
+    elif variant == "already":
+        buttons.append([
+            InlineKeyboardButton(
+                text=get_language_text(language, "keyboard.already_in_favorites"),
+                callback_data=cb.AlreadyFavorite.of(quote_id).pack()
+            )
+        ])
     else:
-        add_text = get_text(user_id, "keyboard.add_to_favorites")
         buttons.append([
             InlineKeyboardButton(
-                text=add_text,
-                callback_data=f"add_favorite_{quote_id}"
+                text=get_language_text(language, "keyboard.add_to_favorites"),
+                callback_data=cb.AddFavorite.of(quote_id).pack()
             )
         ])
     
     # Кнопка "Еще цитата"
-    another_text = get_text(user_id, "keyboard.another_quote")
     buttons.append([
         InlineKeyboardButton(
-            text=another_text,
-            callback_data="get_another_quote"
+            text=get_language_text(language, "keyboard.another_quote"),
+            callback_data=cb.AnotherQuote().pack()
         )
     ])
     
@@ -101,21 +152,50 @@ def get_favorites_navigation_keyboard(
         quotes_on_page: Цитаты на текущей странице
         user_id: ID пользователя для локализации
         
+    Returns:
+        InlineKeyboardMarkup: Клавиатура с кнопками навигации
+    """
+    # Кнопки зависят только от ID цитат на странице, а не от их текста
+    quote_ids = tuple(
+        quote.get('_id') or quote.get('id', '')
+        for quote in quotes_on_page or []
+    )
+    language = get_user_language(user_id)
+    return cached_keyboard(
+        "favorites", language, "", (current_page, total_pages, quote_ids),
+        lambda: _build_favorites_navigation_keyboard(language, current_page, total_pages, quote_ids)
+    )
+
+
+def _build_favorites_navigation_keyboard(
+    language: str,
+    current_page: int,
+    total_pages: int,
+    quote_ids: Tuple[str, ...]
+) -> InlineKeyboardMarkup:
+    """
+    Построение клавиатуры навигации по избранным цитатам
+    
+    Args:
+        language: Код языка подписей
+        current_page: Текущая страница (начиная с 0)
+        total_pages: Общее количество страниц
+        quote_ids: ID цитат на странице в порядке вывода
+        
     Returns:
         InlineKeyboardMarkup: Клавиатура с кнопками навигации
     """
     buttons = []
     
     # Кнопки удаления цитат (если есть цитаты на странице)
-    if quotes_on_page:
-        remove_text = get_text(user_id, "keyboard.remove_quote")
-        for i, quote in enumerate(quotes_on_page):
-            quote_id = quote.get('_id') or quote.get('id', '')
+    if quote_ids:
+        remove_text = get_language_text(language, "keyboard.remove_quote")
+        for i, quote_id in enumerate(quote_ids):
             if quote_id:
                 buttons.append([
                     InlineKeyboardButton(
                         text=f"{remove_text} {i + 1}",
-                        callback_data=f"remove_favorite_{quote_id}"
+                        callback_data=cb.RemoveFavorite.of(quote_id).pack()
                     )
                 ])
     
@@ -123,20 +203,18 @@ def get_favorites_navigation_keyboard(
     nav_buttons = []
     
     if current_page > 0:
-        prev_text = get_text(user_id, "keyboard.previous_page")
         nav_buttons.append(
             InlineKeyboardButton(
-                text=prev_text,
-                callback_data=f"favorites_page_{current_page - 1}"
+                text=get_language_text(language, "keyboard.previous_page"),
+                callback_data=cb.FavoritesPage(page=current_page - 1).pack()
             )
         )
     
     if current_page < total_pages - 1:
-        next_text = get_text(user_id, "keyboard.next_page")
         nav_buttons.append(
             InlineKeyboardButton(
-                text=next_text,
-                callback_data=f"favorites_page_{current_page + 1}"
+                text=get_language_text(language, "keyboard.next_page"),
+                callback_data=cb.FavoritesPage(page=current_page + 1).pack()
             )
         )
     
@@ -144,12 +222,11 @@ def get_favorites_navigation_keyboard(
         buttons.append(nav_buttons)
     
     # Кнопка очистки всех избранных
-    if quotes_on_page:
-        clear_text = get_text(user_id, "keyboard.clear_all")
+    if quote_ids:
         buttons.append([
             InlineKeyboardButton(
-                text=clear_text,
-                callback_data="clear_all_favorites"
+                text=get_language_text(language, "keyboard.clear_all"),
+                callback_data=cb.ClearAllFavorites().pack()
             )
         ])
     
@@ -168,23 +245,24 @@ def get_confirmation_keyboard(action: str, quote_id: str = "", user_id: int = 0)
     Returns:
         InlineKeyboardMarkup: Клавиатура подтверждения
     """
-    confirm_text = get_text(user_id, "keyboard.confirm")
-    cancel_text = get_text(user_id, "keyboard.cancel")
+    language = get_user_language(user_id)
     
-    buttons = [
-        [
-            InlineKeyboardButton(
-                text=confirm_text,
-                callback_data=f"confirm_{action}_{quote_id}" if quote_id else f"confirm_{action}"
-            ),
-            InlineKeyboardButton(
-                text=cancel_text,
-                callback_data="cancel_action"
-            )
+    def build() -> InlineKeyboardMarkup:
+        buttons = [
+            [
+                InlineKeyboardButton(
+                    text=get_language_text(language, "keyboard.confirm"),
+                    callback_data=f"confirm_{action}_{quote_id}" if quote_id else f"confirm_{action}"
+                ),
+                InlineKeyboardButton(
+                    text=get_language_text(language, "keyboard.cancel"),
+                    callback_data="cancel_action"
+                )
+            ]
         ]
-    ]
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
     
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return cached_keyboard("confirmation", language, action, (quote_id,) if quote_id else (), build)
 
 
 def get_delete_confirmation_keyboard(quote_id: str, user_id: int = 0) -> InlineKeyboardMarkup:
@@ -198,23 +276,24 @@ def get_delete_confirmation_keyboard(quote_id: str, user_id: int = 0) -> InlineK
     Returns:
         InlineKeyboardMarkup: Клавиатура подтверждения удаления
     """
-    confirm_text = get_text(user_id, "keyboard.confirm")
-    cancel_text = get_text(user_id, "keyboard.cancel")
+    language = get_user_language(user_id)
     
-    buttons = [
-        [
-            InlineKeyboardButton(
-                text=f"{confirm_text}",
-                callback_data=f"confirm_delete_{quote_id}"
-            ),
-            InlineKeyboardButton(
-                text=f"{cancel_text}",
-                callback_data="cancel_delete"
-            )
+    def build() -> InlineKeyboardMarkup:
+        buttons = [
+            [
+                InlineKeyboardButton(
+                    text=get_language_text(language, "keyboard.confirm"),
+                    callback_data=cb.ConfirmDelete.of(quote_id).pack()
+                ),
+                InlineKeyboardButton(
+                    text=get_language_text(language, "keyboard.cancel"),
+                    callback_data=cb.CancelDelete().pack()
+                )
+            ]
         ]
-    ]
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
     
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+    return cached_keyboard("delete_confirmation", language, "", (quote_id,), build)
 
 
 def get_clear_all_confirmation_keyboard(user_id: int = 0) -> InlineKeyboardMarkup:
@@ -227,23 +306,23 @@ def get_clear_all_confirmation_keyboard(user_id: int = 0) -> InlineKeyboardMarku
     Returns:
         InlineKeyboardMarkup: Клавиатура подтверждения очистки
     """
-    confirm_text = get_text(user_id, "keyboard.confirm")
-    cancel_text = get_text(user_id, "keyboard.cancel")
+    language = get_user_language(user_id)
     
-    buttons = [
-        [
-            InlineKeyboardButton(
-                text=f"🗑️ {confirm_text}",
-                callback_data="confirm_clear_all"
-            ),
-            InlineKeyboardButton(
-                text=f"❌ {cancel_text}",
-                callback_data="cancel_clear_all"
-            )
+    def build() -> InlineKeyboardMarkup:
+        confirm_text = get_language_text(language, "keyboard.confirm")
+        cancel_text = get_language_text(language, "keyboard.cancel")
+        buttons = [
+            [
+                InlineKeyboardButton(
+                    text=f"🗑️ {confirm_text}",
+                    callback_data=cb.ConfirmClearAll().pack()
+                ),
+                InlineKeyboardButton(
+                    text=f"❌ {cancel_text}",
+                    callback_data=cb.CancelClearAll().pack()
+                )
+            ]
         ]
-    ]
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
     
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
-
-
-
+    return cached_keyboard("clear_all_confirmation", language, "", (), build)
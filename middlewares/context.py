@@ -0,0 +1,135 @@
+"""
+Объединенный middleware: бан, регистрация, логирование и антиспам за один проход
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, InlineQuery, Message, TelegramObject
+
+from config.settings import INLINE_CACHE_TIME
+from middlewares.logger import LoggingMiddleware, ThrottlingMiddleware, extract_command
+from middlewares.user_management import BANNED_MESSAGE
+from utils.analytics import record_user_activity
+from utils.localization import get_user_language, resolve_language
+from utils.user_index import user_index
+from utils.user_management import is_user_banned, register_user
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UserContext:
+    """Данные пользователя, подготовленные для обработчиков (data["user_context"])"""
+    user_id: int
+    language: str
+    is_banned: bool
+    favorites_count: int
+    command: Optional[str] = None
+
+
+class ContextMiddleware(BaseMiddleware):
+    """
+    Middleware, заменяющий цепочку UserManagementMiddleware, LoggingMiddleware
+    и ThrottlingMiddleware
+
+    Пользователь извлекается из события один раз, бан, регистрация
+    и лимиты проверяются по структурам в памяти, а обработчики получают
+    готовый UserContext. Порядок проверок тот же, что в исходной цепочке.
+    """
+
+    def __init__(self, throttling: Optional[ThrottlingMiddleware] = None,
+                 logging_middleware: Optional[LoggingMiddleware] = None):
+        """
+        Args:
+            throttling: Антиспам с настроенными лимитами и хранилищем корзин
+            logging_middleware: Логирование входящих событий
+        """
+        self.throttling = throttling or ThrottlingMiddleware()
+        self.logging_middleware = logging_middleware or LoggingMiddleware()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """
+        Обрабатывает входящие события
+
+        Args:
+            handler: Обработчик события
+            event: Событие (Message, CallbackQuery и т.д.)
+            data: Данные события
+
+        Returns:
+            Any: Результат обработки
+        """
+        if isinstance(event, Message):
+            event_type = "message"
+        elif isinstance(event, CallbackQuery):
+            event_type = "callback"
+        elif isinstance(event, InlineQuery):
+            event_type = "inline"
+        else:
+            return await handler(event, data)
+
+        user = event.from_user
+        if not user:
+            return await handler(event, data)
+
+        user_id = user.id
+        command = extract_command(event)
+
+        # Проверяем, заблокирован ли пользователь
+        if is_user_banned(user_id):
+            logger.warning("Blocked %s from banned user %s", event_type, user_id)
+
+            try:
+                # Если это сообщение, отправляем уведомление о бане
+                if isinstance(event, Message):
+                    await event.answer(BANNED_MESSAGE)
+                # На inline-запрос отвечаем пустым списком, чтобы клиент не ждал результатов
+                elif isinstance(event, InlineQuery):
+                    await event.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+            except Exception as e:
+                logger.error("Error sending ban message to user %s: %s", user_id, e)
+
+            return  # Прерываем обработку для заблокированного пользователя
+
+        # Регистрируем/обновляем пользователя и учитываем его в DAU/WAU/MAU
+        try:
+            register_user(
+                user_id=user_id,
+                username=user.username,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                language=resolve_language(user.language_code)
+            )
+            record_user_activity(user_id, command)
+        except Exception as e:
+            logger.error("Error registering user %s: %s", user_id, e)
+
+        try:
+            await self.logging_middleware.log_event(event)
+        except Exception as e:
+            logger.error("Error in LoggingMiddleware: %s", e)
+
+        if not await self.throttling.check(event, user_id, event_type, command):
+            return  # Прерываем обработку
+
+        try:
+            favorites_count = user_index.get_favorites_count(user_id)
+        except Exception as e:
+            logger.error("Error getting favorites count for user %s: %s", user_id, e)
+            favorites_count = 0
+
+        data["user_context"] = UserContext(
+            user_id=user_id,
+            language=get_user_language(user_id),
+            is_banned=False,  # Заблокированные пользователи до обработчиков не доходят
+            favorites_count=favorites_count,
+            command=command
+        )
+        return await handler(event, data)
@@ -3,25 +3,81 @@ Middleware для логирования входящих сообщений
 """
 import logging
 import re
-from typing import Dict, Any, Awaitable, Callable
+import time
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Message, CallbackQuery
+from aiogram.types import TelegramObject, Message, CallbackQuery, InlineQuery
+from utils.localization import get_text
+from utils.rate_limiter import RateLimiterBackend, MemoryRateLimiter
 
 logger = logging.getLogger(__name__)
 
+THROTTLE_WARNING_WINDOW = 10.0  # Не чаще одного предупреждения за окно (сек)
+
+
+NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7F]+')
+
 
 def sanitize_for_logging(text: str) -> str:
     """
     Санитизация текста для безопасного логирования
     Удаляет или заменяет символы, которые могут вызвать проблемы с кодировкой
     """
-    if not text:
+    if not text or text.isascii():
         return text
     
     # Заменяем эмоджи и другие Unicode символы на безопасные альтернативы
     # Удаляем символы, которые могут вызывать проблемы с кодировкой
-    sanitized = re.sub(r'[^\x00-\x7F]+', '[EMOJI]', text)
-    return sanitized
+    return NON_ASCII_PATTERN.sub('[EMOJI]', text)
+
+
+def extract_command(event: TelegramObject) -> Optional[str]:
+    """Имя команды из текста сообщения (без "/" и упоминания бота) или None"""
+    if isinstance(event, Message) and event.text and event.text.startswith('/'):
+        return event.text.split(maxsplit=1)[0][1:].split('@', 1)[0].lower() or None
+    return None
+
+
+class _LazySanitized:
+    """
+    Текст, санитизируемый только при форматировании записи лога
+
+    Форматирование выполняет фоновый поток логирования (см. utils.logger),
+    поэтому регулярное выражение не выполняется в обработчике события.
+    """
+    
+    __slots__ = ("text",)
+    
+    def __init__(self, text: str):
+        self.text = text
+    
+    def __str__(self) -> str:
+        text = self.text
+        # Обрезаем длинные сообщения для логов
+        if len(text) > 100:
+            text = text[:97] + "..."
+        return sanitize_for_logging(text)
+
+
+class _LazyUserInfo:
+    """Описание пользователя, собираемое только при форматировании записи лога"""
+    
+    __slots__ = ("user",)
+    
+    def __init__(self, user):
+        self.user = user
+    
+    def __str__(self) -> str:
+        user = self.user
+        if not user:
+            return "Unknown user"
+        user_info = (
+            f"User: {user.id}"
+            f"{'@' + user.username if user.username else ''}"
+            f" ({user.first_name}"
+            f"{' ' + user.last_name if user.last_name else ''})"
+        )
+        return sanitize_for_logging(user_info)
 
 
 class LoggingMiddleware(BaseMiddleware):
@@ -47,22 +103,38 @@ class LoggingMiddleware(BaseMiddleware):
             Результат выполнения обработчика
         """
         try:
-            # Логирование сообщений
-            if isinstance(event, Message):
-                await self._log_message(event)
-            
-            # Логирование callback запросов
-            elif isinstance(event, CallbackQuery):
-                await self._log_callback(event)
+            await self.log_event(event)
             
             # Выполнение следующего обработчика
             return await handler(event, data)
         
         except Exception as e:
-            logger.error(f"Error in LoggingMiddleware: {e}")
+            logger.error("Error in LoggingMiddleware: %s", e)
             # Продолжаем выполнение несмотря на ошибку в middleware
             return await handler(event, data)
     
+    async def log_event(self, event: TelegramObject) -> None:
+        """
+        Логирование входящего события
+        
+        Args:
+            event: Telegram событие (Message, CallbackQuery, etc.)
+        """
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
+        # Логирование сообщений
+        if isinstance(event, Message):
+            await self._log_message(event)
+        
+        # Логирование callback запросов
+        elif isinstance(event, CallbackQuery):
+            await self._log_callback(event)
+        
+        # Логирование inline-запросов
+        elif isinstance(event, InlineQuery):
+            await self._log_inline_query(event)
+    
     async def _log_message(self, message: Message) -> None:
         """
         Логирование входящего сообщения
@@ -71,34 +143,19 @@ class LoggingMiddleware(BaseMiddleware):
             message: Объект сообщения
         """
         try:
-            user = message.from_user
             chat = message.chat
             
-            user_info = (
-                f"User: {user.id}"
-                f"{'@' + user.username if user.username else ''}"
-                f" ({user.first_name}"
-                f"{' ' + user.last_name if user.last_name else ''})"
-            ) if user else "Unknown user"
-            
-            chat_info = f"Chat: {chat.id} ({chat.type})"
-            message_text = message.text or message.caption or "<no text>"
-            # Обрезаем длинные сообщения для логов
-            if len(message_text) > 100:
-                message_text = message_text[:97] + "..."
-            
-            # Санитизируем текст для безопасного логирования
-            safe_message_text = sanitize_for_logging(message_text)
-            safe_user_info = sanitize_for_logging(user_info)
-            safe_chat_info = sanitize_for_logging(chat_info)
-            
+            # Строки собираются и санитизируются при форматировании в потоке логирования
             logger.info(
-                f"[MSG] Message received | {safe_user_info} | {safe_chat_info} | "
-                f"Text: '{safe_message_text}'"
+                "[MSG] Message received | %s | Chat: %s (%s) | Text: '%s'",
+                _LazyUserInfo(message.from_user),
+                chat.id,
+                chat.type,
+                _LazySanitized(message.text or message.caption or "<no text>")
             )
             
         except Exception as e:
-            logger.error(f"Error logging message: {e}")
+            logger.error("Error logging message: %s", e)
     
     async def _log_callback(self, callback: CallbackQuery) -> None:
         """
@@ -108,41 +165,135 @@ class LoggingMiddleware(BaseMiddleware):
             callback: Объект callback запроса
         """
         try:
-            user = callback.from_user
-            user_info = (
-                f"User: {user.id}"
-                f"{'@' + user.username if user.username else ''}"
-                f" ({user.first_name}"
-                f"{' ' + user.last_name if user.last_name else ''})"
-            ) if user else "Unknown user"
-            
-            callback_data = callback.data or "<no data>"
-            
-            # Санитизируем текст для безопасного логирования
-            safe_user_info = sanitize_for_logging(user_info)
-            safe_callback_data = sanitize_for_logging(callback_data)
+            # Строки собираются и санитизируются при форматировании в потоке логирования
+            logger.info(
+                "[CALLBACK] Callback received | %s | Data: '%s'",
+                _LazyUserInfo(callback.from_user),
+                _LazySanitized(callback.data or "<no data>")
+            )
             
+        except Exception as e:
+            logger.error("Error logging callback: %s", e)
+    
+    async def _log_inline_query(self, inline_query: InlineQuery) -> None:
+        """
+        Логирование входящего inline-запроса
+        
+        Args:
+            inline_query: Объект inline-запроса
+        """
+        try:
             logger.info(
-                f"[CALLBACK] Callback received | {safe_user_info} | "
-                f"Data: '{safe_callback_data}'"
+                "[INLINE] Inline query received | %s | Query: '%s' | Offset: '%s'",
+                _LazyUserInfo(inline_query.from_user),
+                _LazySanitized(inline_query.query),
+                inline_query.offset
             )
             
         except Exception as e:
-            logger.error(f"Error logging callback: {e}")
+            logger.error("Error logging inline query: %s", e)
 
 
 class ThrottlingMiddleware(BaseMiddleware):
     """
     Middleware для ограничения частоты запросов (антиспам)
+    
+    Использует корзины токенов: у каждого пользователя есть корзина на тип
+    события (сообщения, callback, inline-запросы) и, при наличии настройки,
+    на команду.
+    Корзины хранятся в подключаемом хранилище (см. utils.rate_limiter):
+    в памяти процесса или в общем для нескольких процессов SQLite/Redis.
     """
     
-    def __init__(self, rate_limit: float = 1.0):
+    def __init__(
+        self,
+        rate_limit: float = 1.0,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        command_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        warning_window: float = THROTTLE_WARNING_WINDOW,
+        backend: Optional[RateLimiterBackend] = None
+    ):
+        """
+        Args:
+            rate_limit: Минимальный средний интервал между событиями в секундах
+                        (используется, если limits не заданы)
+            limits: Лимиты по типу события: {"message"|"callback"|"inline": (burst, токенов в секунду)}
+            command_limits: Лимиты по командам: {"quote": (burst, токенов в секунду)}
+            warning_window: Не чаще какого интервала предупреждать пользователя (сек)
+            backend: Хранилище корзин (по умолчанию - в памяти процесса)
+        """
+        default_limit = (1.0, 1.0 / rate_limit if rate_limit > 0 else float("inf"))
+        self.limits = {"message": default_limit, "callback": default_limit}
+        self.limits.update(limits or {})
+        self.command_limits = command_limits or {}
+        self.warning_window = warning_window
+        self.backend = backend or MemoryRateLimiter()
+        # Время последнего предупреждения пользователю (очищается вместе с окном)
+        self.warned_at: Dict[int, float] = {}
+        self.last_warned_sweep = time.monotonic()
+    
+    def _should_warn(self, user_id: int, now: float) -> bool:
+        """Можно ли снова предупредить пользователя в текущем окне"""
+        if now - self.last_warned_sweep >= self.warning_window:
+            self.warned_at = {
+                uid: warned for uid, warned in self.warned_at.items()
+                if now - warned < self.warning_window
+            }
+            self.last_warned_sweep = now
+        
+        if now - self.warned_at.get(user_id, float("-inf")) < self.warning_window:
+            return False
+        self.warned_at[user_id] = now
+        return True
+    
+    async def check(self, event: TelegramObject, user_id: int, event_type: str,
+                    command: Optional[str] = None) -> bool:
         """
+        Списание токенов за событие и предупреждение при превышении лимита
+        
         Args:
-            rate_limit: Минимальный интервал между сообщениями в секундах
+            event: Событие (для ответа пользователю)
+            user_id: ID пользователя
+            event_type: Тип события ("message", "callback" или "inline")
+            command: Имя команды или None
+        
+        Returns:
+            bool: True если событие можно обрабатывать
         """
-        self.rate_limit = rate_limit
-        self.user_timestamps = {}
+        try:
+            if event_type not in self.limits:
+                return True
+            
+            burst, rate = self.limits[event_type]
+            buckets = [(f"{user_id}:{event_type}", burst, rate)]
+            
+            if command in self.command_limits:
+                burst, rate = self.command_limits[command]
+                buckets.append((f"{user_id}:cmd:{command}", burst, rate))
+            
+            if await self.backend.consume(buckets):
+                return True
+            
+            # Слишком частые запросы
+            logger.warning("Rate limit exceeded for user %s (%s)", user_id, event_type)
+            
+            if isinstance(event, InlineQuery):
+                # На inline-запрос нельзя ответить текстом - отдаем пустой список без кэширования
+                await event.answer([], cache_time=0, is_personal=True)
+            # Предупреждаем не чаще одного раза за окно
+            elif self._should_warn(user_id, time.monotonic()):
+                # Для сообщения - ответное сообщение, для callback - всплывающее уведомление
+                await event.answer(get_text(user_id, "rate_limit_warning"))
+            elif isinstance(event, CallbackQuery):
+                # Убираем индикатор загрузки на кнопке без текста
+                await event.answer()
+            
+            return False
+        
+        except Exception as e:
+            # При недоступности хранилища лимитов пропускаем событие
+            logger.error("Error in ThrottlingMiddleware: %s", e)
+            return True
     
     async def __call__(
         self,
@@ -153,40 +304,16 @@ class ThrottlingMiddleware(BaseMiddleware):
         """
         Проверка частоты запросов пользователя
         """
-        import time
+        # Получаем ID пользователя и тип события
+        if isinstance(event, Message) and event.from_user:
+            if not await self.check(event, event.from_user.id, "message", extract_command(event)):
+                return  # Прерываем обработку
+        elif isinstance(event, CallbackQuery) and event.from_user:
+            if not await self.check(event, event.from_user.id, "callback"):
+                return  # Прерываем обработку
+        elif isinstance(event, InlineQuery) and event.from_user:
+            if not await self.check(event, event.from_user.id, "inline"):
+                return  # Прерываем обработку
         
-        try:
-            current_time = time.time()
-            
-            # Получаем ID пользователя
-            user_id = None
-            if isinstance(event, Message) and event.from_user:
-                user_id = event.from_user.id
-            elif isinstance(event, CallbackQuery) and event.from_user:
-                user_id = event.from_user.id
-            
-            if user_id:
-                # Проверяем последнее время запроса пользователя
-                last_time = self.user_timestamps.get(user_id, 0)
-                
-                if current_time - last_time < self.rate_limit:
-                    # Слишком частые запросы
-                    logger.warning(f"Rate limit exceeded for user {user_id}")
-                    
-                    # Отправляем предупреждение (только для сообщений)
-                    if isinstance(event, Message):
-                        await event.answer(
-                            "⚠️ Пожалуйста, не отправляйте сообщения слишком часто."
-                        )
-                    
-                    return  # Прерываем обработку
-                
-                # Обновляем время последнего запроса
-                self.user_timestamps[user_id] = current_time
-            
-            # Выполняем следующий обработчик
-            return await handler(event, data)
-        
-        except Exception as e:
-            logger.error(f"Error in ThrottlingMiddleware: {e}")
-            return await handler(event, data)
+        # Выполняем следующий обработчик
+        return await handler(event, data)
@@ -0,0 +1,42 @@
+"""
+Middleware для сбора метрик обработки обновлений
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils.metrics import UPDATES_TOTAL, UPDATE_DURATION
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: считает обновления по типу и время их обработки
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """
+        Обработка обновления с замером времени
+
+        Args:
+            handler: Следующий обработчик в цепочке
+            event: Обновление Telegram
+            data: Данные контекста
+
+        Returns:
+            Результат выполнения обработчика
+        """
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        UPDATES_TOTAL.labels(update_type).inc()
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_DURATION.labels(update_type).observe(time.perf_counter() - start)
@@ -0,0 +1,154 @@
+"""
+Middleware для трассировки обработки обновлений
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject, Update
+
+from utils.tracing import current_trace, finish_trace, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: создает трассу и кладет ее ID в data["trace_id"]
+
+    Подключается через dp.update.outer_middleware, поэтому охватывает
+    всю обработку обновления, включая фильтры и внутренние middleware.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """
+        Обработка обновления внутри трассы
+
+        Args:
+            handler: Следующий обработчик в цепочке
+            event: Обновление Telegram
+            data: Данные контекста
+
+        Returns:
+            Результат выполнения обработчика
+        """
+        user = data.get("event_from_user")
+        token = start_trace(
+            update_id=event.update_id if isinstance(event, Update) else None,
+            event_type=event.event_type if isinstance(event, Update) else type(event).__name__,
+            user_id=user.id if user else None
+        )
+        trace = current_trace()
+        data["trace_id"] = trace.trace_id
+        status = "ok"
+
+        try:
+            trace.routing_started = time.perf_counter()
+            result = await handler(event, data)
+            if result is UNHANDLED:
+                status = "unhandled"
+            return result
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            try:
+                finish_trace(token, status)
+            except Exception as e:
+                logger.error("Error writing trace: %s", e)
+
+
+class TracedMiddleware(BaseMiddleware):
+    """
+    Обертка, записывающая собственное время работы middleware как этап трассы
+
+    Время следующих обработчиков в цепочке из этапа вычитается.
+    """
+
+    def __init__(self, middleware: BaseMiddleware, name: Optional[str] = None):
+        """
+        Args:
+            middleware: Оборачиваемый middleware
+            name: Название этапа (по умолчанию - имя класса middleware)
+        """
+        self.middleware = middleware
+        self.name = name or type(middleware).__name__
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        trace = current_trace()
+        if trace is None:
+            return await self.middleware(handler, event, data)
+
+        start = time.perf_counter()
+        trace.end_routing(start)
+        downstream = 0.0
+
+        async def timed_handler(event: TelegramObject, data: Dict[str, Any]) -> Any:
+            nonlocal downstream
+            handler_start = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                downstream += time.perf_counter() - handler_start
+
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            trace.add_span(self.name, start, time.perf_counter() - start - downstream)
+
+
+class HandlerTracingMiddleware(BaseMiddleware):
+    """
+    Последний внутренний middleware: записывает время обработчика с его именем
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        trace = current_trace()
+        if trace is None:
+            return await handler(event, data)
+
+        trace.end_routing(time.perf_counter())
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        handler_name = getattr(callback, "__qualname__", None) or "unknown"
+
+        with span("handler", handler=handler_name):
+            return await handler(event, data)
+
+
+class BotApiTracingMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: записывает каждый вызов Bot API как этап трассы
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ) -> Any:
+        if current_trace() is None:
+            return await make_request(bot, method)
+
+        api_method = getattr(method, "__api_method__", type(method).__name__)
+        with span(f"bot_api.{api_method}"):
+            return await make_request(bot, method)
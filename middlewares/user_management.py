@@ -5,14 +5,25 @@ import logging
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
+from middlewares.logger import extract_command
 from utils.user_management import register_user, is_user_banned
+from utils.analytics import record_user_activity
+from utils.localization import resolve_language
 
 logger = logging.getLogger(__name__)
 
+BANNED_MESSAGE = (
+    "🚫 Вы заблокированы и не можете использовать этого бота.\n"
+    "Если считаете это ошибкой, обратитесь к администратору."
+)
+
 
 class UserManagementMiddleware(BaseMiddleware):
     """
     Middleware для регистрации пользователей и проверки банов
+    
+    В боте заменен ContextMiddleware; оставлен для сравнения прежней
+    цепочки в benchmarks/middleware_overhead.py.
     """
     
     async def __call__(
@@ -48,10 +59,7 @@ class UserManagementMiddleware(BaseMiddleware):
                 # Если это сообщение, отправляем уведомление о бане
                 if isinstance(event, Message):
                     try:
-                        await event.answer(
-                            "🚫 Вы заблокированы и не можете использовать этого бота.\n"
-                            "Если считаете это ошибкой, обратитесь к администратору."
-                        )
+                        await event.answer(BANNED_MESSAGE)
                     except Exception as e:
                         logger.error(f"Error sending ban message to user {user_id}: {e}")
                 
@@ -63,10 +71,17 @@ class UserManagementMiddleware(BaseMiddleware):
                     user_id=user_id,
                     username=user.username,
                     first_name=user.first_name,
-                    last_name=user.last_name
+                    last_name=user.last_name,
+                    language=resolve_language(user.language_code)
                 )
             except Exception as e:
                 logger.error(f"Error registering user {user_id}: {e}")
+            
+            # Учитываем пользователя в оценках DAU/WAU/MAU
+            try:
+                record_user_activity(user_id, extract_command(event))
+            except Exception as e:
+                logger.error(f"Error recording activity for user {user_id}: {e}")
         
         # Продолжаем обработку
         return await handler(event, data)
@@ -2,9 +2,10 @@
 Административные команды для бота
 """
 import logging
-import asyncio
+import math
+from datetime import datetime
 from typing import Union, cast, Optional
-from aiogram import Router, F, Bot
+from aiogram import Router, Bot
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -12,19 +13,31 @@ from aiogram.fsm.context import FSMContext
 from filters.admin_filter import AdminFilter
 from states.admin_states import BroadcastState, BanState, UnbanState
 from utils.logger import log_command_usage
-from utils.storage import load_data, clear_user_favorites
+from utils.formatters import parse_duration, format_duration
+from utils.watchdog import get_loop_lag_stats
+from utils.profiling import profile_for, ProfilerBusyError, PROFILE_MAX_SECONDS
+from utils.storage import clear_user_favorites
+from utils.stats import get_favorites_stats
+from utils.analytics import get_unique_users_stats, get_command_unique_users
+from utils.user_index import get_users_page, SORT_FIELDS, FILTERS, ADMIN_USERS_PAGE_SIZE
 from utils.user_management import (
     get_user_stats, get_all_user_ids, ban_user, unban_user, 
-    is_user_banned, get_banned_users_list, get_user_info
+    is_user_banned, get_banned_users_list, get_banned_users_count, get_user_info,
+    get_users_info, are_users_banned, get_ban_expiry
 )
 from services.api_client import clear_cache, get_cache_stats
+from services.broadcast import broadcast_engine, BroadcastBusyError, BroadcastJob
+from keyboards import callbacks as cb
+from routers.dispatch import CallbackDispatcher
 from keyboards.admin import (
-    get_admin_main_keyboard, get_broadcast_confirmation_keyboard,
+    get_admin_main_keyboard, get_broadcast_confirmation_keyboard, get_broadcast_progress_keyboard,
     get_ban_management_keyboard, get_ban_confirmation_keyboard,
-    get_unban_confirmation_keyboard, get_back_to_admin_keyboard
+    get_unban_confirmation_keyboard, get_back_to_admin_keyboard,
+    get_admin_users_keyboard
 )
 
 router = Router()
+callbacks = CallbackDispatcher(router)
 logger = logging.getLogger(__name__)
 
 
@@ -49,7 +62,7 @@ async def cmd_admin(message: Message):
     await message.answer(admin_text, reply_markup=keyboard)
 
 
-@router.callback_query(F.data == "admin_main")
+@callbacks.route(cb.AdminMain)
 async def callback_admin_main(callback: CallbackQuery, state: FSMContext):
     """Возврат в главное меню админ-панели"""
     if not callback.from_user or not callback.message:
@@ -75,7 +88,7 @@ async def callback_admin_main(callback: CallbackQuery, state: FSMContext):
 # Статистика
 
 @router.message(Command("stats"), AdminFilter())
-@router.callback_query(F.data == "admin_stats")
+@callbacks.route(cb.AdminStats)
 async def cmd_admin_stats(update: Union[Message, CallbackQuery], state: FSMContext):
     """Команда /stats - статистика использования"""
     # Определяем тип события
@@ -93,15 +106,34 @@ async def cmd_admin_stats(update: Union[Message, CallbackQuery], state: FSMConte
         user_stats = get_user_stats()
         
         # Получаем данные о цитатах
-        quotes_data = load_data()
-        total_favorites = sum(len(favorites) for favorites in quotes_data.values())
-        users_with_favorites = len([u for u in quotes_data.values() if u])
+        favorites_stats = get_favorites_stats()
+        total_favorites = favorites_stats.get('total_favorites', 0)
+        users_with_favorites = favorites_stats.get('users_with_favorites', 0)
         
         # Получаем статистику кэша
         cache_stats = get_cache_stats()
         
         # Получаем количество заблокированных пользователей
-        banned_count = len(get_banned_users_list())
+        banned_count = get_banned_users_count()
+        
+        # Оценки уникальных пользователей (HyperLogLog)
+        unique_stats = get_unique_users_stats()
+        top_commands = get_command_unique_users(days=7)[:5]
+        commands_text = "".join(
+            f"  /{command}: ~{count}\n" for command, count in top_commands
+        ) or "  нет данных\n"
+        
+        # Задержка event loop (блокирующие вызовы в обработчиках)
+        lag_stats = get_loop_lag_stats()
+        if lag_stats:
+            lag_text = (
+                f"\n\n🐢 Задержка event loop (мс):\n"
+                f"  p50: {lag_stats['p50']:.1f} | p95: {lag_stats['p95']:.1f} | "
+                f"p99: {lag_stats['p99']:.1f} | max: {lag_stats['max']:.1f}\n"
+                f"  Блокировок выше порога: {lag_stats['stalls']}"
+            )
+        else:
+            lag_text = ""
         
         stats_text = (
             f"📊 Статистика бота:\n\n"
@@ -109,11 +141,18 @@ async def cmd_admin_stats(update: Union[Message, CallbackQuery], state: FSMConte
             f"✅ Активных пользователей: {user_stats.get('active_users', 0)}\n"
             f"📅 Активных за месяц: {user_stats.get('recent_users', 0)}\n"
             f"🚫 Заблокированных: {banned_count}\n\n"
+            f"📈 Уникальные пользователи (оценка):\n"
+            f"  За день: ~{unique_stats.get('dau', 0)}\n"
+            f"  За неделю: ~{unique_stats.get('wau', 0)}\n"
+            f"  За месяц: ~{unique_stats.get('mau', 0)}\n\n"
+            f"⌨️ Команды за неделю (уникальные пользователи):\n"
+            f"{commands_text}\n"
             f"⭐ Всего избранных цитат: {total_favorites}\n"
             f"📚 Пользователей с избранными: {users_with_favorites}\n\n"
             f"💾 Кэш: {cache_stats.get('valid_entries', 0)} записей\n"
             f"⏰ TTL кэша: {cache_stats.get('cache_ttl', 0)} сек\n"
             f"🗑️ Устаревших записей: {cache_stats.get('expired_entries', 0)}"
+            f"{lag_text}"
         )
         
         keyboard = get_back_to_admin_keyboard(user_id)
@@ -136,7 +175,90 @@ async def cmd_admin_stats(update: Union[Message, CallbackQuery], state: FSMConte
 
 # Управление пользователями
 
-@router.callback_query(F.data == "admin_users")
+SORT_TITLES = {
+    'fav': "по избранным",
+    'seen': "по активности",
+    'msg': "по сообщениям",
+}
+
+FILTER_TITLES = {
+    'all': "все",
+    'active': "активные",
+    'banned': "заблокированные",
+}
+
+
+def format_admin_users_page(
+    users_page: list,
+    total: int,
+    sort: str,
+    user_filter: str,
+    page: int,
+    total_pages: int,
+    banned_status: dict
+) -> str:
+    """
+    Форматирование страницы списка пользователей
+    
+    Args:
+        users_page: Пары (ID пользователя, запись индекса) текущей страницы
+        total: Общее количество пользователей с учетом фильтра
+        sort: Ключ сортировки
+        user_filter: Фильтр
+        page: Текущая страница (начиная с 0)
+        total_pages: Общее количество страниц
+        banned_status: Словарь {ID пользователя: заблокирован ли} для страницы
+        
+    Returns:
+        str: Текст страницы
+    """
+    header = (
+        f"👥 Пользователи ({FILTER_TITLES[user_filter]}, {SORT_TITLES[sort]})\n"
+        f"Всего: {total} | Страница {page + 1}/{total_pages}\n\n"
+    )
+    
+    if not users_page:
+        return header + "📝 Пользователи не найдены"
+    
+    lines = []
+    for target_id, record in users_page:
+        username = f" @{record['username']}" if record.get('username') else ""
+        last_seen = (record.get('last_seen') or "—")[:16].replace("T", " ")
+        banned_mark = " 🚫" if banned_status.get(target_id) else ""
+        lines.append(
+            f"🆔 {target_id}{username}{banned_mark}\n"
+            f"   ⭐ {record.get('favorites', 0)} | 💬 {record.get('message_count', 0)} | 🕒 {last_seen}"
+        )
+    
+    return header + "\n".join(lines)
+
+
+async def show_admin_users_page(
+    callback: CallbackQuery,
+    sort: str = 'fav',
+    user_filter: str = 'all',
+    page: int = 0
+) -> None:
+    """Отображение страницы списка пользователей"""
+    # Полный список банов нужен только для фильтра заблокированных
+    banned_ids = set(get_banned_users_list()) if user_filter == 'banned' else None
+    users_page, total = get_users_page(sort, user_filter, page, ADMIN_USERS_PAGE_SIZE, banned_ids)
+    total_pages = max(math.ceil(total / ADMIN_USERS_PAGE_SIZE), 1)
+    
+    if page >= total_pages and page > 0:
+        # Страница исчезла (например, после разблокировки) - показываем последнюю
+        page = total_pages - 1
+        users_page, total = get_users_page(sort, user_filter, page, ADMIN_USERS_PAGE_SIZE, banned_ids)
+    
+    banned_status = are_users_banned(target_id for target_id, _ in users_page)
+    users_text = format_admin_users_page(
+        users_page, total, sort, user_filter, page, total_pages, banned_status
+    )
+    keyboard = get_admin_users_keyboard(callback.from_user.id, sort, user_filter, page, total_pages)
+    await callback.message.edit_text(users_text, reply_markup=keyboard)
+
+
+@callbacks.route(cb.AdminUsers)
 async def callback_admin_users(callback: CallbackQuery):
     """Информация о пользователях"""
     if not callback.from_user or not callback.message:
@@ -146,20 +268,7 @@ async def callback_admin_users(callback: CallbackQuery):
     log_command_usage(user_id, "admin_users")
     
     try:
-        quotes_data = load_data()
-        
-        if not quotes_data:
-            users_text = "📝 Нет зарегистрированных пользователей с избранными цитатами"
-        else:
-            users_text = "👥 Пользователи с избранными цитатами:\n\n"
-            
-            for user_id_str, favorites in quotes_data.items():
-                favorites_count = len(favorites)
-                banned_status = " (🚫 заблокирован)" if is_user_banned(int(user_id_str)) else ""
-                users_text += f"🆔 {user_id_str}: {favorites_count} избранных{banned_status}\n"
-        
-        keyboard = get_back_to_admin_keyboard(user_id)
-        await callback.message.edit_text(users_text, reply_markup=keyboard)
+        await show_admin_users_page(callback)
         await callback.answer()
         
     except Exception as e:
@@ -167,9 +276,35 @@ async def callback_admin_users(callback: CallbackQuery):
         await callback.answer("❌ Ошибка при получении информации о пользователях", show_alert=True)
 
 
+@callbacks.route(cb.AdminUsersPage, AdminFilter())
+async def callback_admin_users_page(callback: CallbackQuery, callback_data: cb.AdminUsersPage):
+    """Навигация по списку пользователей"""
+    if not callback.from_user or not callback.message:
+        return
+    
+    sort, user_filter, page = callback_data.sort, callback_data.user_filter, callback_data.page
+    if sort not in SORT_FIELDS or user_filter not in FILTERS or page < 0:
+        await callback.answer("❌ Неверная страница", show_alert=True)
+        return
+    
+    try:
+        await show_admin_users_page(callback, sort, user_filter, page)
+        await callback.answer()
+        
+    except Exception as e:
+        logger.error(f"Error navigating users list: {e}")
+        await callback.answer("❌ Ошибка при получении информации о пользователях", show_alert=True)
+
+
+@callbacks.route(cb.AdminUsersNoop)
+async def callback_admin_users_noop(callback: CallbackQuery):
+    """Нажатие на номер страницы"""
+    await callback.answer()
+
+
 # Очистка кэша
 
-@router.callback_query(F.data == "admin_clear_cache")
+@callbacks.route(cb.AdminClearCache)
 async def callback_admin_clear_cache(callback: CallbackQuery):
     """Очистка кэша API"""
     if not callback.from_user or not callback.message:
@@ -191,7 +326,7 @@ async def callback_admin_clear_cache(callback: CallbackQuery):
 # Система рассылки
 
 @router.message(Command("broadcast"), AdminFilter())
-@router.callback_query(F.data == "admin_broadcast")
+@callbacks.route(cb.AdminBroadcast)
 async def cmd_admin_broadcast(update: Union[Message, CallbackQuery], state: FSMContext):
     """Команда /broadcast - начало рассылки"""
     # Определяем тип события
@@ -233,8 +368,9 @@ async def process_broadcast_message(message: Message, state: FSMContext):
     
     # Получаем статистику для подтверждения
     all_users = get_all_user_ids()
-    banned_users = get_banned_users_list()
-    target_users = len([uid for uid in all_users if uid not in banned_users])
+    banned_status = are_users_banned(all_users)
+    banned_count = sum(banned_status.values())
+    target_users = len(all_users) - banned_count
     
     confirmation_text = (
         f"📢 Подтверждение рассылки\n\n"
@@ -243,7 +379,7 @@ async def process_broadcast_message(message: Message, state: FSMContext):
         f"{message.text or message.caption or 'Без текста'}\n"
         f"━━━━━━━━━━━━━━━━━━━━\n\n"
         f"👥 Получателей: {target_users} пользователей\n"
-        f"🚫 Заблокированных: {len(banned_users)}\n\n"
+        f"🚫 Заблокированных: {banned_count}\n\n"
         f"Подтвердите отправку:"
     )
     
@@ -251,7 +387,7 @@ async def process_broadcast_message(message: Message, state: FSMContext):
     await message.answer(confirmation_text, reply_markup=keyboard)
 
 
-@router.callback_query(F.data == "confirm_broadcast", BroadcastState.waiting_for_confirmation)
+@callbacks.route(cb.ConfirmBroadcast, BroadcastState.waiting_for_confirmation)
 async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
     """Подтверждение и выполнение рассылки"""
     if not callback.from_user or not callback.message:
@@ -270,49 +406,53 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
         
         # Получаем список пользователей для рассылки
         all_users = get_all_user_ids()
-        banned_users = get_banned_users_list()
-        target_users = [uid for uid in all_users if uid not in banned_users]
+        banned_status = are_users_banned(all_users)
+        target_users = [uid for uid in all_users if not banned_status[uid]]
         
         if not target_users:
             await callback.answer("❌ Нет пользователей для рассылки", show_alert=True)
             return
         
-        # Обновляем сообщение о начале рассылки
-        await callback.message.edit_text(
-            f"📤 Начинаю рассылку...\n"
-            f"Пользователей: {len(target_users)}"
-        )
-        await callback.answer()
-        
-        # Выполняем рассылку
+        # Рассылка идет в фоне, обработчик и состояние FSM освобождаются сразу
+        chat_id = callback.message.chat.id
+        message_id = callback.message.message_id
         bot = callback.bot
-        sent_count = 0
-        failed_count = 0
-        
-        for user_id_target in target_users:
-            try:
-                await bot.send_message(user_id_target, broadcast_text)
-                sent_count += 1
-                
-                # Небольшая пауза между отправками
-                await asyncio.sleep(0.05)
-            except Exception as e:
-                failed_count += 1
-                logger.warning(f"Failed to send broadcast to user {user_id_target}: {e}")
-        
-        # Отчет о результатах
-        result_text = (
-            f"✅ Рассылка завершена!\n\n"
-            f"📤 Отправлено: {sent_count}\n"
-            f"❌ Ошибок: {failed_count}\n"
-            f"📊 Всего пользователей: {len(target_users)}"
-        )
         
-        keyboard = get_back_to_admin_keyboard(user_id)
-        await callback.message.edit_text(result_text, reply_markup=keyboard)
+        async def show_progress(job: BroadcastJob, finished: bool) -> None:
+            if finished:
+                title = "⏹ Рассылка остановлена" if job.cancelled else "✅ Рассылка завершена!"
+                keyboard = get_back_to_admin_keyboard(user_id)
+            else:
+                title = f"📤 Рассылка... {job.processed * 100 // job.total}%"
+                keyboard = get_broadcast_progress_keyboard(user_id)
+            text = (
+                f"{title}\n\n"
+                f"📤 Отправлено: {job.sent}\n"
+                f"❌ Ошибок: {job.failed}\n"
+                f"🚫 Заблокировали бота: {job.blocked}\n"
+                f"📊 Обработано: {job.processed} из {job.total}\n"
+                f"⏱ Время: {job.elapsed:.0f} сек"
+            )
+            await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, reply_markup=keyboard)
+        
+        if broadcast_engine.is_running:
+            await callback.answer("⏳ Предыдущая рассылка еще не завершена", show_alert=True)
+            return
+        
+        # Сообщение о запуске - до старта, чтобы не перезаписать итоги короткой рассылки
+        await callback.message.edit_text(
+            f"📤 Рассылка запущена\n"
+            f"Пользователей: {len(target_users)}",
+            reply_markup=get_broadcast_progress_keyboard(user_id)
+        )
+        try:
+            broadcast_engine.start(bot, broadcast_text, target_users, show_progress)
+        except BroadcastBusyError:
+            await callback.answer("⏳ Предыдущая рассылка еще не завершена", show_alert=True)
+            return
         
-        # Очищаем состояние
         await state.clear()
+        await callback.answer()
         
     except Exception as e:
         logger.error(f"Error during broadcast: {e}")
@@ -320,7 +460,7 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 
-@router.callback_query(F.data == "cancel_broadcast", BroadcastState.waiting_for_confirmation)
+@callbacks.route(cb.CancelBroadcast, BroadcastState.waiting_for_confirmation)
 async def cancel_broadcast(callback: CallbackQuery, state: FSMContext):
     """Отмена рассылки"""
     if not callback.from_user or not callback.message:
@@ -333,7 +473,16 @@ async def cancel_broadcast(callback: CallbackQuery, state: FSMContext):
     await callback.answer("Рассылка отменена")
 
 
-@router.callback_query(F.data == "edit_broadcast", BroadcastState.waiting_for_confirmation)
+@callbacks.route(cb.StopBroadcast, AdminFilter())
+async def stop_broadcast(callback: CallbackQuery):
+    """Остановка выполняющейся рассылки"""
+    if broadcast_engine.stop():
+        await callback.answer("⏹ Останавливаю рассылку")
+    else:
+        await callback.answer("Рассылка не выполняется")
+
+
+@callbacks.route(cb.EditBroadcast, BroadcastState.waiting_for_confirmation)
 async def edit_broadcast(callback: CallbackQuery, state: FSMContext):
     """Изменение текста рассылки"""
     if not callback.message:
@@ -349,7 +498,7 @@ async def edit_broadcast(callback: CallbackQuery, state: FSMContext):
 
 # Система банов
 
-@router.callback_query(F.data == "admin_bans")
+@callbacks.route(cb.AdminBans)
 async def callback_admin_bans(callback: CallbackQuery):
     """Меню управления банами"""
     if not callback.from_user or not callback.message:
@@ -357,11 +506,9 @@ async def callback_admin_bans(callback: CallbackQuery):
         
     user_id = callback.from_user.id
     
-    banned_users = get_banned_users_list()
-    
     bans_text = (
         f"🚫 Управление блокировками\n\n"
-        f"Заблокированных пользователей: {len(banned_users)}\n\n"
+        f"Заблокированных пользователей: {get_banned_users_count()}\n\n"
         f"Выберите действие:"
     )
     
@@ -371,7 +518,7 @@ async def callback_admin_bans(callback: CallbackQuery):
 
 
 @router.message(Command("ban"), AdminFilter())
-@router.callback_query(F.data == "admin_ban_user")
+@callbacks.route(cb.AdminBanUser)
 async def cmd_ban_user(update: Union[Message, CallbackQuery], state: FSMContext):
     """Команда /ban - начало блокировки пользователя"""
     # Определяем тип события
@@ -418,10 +565,42 @@ async def process_ban_user_id(message: Message, state: FSMContext):
             await message.answer(f"⚠️ Пользователь {target_user_id} уже заблокирован!")
             return
         
+        await state.update_data(target_user_id=target_user_id)
+        await state.set_state(BanState.waiting_for_duration)
+        
+        await message.answer(
+            f"⏳ Срок блокировки пользователя {target_user_id}\n\n"
+            f"Отправьте длительность: 30m, 12h, 7d или 2w.\n"
+            f"Для постоянной блокировки отправьте 0."
+        )
+        
+    except ValueError:
+        await message.answer("❌ Некорректный ID пользователя. Введите число.")
+    except Exception as e:
+        logger.error(f"Error processing ban user ID: {e}")
+        await message.answer("❌ Произошла ошибка")
+
+
+@router.message(BanState.waiting_for_duration)
+async def process_ban_duration(message: Message, state: FSMContext):
+    """Обработка срока блокировки"""
+    if not message.from_user or not message.text:
+        return
+    
+    try:
+        duration = parse_duration(message.text)
+    except ValueError:
+        await message.answer("❌ Некорректный срок. Примеры: 30m, 12h, 7d, 2w или 0 для постоянной блокировки.")
+        return
+    
+    try:
+        data = await state.get_data()
+        target_user_id = data.get('target_user_id')
+        
         # Получаем информацию о пользователе
         user_info = get_user_info(target_user_id)
         
-        await state.update_data(target_user_id=target_user_id)
+        await state.update_data(ban_duration=duration)
         await state.set_state(BanState.waiting_for_confirmation)
         
         if user_info:
@@ -431,35 +610,35 @@ async def process_ban_user_id(message: Message, state: FSMContext):
                 f"🚫 Подтверждение блокировки\n\n"
                 f"Пользователь: {target_user_id}\n"
                 f"Имя: {first_name}\n"
-                f"Username: @{username}\n\n"
+                f"Username: @{username}\n"
+                f"Срок: {format_duration(duration)}\n\n"
                 f"Подтвердите блокировку:"
             )
         else:
             confirmation_text = (
                 f"🚫 Подтверждение блокировки\n\n"
                 f"Пользователь: {target_user_id}\n"
-                f"(Информация о пользователе не найдена)\n\n"
+                f"(Информация о пользователе не найдена)\n"
+                f"Срок: {format_duration(duration)}\n\n"
                 f"Подтвердите блокировку:"
             )
         
         keyboard = get_ban_confirmation_keyboard(message.from_user.id, target_user_id)
         await message.answer(confirmation_text, reply_markup=keyboard)
         
-    except ValueError:
-        await message.answer("❌ Некорректный ID пользователя. Введите число.")
     except Exception as e:
-        logger.error(f"Error processing ban user ID: {e}")
+        logger.error(f"Error processing ban duration: {e}")
         await message.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data.startswith("confirm_ban_"), BanState.waiting_for_confirmation)
-async def confirm_ban_user(callback: CallbackQuery, state: FSMContext):
+@callbacks.route(cb.ConfirmBan, BanState.waiting_for_confirmation)
+async def confirm_ban_user(callback: CallbackQuery, state: FSMContext, callback_data: cb.ConfirmBan):
     """Подтверждение блокировки пользователя"""
-    if not callback.from_user or not callback.data or not callback.message:
+    if not callback.from_user or not callback.message:
         return
         
     try:
-        target_user_id = int(callback.data.replace("confirm_ban_", ""))
+        target_user_id = callback_data.user_id
         
         # Получаем данные из состояния для проверки
         data = await state.get_data()
@@ -470,13 +649,16 @@ async def confirm_ban_user(callback: CallbackQuery, state: FSMContext):
             return
         
         # Блокируем пользователя
-        if ban_user(target_user_id):
-            success_text = f"✅ Пользователь {target_user_id} заблокирован!"
+        duration = data.get('ban_duration') or None
+        if ban_user(target_user_id, duration=duration):
+            success_text = f"✅ Пользователь {target_user_id} заблокирован ({format_duration(duration)})!"
             keyboard = get_back_to_admin_keyboard(callback.from_user.id)
             await callback.message.edit_text(success_text, reply_markup=keyboard)
             await callback.answer("Пользователь заблокирован")
-        else:
+        elif is_user_banned(target_user_id):
             await callback.answer("❌ Пользователь уже был заблокирован", show_alert=True)
+        else:
+            await callback.answer("❌ Не удалось сохранить блокировку", show_alert=True)
         
         await state.clear()
         
@@ -486,7 +668,7 @@ async def confirm_ban_user(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 
-@router.callback_query(F.data == "cancel_ban", BanState.waiting_for_confirmation)
+@callbacks.route(cb.CancelBan, BanState.waiting_for_confirmation)
 async def cancel_ban_user(callback: CallbackQuery, state: FSMContext):
     """Отмена блокировки пользователя"""
     if not callback.from_user or not callback.message:
@@ -502,7 +684,7 @@ async def cancel_ban_user(callback: CallbackQuery, state: FSMContext):
 # Разблокировка пользователей
 
 @router.message(Command("unban"), AdminFilter())
-@router.callback_query(F.data == "admin_unban_user")
+@callbacks.route(cb.AdminUnbanUser)
 async def cmd_unban_user(update: Union[Message, CallbackQuery], state: FSMContext):
     """Команда /unban - начало разблокировки пользователя"""
     # Определяем тип события
@@ -563,14 +745,14 @@ async def process_unban_user_id(message: Message, state: FSMContext):
         await message.answer("❌ Произошла ошибка")
 
 
-@router.callback_query(F.data.startswith("confirm_unban_"), UnbanState.waiting_for_confirmation)
-async def confirm_unban_user(callback: CallbackQuery, state: FSMContext):
+@callbacks.route(cb.ConfirmUnban, UnbanState.waiting_for_confirmation)
+async def confirm_unban_user(callback: CallbackQuery, state: FSMContext, callback_data: cb.ConfirmUnban):
     """Подтверждение разблокировки пользователя"""
-    if not callback.from_user or not callback.data or not callback.message:
+    if not callback.from_user or not callback.message:
         return
         
     try:
-        target_user_id = int(callback.data.replace("confirm_unban_", ""))
+        target_user_id = callback_data.user_id
         
         # Получаем данные из состояния для проверки
         data = await state.get_data()
@@ -586,6 +768,8 @@ async def confirm_unban_user(callback: CallbackQuery, state: FSMContext):
             keyboard = get_back_to_admin_keyboard(callback.from_user.id)
             await callback.message.edit_text(success_text, reply_markup=keyboard)
             await callback.answer("Пользователь разблокирован")
+        elif is_user_banned(target_user_id):
+            await callback.answer("❌ Не удалось сохранить разблокировку", show_alert=True)
         else:
             await callback.answer("❌ Пользователь не был заблокирован", show_alert=True)
         
@@ -597,7 +781,7 @@ async def confirm_unban_user(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 
-@router.callback_query(F.data == "cancel_unban", UnbanState.waiting_for_confirmation)
+@callbacks.route(cb.CancelUnban, UnbanState.waiting_for_confirmation)
 async def cancel_unban_user(callback: CallbackQuery, state: FSMContext):
     """Отмена разблокировки пользователя"""
     if not callback.from_user or not callback.message:
@@ -612,7 +796,7 @@ async def cancel_unban_user(callback: CallbackQuery, state: FSMContext):
 
 # Список заблокированных пользователей
 
-@router.callback_query(F.data == "admin_banned_list")
+@callbacks.route(cb.AdminBannedList)
 async def callback_banned_list(callback: CallbackQuery):
     """Показать список заблокированных пользователей"""
     if not callback.from_user or not callback.message:
@@ -627,20 +811,72 @@ async def callback_banned_list(callback: CallbackQuery):
     else:
         banned_text = f"🚫 Заблокированные пользователи ({len(banned_users)}):\n\n"
         
+        # Одно чтение users.json на весь список
+        users_info = get_users_info(banned_users)
         for banned_id in banned_users:
-            user_info = get_user_info(banned_id)
+            user_info = users_info.get(banned_id)
+            expires_at = get_ban_expiry(banned_id)
+            expiry_text = (
+                f" ⏳ до {datetime.fromtimestamp(expires_at).strftime('%d.%m.%Y %H:%M')}"
+                if expires_at else ""
+            )
             if user_info:
                 username = user_info.get('username', 'неизвестно')
                 first_name = user_info.get('first_name', 'неизвестно')
-                banned_text += f"👤 {banned_id} (@{username}) - {first_name}\n"
+                banned_text += f"👤 {banned_id} (@{username}) - {first_name}{expiry_text}\n"
             else:
-                banned_text += f"👤 {banned_id} (информация недоступна)\n"
+                banned_text += f"👤 {banned_id} (информация недоступна){expiry_text}\n"
     
     keyboard = get_ban_management_keyboard(user_id)
     await callback.message.edit_text(banned_text, reply_markup=keyboard)
     await callback.answer()
 
 
+# Профилирование
+
+@router.message(Command("profile"), AdminFilter())
+async def cmd_admin_profile(message: Message):
+    """Команда /profile <секунды> - профилирование работающего бота"""
+    if not message.from_user or not message.text:
+        return
+    
+    user_id = message.from_user.id
+    log_command_usage(user_id, "profile")
+    
+    command_parts = message.text.split()
+    try:
+        seconds = float(command_parts[1]) if len(command_parts) > 1 else 0
+    except ValueError:
+        seconds = 0
+    
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        await message.answer(
+            f"❌ Укажите длительность профилирования в секундах (до {PROFILE_MAX_SECONDS}):\n"
+            "Пример: /profile 30"
+        )
+        return
+    
+    await message.answer(f"⏱ Профилирование запущено на {seconds:g} сек...")
+    
+    try:
+        summary, path = await profile_for(seconds)
+    except ProfilerBusyError:
+        await message.answer("⚠️ Профилирование уже выполняется, дождитесь результата")
+        return
+    except Exception as e:
+        logger.error(f"Error during profiling: {e}")
+        await message.answer("❌ Ошибка при профилировании")
+        return
+    
+    header = f"📈 Профиль за {seconds:g} сек (по cumulative time):\n\n"
+    footer = f"\n\n💾 Полный профиль: {path}"
+    # Ограничение длины сообщения Telegram - 4096 символов
+    limit = 4096 - len(header) - len(footer)
+    if len(summary) > limit:
+        summary = summary[:limit].rsplit("\n", 1)[0]
+    await message.answer(header + summary + footer)
+
+
 # Старые команды для совместимости
 
 @router.message(Command("admin_clear_user"), AdminFilter())
@@ -1,29 +1,40 @@
-from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery, InaccessibleMessage
 from aiogram.fsm.context import FSMContext
+import asyncio
 import logging
-import math
-from typing import Union, Optional
+from typing import Any, Dict, Union, Optional
 
 from states.quote_states import DeleteConfirmationState
 from utils.logger import log_command_usage
 from utils.storage import (
-    add_to_favorites, remove_from_favorites, get_user_favorites, 
+    add_to_favorites_async, remove_from_favorites, get_user_favorites, 
     clear_user_favorites, is_quote_in_favorites
 )
 from utils.localization import get_text, set_user_language, get_user_language
-from utils.formatters import format_quote_message, format_favorites_list
-from services.api_client import get_random_quote, clear_cache, get_cache_stats
+from utils.formatters import format_quote_message
+from utils.favorites_pages import get_favorites_page
+from utils.task_queue import submit_task
+from utils.subscriptions import (
+    parse_time, format_minute, resolve_timezone, subscribe_user, unsubscribe_user,
+    get_subscription, get_subscription_timezone, get_subscription_count
+)
+from utils.metrics import DAILY_QUOTE_SUBSCRIPTIONS
+from services.api_client import get_random_quote, get_random_quotes, clear_cache, get_cache_stats
+from services.models import Quote
+from services.quote_registry import get_recent_quote, remember_quote
 from keyboards.inline import (
-    get_quote_keyboard, get_favorites_navigation_keyboard, 
-    get_confirmation_keyboard, get_language_keyboard,
+    get_quote_keyboard, get_confirmation_keyboard, get_language_keyboard,
     get_delete_confirmation_keyboard, get_clear_all_confirmation_keyboard
 )
-from filters.favorite_filter import extract_quote_id_from_callback
+from keyboards import callbacks as cb
+from routers.dispatch import CallbackDispatcher
 from states import DeleteConfirmationState
+from config.settings import QUOTE_BATCH_MAX
 
 router = Router()
+callbacks = CallbackDispatcher(router)
 logger = logging.getLogger(__name__)
 
 
@@ -68,6 +79,63 @@ async def safe_edit_reply_markup(
     return False
 
 
+def quote_to_favorite(quote: Quote) -> Dict[str, Any]:
+    """Запись избранного из объекта цитаты"""
+    return {
+        '_id': quote._id,
+        'content': quote.content,
+        'author': quote.author,
+        'tags': list(quote.tags)
+    }
+
+
+def parse_quote_from_message(message_text: str, quote_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Восстановление цитаты из текста сообщения
+    
+    Args:
+        message_text: Текст сообщения с цитатой
+        quote_id: ID цитаты из callback
+        
+    Returns:
+        Optional[Dict[str, Any]]: Запись избранного или None, если текст не похож на цитату
+    """
+    lines = message_text.split('\n')
+    if len(lines) < 3:
+        return None
+    
+    content = lines[0].replace('💭 "', '').replace('"', '')
+    author = lines[2].replace('— ', '')
+    tags = []
+    
+    # Ищем теги если есть
+    for line in lines:
+        if line.startswith('🏷️ Tags:'):
+            tags_str = line.replace('🏷️ Tags: ', '')
+            tags = [tag.strip() for tag in tags_str.split(',') if tag.strip() != 'None']
+    
+    return {
+        '_id': quote_id,
+        'content': content,
+        'author': author,
+        'tags': tags
+    }
+
+
+async def show_favorites_with_error(
+    message: Union[Message, InaccessibleMessage, None], 
+    user_id: int, 
+    error_key: str
+) -> None:
+    """Follow-up edit after a failed background change: favorites list with an error line"""
+    error_text = get_text(user_id, error_key)
+    favorites_page = get_favorites_page(user_id, 0)
+    if favorites_page is not None:
+        await safe_edit_text(message, f"{favorites_page.text}\n\n{error_text}", favorites_page.keyboard)
+    else:
+        await safe_edit_text(message, error_text)
+
+
 @router.message(Command("start"))
 async def cmd_start(message: Message):
     """Команда /start - приветствие и краткая инструкция"""
@@ -90,19 +158,37 @@ async def cmd_help(message: Message):
     await message.answer(help_text)
 
 
+def parse_quote_count(args: Optional[str]) -> int:
+    """Количество цитат из аргумента /quote N (от 1 до QUOTE_BATCH_MAX)"""
+    if args and args.strip().isdigit():
+        return max(1, min(int(args.strip()), QUOTE_BATCH_MAX))
+    return 1
+
+
 @router.message(Command("quote"))
-async def cmd_quote(message: Message):
-    """Команда /quote - вывод случайной цитаты с кнопками избранного"""
+async def cmd_quote(message: Message, command: CommandObject):
+    """Команда /quote [N] - вывод одной или нескольких случайных цитат с кнопками избранного"""
     user_id = message.from_user.id if message.from_user else 0
     log_command_usage(user_id, "quote")
+    count = parse_quote_count(command.args)
     
     try:
-        quote = await get_random_quote()
-        if quote:
-            quote_text = format_quote_message(quote, user_id=user_id)
-            # Создаем клавиатуру с кнопками
-            keyboard = get_quote_keyboard(quote._id, user_id)
-            await message.answer(quote_text, reply_markup=keyboard)
+        if count > 1:
+            # Несколько цитат - из буфера, пополняемого одним запросом к API
+            quotes = await get_random_quotes(count)
+        else:
+            quote = await get_random_quote()
+            quotes = [quote] if quote else []
+        
+        if quotes:
+            # Запоминаем до отправки: кнопку могут нажать сразу после доставки
+            for quote in quotes:
+                remember_quote(quote)
+            # Каждая цитата - отдельным сообщением со своими кнопками избранного
+            for quote in quotes:
+                quote_text = format_quote_message(quote, user_id=user_id)
+                keyboard = get_quote_keyboard(quote._id, user_id)
+                await message.answer(quote_text, reply_markup=keyboard)
         else:
             quote_text = get_text(user_id, "quote_fetch_error")
             await message.answer(quote_text)
@@ -120,20 +206,13 @@ async def cmd_favorites(message: Message):
     log_command_usage(user_id, "favorites")
     
     try:
-        favorites = get_user_favorites(user_id)
-        if not favorites:
+        # Показываем первую страницу избранных
+        favorites_page = get_favorites_page(user_id, 0)
+        if favorites_page is None:
             favorites_text = get_text(user_id, "favorites_empty")
             await message.answer(favorites_text)
         else:
-            # Показываем первую страницу избранных
-            favorites_text = format_favorites_list(favorites, page=0, user_id=user_id)
-            keyboard = get_favorites_navigation_keyboard(
-                current_page=0,
-                total_pages=math.ceil(len(favorites) / 3),
-                quotes_on_page=favorites[:3],
-                user_id=user_id
-            )
-            await message.answer(favorites_text, reply_markup=keyboard)
+            await message.answer(favorites_page.text, reply_markup=favorites_page.keyboard)
             
     except Exception as e:
         logger.error(f"Error accessing favorites: {e}")
@@ -153,7 +232,8 @@ async def cmd_cache_stats(message: Message):
         f"Total entries: {stats['total_entries']}\n"
         f"Valid entries: {stats['valid_entries']}\n"
         f"Expired entries: {stats['expired_entries']}\n"
-        f"Cache TTL: {stats['cache_ttl']} seconds"
+        f"Cache TTL: {stats['cache_ttl']} seconds\n"
+        f"Buffered quotes: {stats['buffered_quotes']}"
     )
     
     await message.answer(stats_text)
@@ -182,12 +262,66 @@ async def cmd_language(message: Message):
     await message.answer(text, reply_markup=keyboard)
 
 
+@router.message(Command("subscribe"))
+async def cmd_subscribe(message: Message, command: CommandObject):
+    """Команда /subscribe ЧЧ:ММ [часовой пояс] - ежедневная цитата в заданное время"""
+    user_id = message.from_user.id if message.from_user else 0
+    log_command_usage(user_id, "subscribe")
+    
+    args = (command.args or "").split()
+    if not args:
+        # Без аргументов - текущая подписка или подсказка
+        subscription = get_subscription(user_id)
+        if subscription is None:
+            await message.answer(get_text(user_id, "subscribe_usage"))
+        else:
+            minute, zone_name = subscription
+            await message.answer(get_text(
+                user_id, "subscribe_current", time=format_minute(minute), timezone=zone_name
+            ))
+        return
+    
+    minute = parse_time(args[0])
+    if minute is None:
+        await message.answer(get_text(user_id, "subscribe_invalid_time"))
+        return
+    
+    # Часовой пояс из команды, иначе - из прежней подписки, иначе UTC
+    if len(args) > 1:
+        resolved = resolve_timezone(args[1])
+        if resolved is None:
+            await message.answer(get_text(user_id, "subscribe_invalid_timezone"))
+            return
+    else:
+        resolved = get_subscription_timezone(user_id) or resolve_timezone("UTC")
+    zone_name, zone = resolved
+    
+    if subscribe_user(user_id, minute, zone_name, zone):
+        DAILY_QUOTE_SUBSCRIPTIONS.set(get_subscription_count())
+        await message.answer(get_text(user_id, "subscribed", time=format_minute(minute), timezone=zone_name))
+    else:
+        await message.answer(get_text(user_id, "error"))
+
+
+@router.message(Command("unsubscribe"))
+async def cmd_unsubscribe(message: Message):
+    """Команда /unsubscribe - отключение цитаты дня"""
+    user_id = message.from_user.id if message.from_user else 0
+    log_command_usage(user_id, "unsubscribe")
+    
+    if unsubscribe_user(user_id):
+        DAILY_QUOTE_SUBSCRIPTIONS.set(get_subscription_count())
+        await message.answer(get_text(user_id, "unsubscribed"))
+    else:
+        await message.answer(get_text(user_id, "not_subscribed"))
+
+
 # Обработчик выбора языка
-@router.callback_query(F.data.startswith("set_language_"))
-async def callback_set_language(callback: CallbackQuery):
+@callbacks.route(cb.SetLanguage)
+async def callback_set_language(callback: CallbackQuery, callback_data: cb.SetLanguage):
     """Обработчик установки языка пользователя"""
     user_id = callback.from_user.id
-    language_code = (callback.data or "").replace("set_language_", "")
+    language_code = callback_data.language
     
     try:
         if set_user_language(user_id, language_code):
@@ -210,53 +344,50 @@ async def callback_set_language(callback: CallbackQuery):
 
 # Обработчики callback-кнопок для избранного
 
-@router.callback_query(F.data.startswith("add_favorite_"))
-async def callback_add_favorite(callback: CallbackQuery):
+@callbacks.route(cb.AddFavorite)
+async def callback_add_favorite(callback: CallbackQuery, callback_data: cb.AddFavorite):
     """Обработчик добавления цитаты в избранное"""
     user_id = callback.from_user.id
-    quote_id = extract_quote_id_from_callback(callback.data or "", "add_favorite_")
+    quote_id = callback_data.quote_id
     
     try:
-        # Получаем данные цитаты из сообщения
-        message_text = safe_get_message_text(callback.message)
-        if message_text:
-            # Парсим цитату из сообщения
-            lines = message_text.split('\n')
-            if len(lines) >= 3:
-                content = lines[0].replace('💭 "', '').replace('"', '')
-                author = lines[2].replace('— ', '')
-                tags = []
-                
-                # Ищем теги если есть
-                for line in lines:
-                    if line.startswith('🏷️ Tags:'):
-                        tags_str = line.replace('🏷️ Tags: ', '')
-                        tags = [tag.strip() for tag in tags_str.split(',') if tag.strip() != 'None']
-                
-                quote_dict = {
-                    '_id': quote_id,
-                    'content': content,
-                    'author': author,
-                    'tags': tags
-                }
-                
-                # Добавляем в избранное
-                if add_to_favorites(user_id, quote_dict):
-                    success_text = get_text(user_id, "quote_added_to_favorites")
-                    await callback.answer(success_text, show_alert=True)
-                    
-                    # Обновляем клавиатуру
-                    new_keyboard = get_quote_keyboard(quote_id, user_id)
-                    await safe_edit_reply_markup(callback.message, new_keyboard)
-                else:
-                    already_in_text = get_text(user_id, "quote_already_in_favorites")
-                    await callback.answer(already_in_text, show_alert=True)
-            else:
-                error_text = get_text(user_id, "error_quote_processing")
-                await callback.answer(error_text, show_alert=True)
+        # Цитата обычно есть в реестре показанных, разбор текста сообщения - запасной путь
+        quote = get_recent_quote(quote_id)
+        if quote is not None:
+            quote_dict = quote_to_favorite(quote)
         else:
-            not_found_text = get_text(user_id, "message_not_found")
-            await callback.answer(not_found_text, show_alert=True)
+            message_text = safe_get_message_text(callback.message)
+            if not message_text:
+                not_found_text = get_text(user_id, "message_not_found")
+                await callback.answer(not_found_text, show_alert=True)
+                return
+            quote_dict = parse_quote_from_message(message_text, quote_id)
+        
+        if quote_dict is None:
+            error_text = get_text(user_id, "error_quote_processing")
+            await callback.answer(error_text, show_alert=True)
+            return
+        
+        # Отвечаем сразу, запись в хранилище и обновление клавиатуры - в фоне
+        success_text = get_text(user_id, "quote_added_to_favorites")
+        await callback.answer(success_text, show_alert=True)
+        message = callback.message
+        
+        async def persist() -> None:
+            # Чтение и запись файла - в отдельном потоке; False и для уже добавленной цитаты - это не ошибка
+            if (not await add_to_favorites_async(user_id, quote_dict)
+                    and not await asyncio.to_thread(is_quote_in_favorites, user_id, quote_id)):
+                raise RuntimeError(f"quote {quote_id} was not saved for user {user_id}")
+            await safe_edit_reply_markup(message, get_quote_keyboard(quote_id, user_id))
+        
+        async def report(error: Exception) -> None:
+            # Цитата остается в сообщении, под ней - текст ошибки и прежние кнопки
+            error_text = get_text(user_id, "error_adding_favorite")
+            message_text = safe_get_message_text(message)
+            text = f"{message_text}\n\n{error_text}" if message_text else error_text
+            await safe_edit_text(message, text, get_quote_keyboard(quote_id, user_id))
+        
+        submit_task(user_id, "add_favorite", persist, report)
             
     except Exception as e:
         logger.error(f"Error adding quote to favorites: {e}")
@@ -264,11 +395,11 @@ async def callback_add_favorite(callback: CallbackQuery):
         await callback.answer(error_text, show_alert=True)
 
 
-@router.callback_query(F.data.startswith("remove_favorite_"))
-async def callback_remove_favorite(callback: CallbackQuery, state: FSMContext):
+@callbacks.route(cb.RemoveFavorite)
+async def callback_remove_favorite(callback: CallbackQuery, state: FSMContext, callback_data: cb.RemoveFavorite):
     """Обработчик начала удаления цитаты из избранного с подтверждением"""
     user_id = callback.from_user.id
-    quote_id = extract_quote_id_from_callback(callback.data or "", "remove_favorite_")
+    quote_id = callback_data.quote_id
     
     try:
         # Получаем информацию о цитате
@@ -309,39 +440,22 @@ async def callback_remove_favorite(callback: CallbackQuery, state: FSMContext):
         await callback.answer(error_text, show_alert=True)
 
 
-@router.callback_query(F.data.startswith("favorites_page_"))
-async def callback_favorites_page(callback: CallbackQuery):
+@callbacks.route(cb.FavoritesPage)
+async def callback_favorites_page(callback: CallbackQuery, callback_data: cb.FavoritesPage):
     """Обработчик навигации по страницам избранного"""
     user_id = callback.from_user.id
-    try:
-        page = int((callback.data or "").replace("favorites_page_", "") or "0")
-    except ValueError:
-        page = 0
+    page = callback_data.page
     
     try:
-        favorites = get_user_favorites(user_id)
-        if not favorites:
-            await callback.answer("❌ У вас нет избранных цитат", show_alert=True)
-            return
-        
-        total_pages = math.ceil(len(favorites) / 3)
-        if page < 0 or page >= total_pages:
-            await callback.answer("❌ Неверная страница", show_alert=True)
+        favorites_page = get_favorites_page(user_id, page)
+        if favorites_page is None:
+            if not get_user_favorites(user_id):
+                await callback.answer("❌ У вас нет избранных цитат", show_alert=True)
+            else:
+                await callback.answer("❌ Неверная страница", show_alert=True)
             return
         
-        # Формируем текст для страницы
-        start_idx = page * 3
-        end_idx = min(start_idx + 3, len(favorites))
-        quotes_on_page = favorites[start_idx:end_idx]
-        favorites_text = format_favorites_list(favorites, page=page, user_id=user_id)
-        keyboard = get_favorites_navigation_keyboard(
-            current_page=page,
-            total_pages=total_pages,
-            quotes_on_page=quotes_on_page,
-            user_id=user_id
-        )
-        
-        await safe_edit_text(callback.message, favorites_text, keyboard)
+        await safe_edit_text(callback.message, favorites_page.text, favorites_page.keyboard)
         await callback.answer()
         
     except Exception as e:
@@ -352,7 +466,7 @@ async def callback_favorites_page(callback: CallbackQuery):
 
 
 
-@router.callback_query(F.data == "get_another_quote")
+@callbacks.route(cb.AnotherQuote)
 async def callback_another_quote(callback: CallbackQuery):
     """Обработчик получения новой цитаты"""
     user_id = callback.from_user.id
@@ -362,6 +476,7 @@ async def callback_another_quote(callback: CallbackQuery):
         quote = await get_random_quote()
         if quote:
             logger.info(f"Got quote with ID: {quote._id}")
+            remember_quote(quote)
             quote_text = format_quote_message(quote, user_id=user_id)
             keyboard = get_quote_keyboard(quote._id, user_id)
             await safe_edit_text(callback.message, quote_text, keyboard)
@@ -377,7 +492,7 @@ async def callback_another_quote(callback: CallbackQuery):
         await callback.answer(error_text, show_alert=True)
 
 
-@router.callback_query(F.data.startswith("already_favorite_"))
+@callbacks.route(cb.AlreadyFavorite)
 async def callback_already_favorite(callback: CallbackQuery):
     """Обработчик для цитат уже находящихся в избранном"""
     user_id = callback.from_user.id
@@ -387,11 +502,11 @@ async def callback_already_favorite(callback: CallbackQuery):
 
 # FSM обработчики для подтверждения удаления
 
-@router.callback_query(F.data.startswith("confirm_delete_"), DeleteConfirmationState.waiting_for_confirmation)
-async def callback_confirm_delete(callback: CallbackQuery, state: FSMContext):
+@callbacks.route(cb.ConfirmDelete, DeleteConfirmationState.waiting_for_confirmation)
+async def callback_confirm_delete(callback: CallbackQuery, state: FSMContext, callback_data: cb.ConfirmDelete):
     """Обработчик подтверждения удаления цитаты"""
     user_id = callback.from_user.id
-    quote_id = (callback.data or "").replace("confirm_delete_", "")
+    quote_id = callback_data.quote_id
     
     try:
         # Получаем данные из состояния
@@ -404,32 +519,29 @@ async def callback_confirm_delete(callback: CallbackQuery, state: FSMContext):
             await state.clear()
             return
         
-        # Удаляем цитату
-        if remove_from_favorites(user_id, quote_id):
-            success_text = get_text(user_id, "quote_removed_from_favorites")
-            await callback.answer(success_text, show_alert=True)
+        # Очищаем состояние и отвечаем сразу, удаление и обновление списка - в фоне
+        await state.clear()
+        success_text = get_text(user_id, "quote_removed_from_favorites")
+        await callback.answer(success_text, show_alert=True)
+        message = callback.message
+        
+        async def persist() -> None:
+            # False и для уже удаленной цитаты - это не ошибка
+            if not remove_from_favorites(user_id, quote_id) and is_quote_in_favorites(user_id, quote_id):
+                raise RuntimeError(f"quote {quote_id} was not removed for user {user_id}")
             
-            # Обновляем список избранных
-            favorites = get_user_favorites(user_id)
-            if not favorites:
+            # Показываем обновленный список избранных
+            favorites_page = get_favorites_page(user_id, 0)
+            if favorites_page is None:
                 empty_text = get_text(user_id, "favorites_empty")
-                await safe_edit_text(callback.message, empty_text)
+                await safe_edit_text(message, empty_text)
             else:
-                # Показываем обновленный список избранных
-                favorites_text = format_favorites_list(favorites, page=0, user_id=user_id)
-                keyboard = get_favorites_navigation_keyboard(
-                    current_page=0,
-                    total_pages=math.ceil(len(favorites) / 3),
-                    quotes_on_page=favorites[:3],
-                    user_id=user_id
-                )
-                await safe_edit_text(callback.message, favorites_text, keyboard)
-        else:
-            not_found_text = get_text(user_id, "quote_not_in_favorites")
-            await callback.answer(not_found_text, show_alert=True)
+                await safe_edit_text(message, favorites_page.text, favorites_page.keyboard)
         
-        # Очищаем состояние
-        await state.clear()
+        async def report(error: Exception) -> None:
+            await show_favorites_with_error(message, user_id, "error_removing_favorite")
+        
+        submit_task(user_id, "remove_favorite", persist, report)
             
     except Exception as e:
         logger.error(f"Error confirming quote deletion: {e}")
@@ -438,7 +550,7 @@ async def callback_confirm_delete(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 
-@router.callback_query(F.data == "cancel_delete", DeleteConfirmationState.waiting_for_confirmation)
+@callbacks.route(cb.CancelDelete, DeleteConfirmationState.waiting_for_confirmation)
 async def callback_cancel_delete(callback: CallbackQuery, state: FSMContext):
     """Обработчик отмены удаления цитаты"""
     user_id = callback.from_user.id
@@ -449,16 +561,9 @@ async def callback_cancel_delete(callback: CallbackQuery, state: FSMContext):
         await callback.answer(cancel_text)
         
         # Возвращаемся к списку избранных
-        favorites = get_user_favorites(user_id)
-        if favorites:
-            favorites_text = format_favorites_list(favorites, page=0, user_id=user_id)
-            keyboard = get_favorites_navigation_keyboard(
-                current_page=0,
-                total_pages=math.ceil(len(favorites) / 3),
-                quotes_on_page=favorites[:3],
-                user_id=user_id
-            )
-            await safe_edit_text(callback.message, favorites_text, keyboard)
+        favorites_page = get_favorites_page(user_id, 0)
+        if favorites_page is not None:
+            await safe_edit_text(callback.message, favorites_page.text, favorites_page.keyboard)
         else:
             empty_text = get_text(user_id, "favorites_empty")
             await safe_edit_text(callback.message, empty_text)
@@ -473,7 +578,7 @@ async def callback_cancel_delete(callback: CallbackQuery, state: FSMContext):
 
 
 # Обработчик для кнопки "Clear All" с FSM
-@router.callback_query(F.data == "clear_all_favorites")
+@callbacks.route(cb.ClearAllFavorites)
 async def callback_clear_all_favorites(callback: CallbackQuery, state: FSMContext):
     """Обработчик начала очистки всех избранных цитат с подтверждением"""
     user_id = callback.from_user.id
@@ -499,24 +604,28 @@ async def callback_clear_all_favorites(callback: CallbackQuery, state: FSMContex
         await callback.answer(error_text, show_alert=True)
 
 
-@router.callback_query(F.data == "confirm_clear_all", DeleteConfirmationState.waiting_for_clear_all_confirmation)
+@callbacks.route(cb.ConfirmClearAll, DeleteConfirmationState.waiting_for_clear_all_confirmation)
 async def callback_confirm_clear_all(callback: CallbackQuery, state: FSMContext):
     """Обработчик подтверждения очистки всех избранных"""
     user_id = callback.from_user.id
     
     try:
-        if clear_user_favorites(user_id):
-            success_text = get_text(user_id, "all_favorites_cleared")
-            await callback.answer(success_text, show_alert=True)
-            
+        # Очищаем состояние и отвечаем сразу, очистка хранилища - в фоне
+        await state.clear()
+        success_text = get_text(user_id, "all_favorites_cleared")
+        await callback.answer(success_text, show_alert=True)
+        message = callback.message
+        
+        async def persist() -> None:
+            if not clear_user_favorites(user_id) and get_user_favorites(user_id):
+                raise RuntimeError(f"favorites were not cleared for user {user_id}")
             cleared_text = get_text(user_id, "favorites_cleared")
-            await safe_edit_text(callback.message, cleared_text)
-        else:
-            error_text = get_text(user_id, "error_clearing_favorites")
-            await callback.answer(error_text, show_alert=True)
+            await safe_edit_text(message, cleared_text)
         
-        # Очищаем состояние
-        await state.clear()
+        async def report(error: Exception) -> None:
+            await show_favorites_with_error(message, user_id, "error_clearing_favorites")
+        
+        submit_task(user_id, "clear_favorites", persist, report)
             
     except Exception as e:
         logger.error(f"Error confirming clear all favorites: {e}")
@@ -525,7 +634,7 @@ async def callback_confirm_clear_all(callback: CallbackQuery, state: FSMContext)
         await state.clear()
 
 
-@router.callback_query(F.data == "cancel_clear_all", DeleteConfirmationState.waiting_for_clear_all_confirmation)
+@callbacks.route(cb.CancelClearAll, DeleteConfirmationState.waiting_for_clear_all_confirmation)
 async def callback_cancel_clear_all(callback: CallbackQuery, state: FSMContext):
     """Обработчик отмены очистки всех избранных"""
     user_id = callback.from_user.id
@@ -536,16 +645,9 @@ async def callback_cancel_clear_all(callback: CallbackQuery, state: FSMContext):
         await callback.answer(cancel_text)
         
         # Возвращаемся к списку избранных
-        favorites = get_user_favorites(user_id)
-        if favorites:
-            favorites_text = format_favorites_list(favorites, page=0, user_id=user_id)
-            keyboard = get_favorites_navigation_keyboard(
-                current_page=0,
-                total_pages=math.ceil(len(favorites) / 3),
-                quotes_on_page=favorites[:3],
-                user_id=user_id
-            )
-            await safe_edit_text(callback.message, favorites_text, keyboard)
+        favorites_page = get_favorites_page(user_id, 0)
+        if favorites_page is not None:
+            await safe_edit_text(callback.message, favorites_page.text, favorites_page.keyboard)
         else:
             empty_text = get_text(user_id, "favorites_empty")
             await safe_edit_text(callback.message, empty_text)
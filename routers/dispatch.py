@@ -0,0 +1,113 @@
+"""
+Маршрутизация callback запросов по коду действия и список команд роутеров
+"""
+import logging
+from typing import Any, Callable, Dict, List, Set, Tuple, Type, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallbackType, FilterObject, HandlerObject
+from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+from keyboards.callbacks import action_code, upgrade_legacy
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackDispatcher:
+    """
+    Таблица маршрутов callback запросов роутера: код действия -> обработчики
+
+    Вместо последовательной проверки F.data.startswith(...) у каждого
+    обработчика роутер получает один обработчик с фильтром, который находит
+    маршруты по коду действия одним обращением к словарю и проверяет только
+    их собственные фильтры (состояние FSM, AdminFilter). Фильтры выполняются
+    до внутренних middleware, как и при обычной регистрации обработчиков.
+
+    Обработчик получает распакованные данные в аргументе callback_data, а
+    в data["handler"] для middleware подставляется найденный маршрут.
+    """
+
+    def __init__(self, router: Router):
+        """
+        Args:
+            router: Роутер, в котором регистрируется общий обработчик
+        """
+        self.routes: Dict[str, List[Tuple[Type[CallbackData], HandlerObject]]] = {}
+        router.callback_query.register(self._dispatch, self._match)
+
+    def route(self, factory: Type[CallbackData], *filters: CallbackType) -> Callable[[CallbackType], CallbackType]:
+        """
+        Декоратор регистрации обработчика действия
+
+        Args:
+            factory: Фабрика callback data (ее префикс - код действия)
+            *filters: Дополнительные фильтры обработчика
+
+        Returns:
+            Декоратор, возвращающий обработчик без изменений
+        """
+        def decorator(callback: CallbackType) -> CallbackType:
+            handler = HandlerObject(callback=callback, filters=[FilterObject(item) for item in filters])
+            self.routes.setdefault(factory.__prefix__, []).append((factory, handler))
+            return callback
+
+        return decorator
+
+    async def _match(self, callback: CallbackQuery, **data: Any) -> Union[bool, Dict[str, Any]]:
+        """Фильтр общего обработчика: поиск маршрута по коду действия"""
+        packed = callback.data
+        if not packed:
+            return False
+
+        routes = self.routes.get(action_code(packed))
+        if routes is None:
+            # Кнопки прежнего формата в уже отправленных сообщениях
+            packed = upgrade_legacy(packed)
+            if packed is None:
+                return False
+            routes = self.routes.get(action_code(packed))
+            if routes is None:
+                return False
+
+        for factory, handler in routes:
+            try:
+                callback_data = factory.unpack(packed)
+            except (TypeError, ValueError) as e:
+                # Данные могут подойти другому маршруту с тем же кодом действия
+                logger.warning(f"Invalid callback data {packed!r} for {factory.__name__}: {e}")
+                continue
+
+            passed, kwargs = await handler.check(callback, **data, callback_data=callback_data)
+            if passed:
+                kwargs["handler"] = handler
+                return kwargs
+        return False
+
+    @staticmethod
+    async def _dispatch(callback: CallbackQuery, **data: Any) -> Any:
+        """Общий обработчик: вызов маршрута, найденного фильтром"""
+        return await data["handler"].call(callback, **data)
+
+
+def get_registered_commands(router: Router) -> Set[str]:
+    """
+    Собирает имена команд из фильтров Command обработчиков сообщений
+
+    Args:
+        router: Роутер или диспетчер (вложенные роутеры обходятся рекурсивно)
+
+    Returns:
+        Set[str]: Имена команд без "/" (команды-регулярные выражения пропускаются)
+    """
+    commands = set()
+    for handler in router.message.handlers:
+        for filter_object in handler.filters or ():
+            if isinstance(filter_object.callback, Command):
+                commands.update(
+                    command.lower() for command in filter_object.callback.commands if isinstance(command, str)
+                )
+    for sub_router in router.sub_routers:
+        commands |= get_registered_commands(sub_router)
+    return commands
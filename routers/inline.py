@@ -0,0 +1,137 @@
+"""
+Inline-режим: поиск цитат по запросу "@bot <слова>"
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+from config.settings import (
+    INLINE_CACHE_TIME, INLINE_RESULTS_PER_PAGE, INLINE_MAX_RESULTS, INLINE_RESULT_CACHE_SIZE
+)
+from keyboards.callbacks import pack_quote_id
+from services.models import Quote
+from services.quote_search import search_quotes, tokenize
+from utils.formatters import format_quote_message
+from utils.localization import get_user_language
+from utils.metrics import CACHE_REQUESTS_TOTAL
+from utils.storage import get_favorites_version
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+TITLE_MAX_LENGTH = 100  # Длина заголовка результата
+
+
+def build_article(quote: Quote, user_id: int) -> InlineQueryResultArticle:
+    """
+    Результат inline-запроса для цитаты
+
+    Args:
+        quote: Цитата
+        user_id: ID пользователя для локализации
+
+    Returns:
+        InlineQueryResultArticle: Статья с текстом цитаты
+    """
+    title = quote.content
+    if len(title) > TITLE_MAX_LENGTH:
+        title = title[:TITLE_MAX_LENGTH - 1].rstrip() + "…"
+    return InlineQueryResultArticle(
+        id=pack_quote_id(quote._id)[:64],
+        title=title,
+        description=quote.author,
+        input_message_content=InputTextMessageContent(
+            message_text=format_quote_message(quote, user_id=user_id)
+        )
+    )
+
+
+class InlineResultCache:
+    """
+    LRU-кэш готовых результатов inline-запросов
+
+    Пока пользователь печатает, Telegram присылает запрос на каждый символ,
+    а при прокрутке - те же запросы с новым offset. Ключ включает версию
+    избранного и язык, поэтому изменения избранного видны сразу, а новые
+    показанные цитаты - после истечения времени жизни записи.
+    """
+
+    def __init__(self, max_size: int = INLINE_RESULT_CACHE_SIZE, ttl: float = INLINE_CACHE_TIME):
+        """
+        Args:
+            max_size: Максимальное количество запросов в кэше
+            ttl: Время жизни записи (сек)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Tuple, Tuple[float, List[InlineQueryResultArticle]]]" = OrderedDict()
+
+    def get_results(self, user_id: int, query: str) -> List[InlineQueryResultArticle]:
+        """
+        Результаты поиска для пользователя (из кэша или после поиска по индексу)
+
+        Args:
+            user_id: ID пользователя
+            query: Текст запроса
+
+        Returns:
+            List[InlineQueryResultArticle]: Все результаты запроса
+        """
+        normalized = " ".join(tokenize(query))
+        key = (user_id, get_favorites_version(user_id), get_user_language(user_id), normalized)
+        now = time.monotonic()
+
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.entries.move_to_end(key)
+            CACHE_REQUESTS_TOTAL.labels("inline_results", "hit").inc()
+            return entry[1]
+
+        CACHE_REQUESTS_TOTAL.labels("inline_results", "miss").inc()
+        results = [build_article(quote, user_id) for quote in search_quotes(user_id, normalized, INLINE_MAX_RESULTS)]
+        self.entries[key] = (now + self.ttl, results)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return results
+
+    def clear(self) -> None:
+        """Очистка кэша"""
+        self.entries.clear()
+
+
+# Глобальный кэш результатов inline-запросов
+inline_result_cache = InlineResultCache()
+
+
+def parse_offset(offset: str) -> int:
+    """Позиция страницы результатов из offset inline-запроса"""
+    try:
+        return max(int(offset), 0)
+    except ValueError:
+        return 0
+
+
+@router.inline_query()
+async def inline_quote_search(inline_query: InlineQuery):
+    """
+    Поиск по избранному и показанным ботом цитатам
+
+    Бан, регистрацию, аналитику и лимит частоты проверяет ContextMiddleware.
+    """
+    user_id = inline_query.from_user.id
+    results = inline_result_cache.get_results(user_id, inline_query.query)
+    offset = parse_offset(inline_query.offset)
+    end = offset + INLINE_RESULTS_PER_PAGE
+    next_offset = str(end) if end < len(results) else ""
+
+    await inline_query.answer(
+        results[offset:end],
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=next_offset
+    )
@@ -1,8 +1,9 @@
-from .api_client import get_random_quote, ZenQuotesAPIError, clear_cache, get_cache_stats
+from .api_client import get_random_quote, get_random_quotes, ZenQuotesAPIError, clear_cache, get_cache_stats
 from .models import Quote, QuoteList
 
 __all__ = [
     "get_random_quote", 
+    "get_random_quotes",
     "ZenQuotesAPIError", 
     "clear_cache", 
     "get_cache_stats",
@@ -1,9 +1,12 @@
 import asyncio
 import time
-from typing import Optional, Dict, Any, List
+from collections import deque
+from typing import Optional, Dict, Any, List, Deque
 import aiohttp
 import logging
 
+from utils.metrics import CACHE_REQUESTS_TOTAL, ZENQUOTES_ERRORS_TOTAL
+from utils.tracing import traced
 from .models import Quote, QuoteList
 
 # ZenQuotes API URL
@@ -11,11 +14,17 @@ ZENQUOTES_API_URL = "https://zenquotes.io/api"
 
 # Настройка логгера для API клиента
 logger = logging.getLogger(__name__)
+# Записи о каждом успешном запросе к API (сэмплируются, см. LOG_SAMPLING)
+access_logger = logging.getLogger(f"{__name__}.access")
 
 # Кэш для хранения данных
 _cache: Dict[str, Dict[str, Any]] = {}
 CACHE_TTL = 30  # Время жизни кэша в секундах
 
+# Буфер случайных цитат для /quote N: пополняется одним запросом /quotes (50 цитат)
+_quote_buffer: Deque[Quote] = deque()
+_buffer_lock = asyncio.Lock()
+
 
 class ZenQuotesAPIError(Exception):
     """Исключение для ошибок ZenQuotes API"""
@@ -30,8 +39,10 @@ def _is_cache_valid(cache_entry: Dict[str, Any]) -> bool:
 def _get_from_cache(key: str) -> Optional[Any]:
     """Получает данные из кэша, если они валидны"""
     if key in _cache and _is_cache_valid(_cache[key]):
-        logger.info(f"Cache hit for key: {key}")
+        CACHE_REQUESTS_TOTAL.labels("api", "hit").inc()
+        logger.debug("Cache hit for key: %s", key)
         return _cache[key]["data"]
+    CACHE_REQUESTS_TOTAL.labels("api", "miss").inc()
     return None
 
 
@@ -41,9 +52,21 @@ def _save_to_cache(key: str, data: Any) -> None:
         "data": data,
         "timestamp": time.time()
     }
-    logger.info(f"Cached data for key: {key}")
+    logger.debug("Cached data for key: %s", key)
+
 
+def _parse_zen_quote(quote_data: Dict[str, Any]) -> Quote:
+    """Объект цитаты из записи ZenQuotes {"q": текст, "a": автор, "h": html}"""
+    return Quote(
+        _id=f"zen_{hash(quote_data.get('q', ''))}",  # Генерируем ID на основе хеша текста
+        author=quote_data.get("a", "Unknown"),
+        content=quote_data.get("q", ""),
+        tags=[],  # ZenQuotes не предоставляет теги в базовом API
+        length=len(quote_data.get("q", ""))
+    )
 
+
+@traced("zenquotes.random")
 async def get_random_quote() -> Optional[Quote]:
     """
     Получает случайную цитату из ZenQuotes API
@@ -53,7 +76,7 @@ async def get_random_quote() -> Optional[Quote]:
     """
     # Не используем кэш для случайных цитат, чтобы каждый раз получать новую
     url = f"{ZENQUOTES_API_URL}/random"
-    logger.info(f"Requesting random quote from: {url}")
+    logger.debug("Requesting random quote from: %s", url)
     
     try:
         # Настройки таймаута для ZenQuotes
@@ -64,52 +87,121 @@ async def get_random_quote() -> Optional[Quote]:
         )
         
         async with aiohttp.ClientSession(timeout=timeout) as session:
-            logger.info("Attempting to connect to ZenQuotes API...")
+            logger.debug("Attempting to connect to ZenQuotes API...")
             async with session.get(url) as response:
-                logger.info(f"Received response with status: {response.status}")
+                logger.debug("Received response with status: %s", response.status)
                 
                 if response.status == 200:
                     data = await response.json()
-                    logger.info(f"Successfully parsed JSON response: {type(data)}")
+                    logger.debug("Successfully parsed JSON response: %s", type(data))
                     
                     # ZenQuotes API всегда возвращает массив
                     if isinstance(data, list) and len(data) > 0:
-                        quote_data = data[0]
-                          # ZenQuotes использует другую структуру:
-                        # {"q": "quote text", "a": "author", "h": "html"}
-                        quote = Quote(
-                            _id=f"zen_{hash(quote_data.get('q', ''))}",  # Генерируем ID на основе хеша текста
-                            author=quote_data.get("a", "Unknown"),
-                            content=quote_data.get("q", ""),
-                            tags=[],  # ZenQuotes не предоставляет теги в базовом API
-                            length=len(quote_data.get("q", ""))
-                        )
-                        logger.info(f"Successfully fetched random quote by {quote.author}")
+                        quote = _parse_zen_quote(data[0])
+                        access_logger.info("Successfully fetched random quote by %s", quote.author)
                         
                         # Не кэшируем случайные цитаты, чтобы каждый раз получать новую
                         return quote
                     else:
-                        logger.error(f"Unexpected API response format: {type(data)}")
+                        ZENQUOTES_ERRORS_TOTAL.labels("format").inc()
+                        logger.error("Unexpected API response format: %s", type(data))
                         return None
                 else:
-                    logger.error(f"HTTP error {response.status}: {await response.text()}")
+                    ZENQUOTES_ERRORS_TOTAL.labels("http").inc()
+                    logger.error("HTTP error %s: %s", response.status, await response.text())
                     return None
                     
     except asyncio.TimeoutError:
+        ZENQUOTES_ERRORS_TOTAL.labels("timeout").inc()
         logger.error("Request timeout while fetching random quote")
         return None
     except aiohttp.ClientError as e:
-        logger.error(f"Client error while fetching random quote: {e}")
+        ZENQUOTES_ERRORS_TOTAL.labels("client").inc()
+        logger.error("Client error while fetching random quote: %s", e)
         return None
     except Exception as e:
-        logger.error(f"Unexpected error while fetching random quote: {e}")
+        ZENQUOTES_ERRORS_TOTAL.labels("unexpected").inc()
+        logger.error("Unexpected error while fetching random quote: %s", e)
         return None
 
 
+@traced("zenquotes.quotes")
+async def _fetch_quotes_batch() -> List[Quote]:
+    """
+    Получает пачку случайных цитат одним запросом к ZenQuotes API
+    
+    Returns:
+        List[Quote]: Цитаты (пустой список в случае ошибки API)
+    """
+    url = f"{ZENQUOTES_API_URL}/quotes"
+    logger.debug("Requesting quotes batch from: %s", url)
+    
+    try:
+        timeout = aiohttp.ClientTimeout(total=30, connect=10, sock_read=15)
+        
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    ZENQUOTES_ERRORS_TOTAL.labels("http").inc()
+                    logger.error("HTTP error %s: %s", response.status, await response.text())
+                    return []
+                
+                data = await response.json()
+                if not isinstance(data, list):
+                    ZENQUOTES_ERRORS_TOTAL.labels("format").inc()
+                    logger.error("Unexpected API response format: %s", type(data))
+                    return []
+                
+                quotes = [_parse_zen_quote(item) for item in data if isinstance(item, dict) and item.get("q")]
+                access_logger.info("Successfully fetched %d quotes", len(quotes))
+                return quotes
+    
+    except asyncio.TimeoutError:
+        ZENQUOTES_ERRORS_TOTAL.labels("timeout").inc()
+        logger.error("Request timeout while fetching quotes batch")
+        return []
+    except aiohttp.ClientError as e:
+        ZENQUOTES_ERRORS_TOTAL.labels("client").inc()
+        logger.error("Client error while fetching quotes batch: %s", e)
+        return []
+    except Exception as e:
+        ZENQUOTES_ERRORS_TOTAL.labels("unexpected").inc()
+        logger.error("Unexpected error while fetching quotes batch: %s", e)
+        return []
+
+
+async def get_random_quotes(count: int) -> List[Quote]:
+    """
+    Получает несколько случайных цитат из локального буфера
+    
+    Если в буфере не хватает цитат, он пополняется одним запросом к API,
+    поэтому /quote N стоит одного запроса на несколько команд, а не N запросов.
+    
+    Args:
+        count: Количество цитат
+        
+    Returns:
+        List[Quote]: До count разных цитат (меньше, если API недоступен)
+    """
+    async with _buffer_lock:
+        if len(_quote_buffer) < count:
+            buffered_ids = {quote._id for quote in _quote_buffer}
+            for quote in await _fetch_quotes_batch():
+                if quote._id not in buffered_ids:
+                    buffered_ids.add(quote._id)
+                    _quote_buffer.append(quote)
+            CACHE_REQUESTS_TOTAL.labels("quote_buffer", "miss").inc()
+        else:
+            CACHE_REQUESTS_TOTAL.labels("quote_buffer", "hit").inc()
+        
+        return [_quote_buffer.popleft() for _ in range(min(count, len(_quote_buffer)))]
+
+
 def clear_cache() -> None:
     """Очищает весь кэш"""
     global _cache
     _cache.clear()
+    _quote_buffer.clear()
     logger.info("Cache cleared")
 
 
@@ -120,5 +212,6 @@ def get_cache_stats() -> Dict[str, Any]:
         "total_entries": len(_cache),
         "valid_entries": valid_entries,
         "expired_entries": len(_cache) - valid_entries,
-        "cache_ttl": CACHE_TTL
+        "cache_ttl": CACHE_TTL,
+        "buffered_quotes": len(_quote_buffer)
     }
@@ -0,0 +1,180 @@
+"""
+Фоновая рассылка сообщений администратора
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from aiogram import Bot
+
+from config.settings import BROADCAST_PROGRESS_INTERVAL, BROADCAST_WORKERS
+from utils.metrics import (
+    BROADCAST_MESSAGES_TOTAL, BROADCAST_IN_PROGRESS, BROADCAST_TARGET_USERS, BROADCAST_PROGRESS
+)
+from .delivery import delivery_sender
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastBusyError(Exception):
+    """Рассылка уже выполняется"""
+    pass
+
+
+class BroadcastJob:
+    """Состояние одной рассылки: счетчики для прогресса и итогового отчета"""
+
+    def __init__(self, text: str, user_ids: List[int]):
+        """
+        Args:
+            text: Текст рассылки
+            user_ids: Получатели
+        """
+        self.text = text
+        self.user_ids = user_ids
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+
+    @property
+    def total(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def elapsed(self) -> float:
+        """Время рассылки (сек)"""
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def on_result(self, chat_id: int, status: str) -> None:
+        """Учет результата отправки одному получателю"""
+        if status == "sent":
+            self.sent += 1
+            BROADCAST_MESSAGES_TOTAL.labels("sent").inc()
+        else:
+            if status == "blocked":
+                self.blocked += 1
+            else:
+                self.failed += 1
+            BROADCAST_MESSAGES_TOTAL.labels("failed").inc()
+        BROADCAST_PROGRESS.set(self.processed / self.total)
+
+
+# Отображение прогресса: (рассылка, завершена ли) -> корутина
+ProgressCallback = Callable[[BroadcastJob, bool], Awaitable[None]]
+
+
+class BroadcastEngine:
+    """
+    Выполнение рассылки фоновой задачей
+
+    Обработчик подтверждения только запускает рассылку и сразу возвращается.
+    Отправка идет пулом воркеров через общий delivery_sender (лимит Bot API,
+    интервал на чат, повторы после RetryAfter), а прогресс периодически
+    передается в on_progress - обычно это редактирование сообщения
+    администратора. Одновременно выполняется не больше одной рассылки.
+    """
+
+    def __init__(self, workers: int = BROADCAST_WORKERS, progress_interval: float = BROADCAST_PROGRESS_INTERVAL):
+        """
+        Args:
+            workers: Количество одновременных запросов
+            progress_interval: Период обновления прогресса (сек)
+        """
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.job: Optional[BroadcastJob] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self, bot: Bot, text: str, user_ids: List[int], on_progress: ProgressCallback) -> BroadcastJob:
+        """
+        Запуск рассылки
+
+        Args:
+            bot: Экземпляр бота
+            text: Текст рассылки
+            user_ids: Получатели
+            on_progress: Отображение прогресса и итогов
+
+        Returns:
+            BroadcastJob: Запущенная рассылка
+
+        Raises:
+            BroadcastBusyError: Если рассылка уже выполняется
+        """
+        if self.is_running:
+            raise BroadcastBusyError("Broadcast is already running")
+        self.job = BroadcastJob(text, user_ids)
+        self.task = asyncio.create_task(self._run(bot, self.job, on_progress), name="broadcast")
+        logger.info(f"Broadcast started for {len(user_ids)} users")
+        return self.job
+
+    def stop(self) -> bool:
+        """
+        Остановка текущей рассылки
+
+        Returns:
+            bool: True если рассылка выполнялась
+        """
+        if not self.is_running:
+            return False
+        self.job.cancelled = True
+        self.task.cancel()
+        return True
+
+    async def _report(self, job: BroadcastJob, finished: bool, on_progress: ProgressCallback) -> None:
+        """Вызов on_progress без прерывания рассылки при ошибке"""
+        try:
+            await on_progress(job, finished)
+        except Exception as e:
+            logger.warning(f"Failed to update broadcast progress: {e}")
+
+    async def _progress_loop(self, job: BroadcastJob, on_progress: ProgressCallback) -> None:
+        """Периодическое обновление прогресса"""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._report(job, False, on_progress)
+
+    async def _run(self, bot: Bot, job: BroadcastJob, on_progress: ProgressCallback) -> None:
+        """Отправка рассылки всем получателям"""
+        BROADCAST_IN_PROGRESS.set(1)
+        BROADCAST_TARGET_USERS.set(job.total)
+        BROADCAST_PROGRESS.set(0)
+        progress_task = asyncio.create_task(self._progress_loop(job, on_progress))
+        try:
+            messages = ((user_id, job.text, {}) for user_id in job.user_ids)
+            await delivery_sender.fan_out(bot, messages, self.workers, on_result=job.on_result)
+        except asyncio.CancelledError:
+            logger.info(f"Broadcast stopped after {job.processed} of {job.total} users")
+        except Exception as e:
+            logger.error(f"Error during broadcast: {e}")
+        finally:
+            progress_task.cancel()
+            job.finished_at = time.monotonic()
+            BROADCAST_IN_PROGRESS.set(0)
+
+        logger.info(
+            f"Broadcast finished: {job.sent} sent, {job.failed} failed, {job.blocked} blocked "
+            f"in {job.elapsed:.1f}s"
+        )
+        await self._report(job, True, on_progress)
+
+    async def shutdown(self) -> None:
+        """Остановка рассылки при завершении бота"""
+        if self.stop():
+            await asyncio.gather(self.task, return_exceptions=True)
+
+
+# Глобальный движок рассылок
+broadcast_engine = BroadcastEngine()
@@ -0,0 +1,122 @@
+"""
+Планировщик цитаты дня по подпискам
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Iterator, List, Set
+
+from aiogram import Bot
+
+from config.settings import DAILY_QUOTE_BATCH_SIZE, DELIVERY_CONCURRENCY
+from keyboards.inline import get_new_quote_keyboard
+from utils.formatters import format_quote_message
+from utils.localization import get_user_language
+from utils.metrics import DAILY_QUOTES_TOTAL, DAILY_QUOTE_SUBSCRIPTIONS
+from utils.subscriptions import get_subscription_count, pop_due_subscribers, unsubscribe_users
+from utils.user_management import are_users_banned
+from .api_client import get_random_quote, get_random_quotes
+from .delivery import OutgoingMessage, delivery_sender
+from .models import Quote
+from .quote_registry import remember_quote
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_TICK_OFFSET = 0.05  # Просыпаться чуть позже начала минуты (сек)
+
+# Доставки, которые еще идут (несколько минут могут отправляться одновременно)
+_deliveries: Set[asyncio.Task] = set()
+
+
+async def _get_quote_batch(count: int) -> List[Quote]:
+    """Пачка цитат для одной минуты доставки (буфер api_client, затем одиночный запрос)"""
+    quotes = await get_random_quotes(count)
+    if not quotes:
+        quote = await get_random_quote()
+        quotes = [quote] if quote else []
+    return quotes
+
+
+def _build_messages(user_ids: List[int], quotes: List[Quote]) -> Iterator[OutgoingMessage]:
+    """Сообщения подписчикам: цитаты пачки распределяются по кругу"""
+    for position, user_id in enumerate(user_ids):
+        quote = quotes[position % len(quotes)]
+        keyboard = get_new_quote_keyboard(quote._id, get_user_language(user_id))
+        yield user_id, format_quote_message(quote, user_id=user_id), {"reply_markup": keyboard}
+
+
+async def deliver_daily_quotes(bot: Bot, user_ids: List[int]) -> None:
+    """
+    Отправка цитаты дня подписчикам одной минуты
+
+    Args:
+        bot: Экземпляр бота
+        user_ids: ID подписчиков
+    """
+    banned_status = are_users_banned(user_ids)
+    user_ids = [user_id for user_id in user_ids if not banned_status[user_id]]
+    if not user_ids:
+        return
+
+    quotes = await _get_quote_batch(min(len(user_ids), DAILY_QUOTE_BATCH_SIZE))
+    if not quotes:
+        DAILY_QUOTES_TOTAL.labels("failed").inc(len(user_ids))
+        logger.error(f"No quotes available for {len(user_ids)} daily quote subscribers")
+        return
+    # Кнопка "в избранное" находит цитату в реестре без разбора текста
+    for quote in quotes:
+        remember_quote(quote)
+
+    results = await delivery_sender.fan_out(bot, _build_messages(user_ids, quotes), DELIVERY_CONCURRENCY)
+    for status, chat_ids in results.items():
+        if chat_ids:
+            DAILY_QUOTES_TOTAL.labels(status).inc(len(chat_ids))
+
+    # Пользователи, заблокировавшие бота, больше не получают цитату дня
+    if results["blocked"]:
+        unsubscribe_users(results["blocked"])
+        DAILY_QUOTE_SUBSCRIPTIONS.set(get_subscription_count())
+
+    logger.info(
+        f"Daily quote delivered: {len(results['sent'])} sent, "
+        f"{len(results['blocked'])} blocked, {len(results['failed'])} failed"
+    )
+
+
+async def daily_quote_scheduler(bot: Bot) -> None:
+    """
+    Фоновая задача: раз в минуту забирает подписчиков наступившей минуты
+
+    Доставка каждой минуты выполняется отдельной задачей, чтобы долгая
+    отправка не задерживала следующие минуты; общий лимит частоты
+    соблюдает delivery_sender.
+
+    Args:
+        bot: Экземпляр бота
+    """
+    DAILY_QUOTE_SUBSCRIPTIONS.set(get_subscription_count())
+    logger.info(f"Daily quote scheduler started with {get_subscription_count()} subscriptions")
+    try:
+        while True:
+            now = datetime.now(timezone.utc)
+            await asyncio.sleep(60 - now.second - now.microsecond / 1_000_000 + SCHEDULER_TICK_OFFSET)
+
+            try:
+                due = pop_due_subscribers(datetime.now(timezone.utc))
+                if due:
+                    logger.info(f"Starting daily quote delivery to {len(due)} subscribers")
+                    task = asyncio.create_task(deliver_daily_quotes(bot, due))
+                    _deliveries.add(task)
+                    task.add_done_callback(_on_delivery_done)
+            except Exception as e:
+                logger.error(f"Error in daily quote scheduler: {e}")
+    finally:
+        for task in list(_deliveries):
+            task.cancel()
+
+
+def _on_delivery_done(task: asyncio.Task) -> None:
+    """Удаление завершенной доставки и логирование ее ошибки"""
+    _deliveries.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Daily quote delivery failed: {task.exception()}")
@@ -0,0 +1,178 @@
+"""
+Массовая отправка сообщений с ограничением частоты Bot API
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from config.settings import DELIVERY_RATE, DELIVERY_CHAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_MAX_RETRIES = 3  # Повторы одного сообщения после RetryAfter и временных ошибок
+DELIVERY_RETRY_DELAY = 1.0  # Пауза перед повтором после сетевой ошибки (сек)
+CHAT_PACING_SWEEP_SIZE = 10000  # После скольких записей очищать прошедшие слоты чатов
+
+# Сообщение для отправки: (chat_id, текст, доп. параметры send_message)
+OutgoingMessage = Tuple[int, str, Dict[str, Any]]
+# Обработчик результата отправки: (chat_id, статус)
+ResultCallback = Callable[[int, str], None]
+
+
+class TokenBucket:
+    """
+    Асинхронная корзина токенов: acquire() ждет, пока появится токен
+
+    Корзину можно приостановить (pause) - например, на время RetryAfter,
+    который Telegram возвращает при превышении лимита бота целиком.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate: Токенов в секунду
+            burst: Емкость корзины
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    async def acquire(self) -> None:
+        """Ожидание и списание одного токена"""
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Приостановка выдачи токенов
+
+        Args:
+            seconds: Длительность паузы (сек)
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        # Токены не копятся за время паузы: пополнение начнется с ее окончания
+        self.updated_at = self.paused_until
+
+
+class RateLimitedSender:
+    """
+    Отправка сообщений через общую корзину токенов
+
+    Один экземпляр на процесс, чтобы все массовые отправки (цитата дня,
+    рассылки) вместе укладывались в лимит Bot API. Кроме общего лимита
+    соблюдается интервал между сообщениями в один чат. При RetryAfter вся
+    отправка приостанавливается на указанное время, а повторяется только
+    сообщение, получившее ошибку.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, max_retries: int = DELIVERY_MAX_RETRIES,
+                 chat_interval: float = DELIVERY_CHAT_INTERVAL):
+        """
+        Args:
+            rate: Сообщений в секунду
+            burst: Сообщений подряд без ожидания (по умолчанию - rate)
+            max_retries: Максимум повторов одного сообщения
+            chat_interval: Минимальный интервал между сообщениями в один чат (сек)
+        """
+        self.bucket = TokenBucket(rate, burst if burst is not None else rate)
+        self.max_retries = max_retries
+        self.chat_interval = chat_interval
+        self.chat_ready_at: Dict[int, float] = {}  # Когда в чат можно отправить следующее сообщение
+
+    async def _wait_for_chat(self, chat_id: int) -> None:
+        """Ожидание слота чата и резервирование следующего"""
+        now = time.monotonic()
+        ready_at = self.chat_ready_at.get(chat_id, now)
+        if ready_at > now:
+            await asyncio.sleep(ready_at - now)
+            now = time.monotonic()
+        self.chat_ready_at[chat_id] = now + self.chat_interval
+
+        if len(self.chat_ready_at) > CHAT_PACING_SWEEP_SIZE:
+            self.chat_ready_at = {
+                chat: ready for chat, ready in self.chat_ready_at.items() if ready > now
+            }
+
+    async def send(self, bot: Bot, chat_id: int, text: str, **kwargs: Any) -> str:
+        """
+        Отправка одного сообщения
+
+        Args:
+            bot: Экземпляр бота
+            chat_id: ID чата
+            text: Текст сообщения
+            **kwargs: Доп. параметры send_message
+
+        Returns:
+            str: "sent", "blocked" (пользователь заблокировал бота) или "failed"
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_chat(chat_id)
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id, text, **kwargs)
+                return "sent"
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood control while sending to {chat_id}, pausing for {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+                self.chat_ready_at[chat_id] = time.monotonic() + e.retry_after
+            except TelegramForbiddenError:
+                return "blocked"
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning(f"Temporary error while sending to {chat_id} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(DELIVERY_RETRY_DELAY * (attempt + 1))
+            except Exception as e:
+                logger.warning(f"Failed to send message to {chat_id}: {e}")
+                return "failed"
+        logger.warning(f"Giving up sending to {chat_id} after {self.max_retries} retries")
+        return "failed"
+
+    async def fan_out(self, bot: Bot, messages: Iterable[OutgoingMessage], concurrency: int,
+                      on_result: Optional[ResultCallback] = None) -> Dict[str, List[int]]:
+        """
+        Отправка набора сообщений несколькими параллельными воркерами
+
+        Сообщения берутся из итератора по мере отправки, поэтому генератор
+        не держит в памяти все тексты сразу.
+
+        Args:
+            bot: Экземпляр бота
+            messages: Сообщения (chat_id, текст, доп. параметры)
+            concurrency: Количество одновременных запросов
+            on_result: Вызывается после каждой отправки (для прогресса)
+
+        Returns:
+            Dict[str, List[int]]: ID чатов по результату отправки
+        """
+        results: Dict[str, List[int]] = {"sent": [], "blocked": [], "failed": []}
+        iterator = iter(messages)
+
+        async def worker() -> None:
+            for chat_id, text, kwargs in iterator:
+                status = await self.send(bot, chat_id, text, **kwargs)
+                results[status].append(chat_id)
+                if on_result is not None:
+                    on_result(chat_id, status)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        return results
+
+
+# Общий для процесса отправитель массовых сообщений (цитата дня, рассылки)
+delivery_sender = RateLimitedSender(DELIVERY_RATE)
@@ -0,0 +1,38 @@
+"""
+HTTP-эндпоинт /metrics для сбора метрик Prometheus
+"""
+import logging
+
+from aiohttp import web
+
+from utils.metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    """Текущие значения всех метрик"""
+    return web.Response(body=metrics_registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Запуск HTTP-сервера метрик в текущем event loop
+
+    Args:
+        host: Адрес для прослушивания
+        port: Порт
+
+    Returns:
+        web.AppRunner: Запущенный сервер (остановка - await runner.cleanup())
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics server listening on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,109 @@
+"""
+Реестр недавно показанных цитат
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from utils.metrics import CACHE_REQUESTS_TOTAL
+from .models import Quote
+from .quote_search import index_quote
+
+logger = logging.getLogger(__name__)
+
+RECENT_QUOTES_TTL = 24 * 60 * 60  # Сколько помнить показанную цитату (сек)
+RECENT_QUOTES_MAX_SIZE = 10000  # Максимум цитат в реестре
+
+
+class RecentQuoteRegistry:
+    """
+    Ограниченный по размеру и времени жизни реестр показанных цитат по ID
+
+    Записи хранятся в порядке показа, поэтому устаревшие и лишние
+    вытесняются с начала OrderedDict, а поиск по ID - одно обращение к словарю.
+    """
+
+    def __init__(self, ttl: float = RECENT_QUOTES_TTL, max_size: int = RECENT_QUOTES_MAX_SIZE):
+        """
+        Args:
+            ttl: Время жизни записи (сек)
+            max_size: Максимальное количество цитат
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.quotes: "OrderedDict[str, Tuple[float, Quote]]" = OrderedDict()
+
+    def remember(self, quote: Quote) -> None:
+        """
+        Запоминание показанной цитаты
+
+        Args:
+            quote: Цитата, отправленная пользователю
+        """
+        now = time.monotonic()
+        self.quotes[quote._id] = (now + self.ttl, quote)
+        self.quotes.move_to_end(quote._id)
+        self._evict(now)
+
+    def get(self, quote_id: str) -> Optional[Quote]:
+        """
+        Поиск недавно показанной цитаты
+
+        Args:
+            quote_id: ID цитаты
+
+        Returns:
+            Optional[Quote]: Цитата или None, если ее нет или запись устарела
+        """
+        entry = self.quotes.get(quote_id)
+        if entry is None or entry[0] <= time.monotonic():
+            CACHE_REQUESTS_TOTAL.labels("recent_quotes", "miss").inc()
+            return None
+        CACHE_REQUESTS_TOTAL.labels("recent_quotes", "hit").inc()
+        return entry[1]
+
+    def _evict(self, now: float) -> None:
+        """Удаление устаревших записей и записей сверх лимита"""
+        while self.quotes:
+            expires_at, _ = next(iter(self.quotes.values()))
+            if expires_at > now and len(self.quotes) <= self.max_size:
+                break
+            self.quotes.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Статистика реестра
+
+        Returns:
+            Dict[str, float]: Размер, лимит и время жизни записей
+        """
+        return {"size": len(self.quotes), "max_size": self.max_size, "ttl": self.ttl}
+
+
+# Глобальный реестр показанных цитат
+recent_quotes = RecentQuoteRegistry()
+
+
+def remember_quote(quote: Quote) -> None:
+    """
+    Удобная функция запоминания показанной цитаты (и добавления в поиск)
+
+    Args:
+        quote: Цитата, отправленная пользователю
+    """
+    recent_quotes.remember(quote)
+    index_quote(quote)
+
+
+def get_recent_quote(quote_id: str) -> Optional[Quote]:
+    """
+    Удобная функция поиска недавно показанной цитаты
+
+    Args:
+        quote_id: ID цитаты
+
+    Returns:
+        Optional[Quote]: Цитата или None
+    """
+    return recent_quotes.get(quote_id)
@@ -0,0 +1,223 @@
+"""
+Полнотекстовый поиск цитат для inline-режима
+"""
+import logging
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.storage import FavoritesVersion, get_favorites_version, get_user_favorites
+from .models import Quote
+
+logger = logging.getLogger(__name__)
+
+CORPUS_MAX_SIZE = 20000  # Максимум цитат в индексе показанных цитат
+FAVORITES_INDEX_CACHE_SIZE = 1000  # Сколько индексов избранного держать в памяти
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Разбиение текста на слова для индекса
+
+    Args:
+        text: Текст
+
+    Returns:
+        List[str]: Слова в нижнем регистре
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class QuoteSearchIndex:
+    """
+    Инвертированный индекс цитат: слово -> ID цитат
+
+    Все слова запроса, кроме последнего, ищутся точно, последнее - по
+    префиксу (пользователь еще печатает) через бинарный поиск в отсортированном
+    словаре. Результаты упорядочены от последних добавленных цитат.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        """
+        Args:
+            max_size: Максимум цитат (старые вытесняются), None - без ограничения
+        """
+        self.max_size = max_size
+        self.quotes: "OrderedDict[str, Quote]" = OrderedDict()
+        self.postings: Dict[str, Set[str]] = {}
+        self.vocabulary: List[str] = []  # Отсортированные слова для поиска по префиксу
+        self._tokens: Dict[str, Set[str]] = {}
+        self._order: Dict[str, int] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self.quotes)
+
+    def add(self, quote: Quote) -> None:
+        """
+        Добавление (или поднятие наверх) цитаты
+
+        Args:
+            quote: Цитата
+        """
+        self._sequence += 1
+        self._order[quote._id] = self._sequence
+        if quote._id in self.quotes:
+            self.quotes.move_to_end(quote._id)
+            return
+
+        tokens = set(tokenize(f"{quote.content} {quote.author} {' '.join(quote.tags)}"))
+        self.quotes[quote._id] = quote
+        self._tokens[quote._id] = tokens
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                insort(self.vocabulary, token)
+            ids.add(quote._id)
+
+        if self.max_size is not None and len(self.quotes) > self.max_size:
+            self.remove(next(iter(self.quotes)))
+
+    def remove(self, quote_id: str) -> None:
+        """
+        Удаление цитаты из индекса
+
+        Args:
+            quote_id: ID цитаты
+        """
+        if self.quotes.pop(quote_id, None) is None:
+            return
+        self._order.pop(quote_id, None)
+        for token in self._tokens.pop(quote_id, ()):
+            ids = self.postings[token]
+            ids.discard(quote_id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def _prefix_ids(self, prefix: str) -> Set[str]:
+        """ID цитат со словами, начинающимися с префикса"""
+        ids: Set[str] = set()
+        index = bisect_left(self.vocabulary, prefix)
+        while index < len(self.vocabulary) and self.vocabulary[index].startswith(prefix):
+            ids |= self.postings[self.vocabulary[index]]
+            index += 1
+        return ids
+
+    def search(self, query: str, limit: int) -> List[Quote]:
+        """
+        Поиск цитат по словам запроса
+
+        Args:
+            query: Текст запроса (пустой - последние цитаты)
+            limit: Максимум результатов
+
+        Returns:
+            List[Quote]: Найденные цитаты, сначала последние добавленные
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return list(reversed(self.quotes.values()))[:limit]
+
+        candidate_sets = [self.postings.get(token, set()) for token in tokens[:-1]]
+        candidate_sets.append(self._prefix_ids(tokens[-1]))
+        candidate_sets.sort(key=len)
+        ids = set(candidate_sets[0])
+        for other in candidate_sets[1:]:
+            if not ids:
+                break
+            ids &= other
+
+        ordered = sorted(ids, key=self._order.__getitem__, reverse=True)[:limit]
+        return [self.quotes[quote_id] for quote_id in ordered]
+
+
+# Индекс цитат, показанных ботом (пополняется из services.quote_registry)
+corpus_index = QuoteSearchIndex(max_size=CORPUS_MAX_SIZE)
+
+# Индексы избранного: user_id -> (версия избранного, индекс)
+_favorites_indexes: "OrderedDict[int, Tuple[FavoritesVersion, QuoteSearchIndex]]" = OrderedDict()
+
+
+def _favorite_to_quote(quote_dict: Dict) -> Optional[Quote]:
+    """Объект цитаты из записи избранного"""
+    quote_id = quote_dict.get('_id') or quote_dict.get('id')
+    if not quote_id:
+        return None
+    return Quote(
+        _id=quote_id,
+        author=quote_dict.get('author') or "",
+        content=quote_dict.get('content') or "",
+        tags=list(quote_dict.get('tags') or [])
+    )
+
+
+def _build_index(quotes: Iterable[Optional[Quote]]) -> QuoteSearchIndex:
+    """Индекс по набору цитат"""
+    index = QuoteSearchIndex()
+    for quote in quotes:
+        if quote is not None:
+            index.add(quote)
+    return index
+
+
+def get_favorites_index(user_id: int) -> QuoteSearchIndex:
+    """
+    Индекс избранного пользователя (перестраивается при изменении избранного)
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        QuoteSearchIndex: Индекс избранных цитат
+    """
+    version = get_favorites_version(user_id)
+    cached = _favorites_indexes.get(user_id)
+    if cached is not None and cached[0] == version:
+        _favorites_indexes.move_to_end(user_id)
+        return cached[1]
+
+    index = _build_index(_favorite_to_quote(quote) for quote in get_user_favorites(user_id))
+    _favorites_indexes[user_id] = (version, index)
+    _favorites_indexes.move_to_end(user_id)
+    if len(_favorites_indexes) > FAVORITES_INDEX_CACHE_SIZE:
+        _favorites_indexes.popitem(last=False)
+    return index
+
+
+def index_quote(quote: Quote) -> None:
+    """
+    Добавление показанной цитаты в индекс поиска
+
+    Args:
+        quote: Цитата
+    """
+    corpus_index.add(quote)
+
+
+def search_quotes(user_id: int, query: str, limit: int) -> List[Quote]:
+    """
+    Поиск цитат для пользователя: сначала избранное, затем показанные ботом цитаты
+
+    Args:
+        user_id: ID пользователя
+        query: Текст запроса
+        limit: Максимум результатов
+
+    Returns:
+        List[Quote]: Найденные цитаты без повторов
+    """
+    results = get_favorites_index(user_id).search(query, limit)
+    seen = {quote._id for quote in results}
+    if len(results) < limit:
+        for quote in corpus_index.search(query, limit):
+            if quote._id not in seen:
+                results.append(quote)
+                seen.add(quote._id)
+                if len(results) >= limit:
+                    break
+    return results
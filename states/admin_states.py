@@ -13,6 +13,7 @@ class BroadcastState(StatesGroup):
 class BanState(StatesGroup):
     """Состояния для блокировки пользователей"""
     waiting_for_user_id = State()
+    waiting_for_duration = State()
     waiting_for_confirmation = State()
 
 
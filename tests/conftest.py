@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Лог тестов пишется во временную директорию, а не в bot.log рабочей копии
+_workdir = tempfile.mkdtemp(prefix="tests_")
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", os.path.join(_workdir, "bot.log"))
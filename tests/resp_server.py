@@ -0,0 +1,121 @@
+"""
+Минимальный RESP-сервер для тестов RedisRateLimiter
+
+Понимает AUTH, SELECT, PING, SCRIPT LOAD, EVAL и EVALSHA. Вместо Lua
+выполняется эквивалентная скрипту списания реализация на Python, поэтому
+сервер подходит только для REDIS_CONSUME_SCRIPT.
+"""
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class FakeRedisServer:
+    """RESP-сервер в текущем event loop"""
+
+    def __init__(self, script: str, delay: float = 0.0):
+        """
+        Args:
+            script: Текст скрипта списания (для проверки SHA1 в EVALSHA)
+            delay: Задержка перед ответом на EVAL/EVALSHA (сек)
+        """
+        self.script_sha = hashlib.sha1(script.encode()).hexdigest()
+        self.delay = delay
+        self.loaded_scripts: Set[str] = set()
+        self.data: Dict[bytes, Tuple[float, float]] = {}  # ключ -> (токены, время обновления)
+        self.ttls: Dict[bytes, int] = {}
+        self.commands: List[str] = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.writers: List[asyncio.StreamWriter] = []
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self) -> "FakeRedisServer":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self) -> None:
+        self.drop_connections()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop_connections(self) -> None:
+        """Разрыв всех клиентских соединений (имитация перезапуска сервера)"""
+        for writer in self.writers:
+            writer.close()
+        self.writers = []
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        assert line.startswith(b"*"), line
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self.writers.append(writer)
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                writer.write(await self._execute(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _execute(self, args: List[bytes]) -> bytes:
+        name = args[0].decode().upper()
+        self.commands.append(name)
+        if name in ("AUTH", "SELECT", "PING"):
+            return b"+OK\r\n"
+        if name == "SCRIPT":
+            self.loaded_scripts.add(self.script_sha)
+            return b"$%d\r\n%s\r\n" % (len(self.script_sha), self.script_sha.encode())
+        if name == "EVALSHA" and args[1].decode() not in self.loaded_scripts:
+            return b"-NOSCRIPT No matching script. Please use EVAL.\r\n"
+        if name in ("EVAL", "EVALSHA"):
+            if name == "EVAL":
+                self.loaded_scripts.add(self.script_sha)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                return b":%d\r\n" % self._consume(args[2:])
+            finally:
+                self.in_flight -= 1
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    def _consume(self, args: List[bytes]) -> int:
+        """Python-версия REDIS_CONSUME_SCRIPT"""
+        count = int(args[0])
+        keys = args[1:1 + count]
+        argv = [float(value) for value in args[1 + count:]]
+        now, ttl = argv[0], int(argv[1])
+        values = []
+        for i, key in enumerate(keys):
+            burst, rate = argv[2 + i * 2], argv[3 + i * 2]
+            value = burst
+            if key in self.data:
+                tokens, updated_at = self.data[key]
+                value = min(burst, tokens + max(now - updated_at, 0) * rate)
+            values.append(value)
+        allowed = all(value >= 1 for value in values)
+        for key, value in zip(keys, values):
+            self.data[key] = (value - 1 if allowed else value, now)
+            self.ttls[key] = ttl
+        return 1 if allowed else 0
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_benchmark(module, *args):
+    result = subprocess.run(
+        [sys.executable, "-m", module, *args], cwd=ROOT, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+@pytest.mark.parametrize("module, args, unit", [
+    ("benchmarks.middleware_overhead", ("--updates", "200", "--users", "20"), "us/update"),
+    ("benchmarks.callback_routing", ("--updates", "50"), "us/callback"),
+])
+def test_benchmark_runs(module, args, unit):
+    # Бенчмарки выполняются на маленьком объеме: проверяется, что они не сломаны
+    assert unit in _run_benchmark(module, *args)
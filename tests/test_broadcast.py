@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+import services.broadcast as broadcast
+from services.broadcast import BroadcastBusyError, BroadcastEngine
+from tests.test_delivery import FakeBot, fast_sender
+
+
+@pytest.fixture(autouse=True)
+def _fast_delivery(monkeypatch):
+    monkeypatch.setattr(broadcast, "delivery_sender", fast_sender())
+
+
+def _progress_log():
+    reports = []
+
+    async def on_progress(job, finished):
+        reports.append((job.processed, finished))
+
+    return reports, on_progress
+
+
+def test_broadcast_counts_sent_and_blocked_users():
+    bot = FakeBot(blocked={3, 7})
+    reports, on_progress = _progress_log()
+
+    async def scenario():
+        engine = BroadcastEngine(workers=4, progress_interval=60)
+        job = engine.start(bot, "hello", list(range(10)), on_progress)
+        await engine.task
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert (job.sent, job.blocked, job.failed) == (8, 2, 0)
+    assert job.finished_at is not None and not job.cancelled
+    assert reports == [(10, True)]
+
+
+def test_stop_cancels_running_broadcast_and_reports_results():
+    bot = FakeBot(delay=0.05)
+    reports, on_progress = _progress_log()
+
+    async def scenario():
+        engine = BroadcastEngine(workers=2, progress_interval=60)
+        job = engine.start(bot, "hello", list(range(100)), on_progress)
+        with pytest.raises(BroadcastBusyError):
+            engine.start(bot, "again", [1], on_progress)
+        await asyncio.sleep(0.12)
+        assert engine.stop()
+        await asyncio.gather(engine.task, return_exceptions=True)
+        return engine, job
+
+    engine, job = asyncio.run(scenario())
+
+    assert job.cancelled
+    assert not engine.is_running
+    assert 0 < job.processed < job.total
+    assert len(bot.calls) < job.total
+    assert reports == [(job.processed, True)]
+    assert engine.stop() is False
@@ -0,0 +1,55 @@
+import asyncio
+
+from aiogram.types import InlineQuery, User
+
+import middlewares.context as context
+from middlewares.context import ContextMiddleware
+from middlewares.logger import ThrottlingMiddleware
+
+
+def _inline_query(user_id: int) -> InlineQuery:
+    user = User(id=user_id, is_bot=False, first_name="Test")
+    return InlineQuery(id="1", from_user=user, query="quote", offset="")
+
+
+def _capture_answers(monkeypatch):
+    answers = []
+
+    async def answer(self, results, **kwargs):
+        answers.append((results, kwargs))
+
+    monkeypatch.setattr(InlineQuery, "answer", answer)
+    return answers
+
+
+def _run(middleware, event, calls):
+    async def handler(event, data):
+        calls.append(data["user_context"].user_id)
+
+    return asyncio.run(middleware(handler, event, {}))
+
+
+def test_banned_inline_query_gets_empty_answer(monkeypatch):
+    answers = _capture_answers(monkeypatch)
+    monkeypatch.setattr(context, "is_user_banned", lambda user_id: True)
+    calls = []
+
+    _run(ContextMiddleware(), _inline_query(1001), calls)
+
+    assert calls == []
+    assert answers == [([], {"cache_time": context.INLINE_CACHE_TIME, "is_personal": True})]
+
+
+def test_throttled_inline_query_gets_empty_answer(monkeypatch):
+    answers = _capture_answers(monkeypatch)
+    monkeypatch.setattr(context, "is_user_banned", lambda user_id: False)
+    monkeypatch.setattr(context, "register_user", lambda **kwargs: None)
+    throttling = ThrottlingMiddleware(limits={"inline": (1, 0.001)})
+    middleware = ContextMiddleware(throttling)
+    calls = []
+
+    _run(middleware, _inline_query(1002), calls)
+    _run(middleware, _inline_query(1002), calls)
+
+    assert calls == [1002]
+    assert answers == [([], {"cache_time": 0, "is_personal": True})]
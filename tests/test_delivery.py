@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from services.delivery import RateLimitedSender, TokenBucket
+
+
+class FakeBot:
+    """Бот без сети: ошибки отправки задаются по chat_id"""
+
+    def __init__(self, retry_after=None, blocked=(), delay=0.0):
+        self.retry_after = dict(retry_after or {})  # chat_id -> секунд RetryAfter (один раз)
+        self.blocked = set(blocked)
+        self.delay = delay
+        self.calls = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append((chat_id, time.monotonic()))
+        await asyncio.sleep(self.delay)
+        method = SendMessage(chat_id=chat_id, text=text)
+        if chat_id in self.retry_after:
+            raise TelegramRetryAfter(method=method, message="Flood control", retry_after=self.retry_after.pop(chat_id))
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method=method, message="bot was blocked by the user")
+
+
+def fast_sender():
+    return RateLimitedSender(rate=1000, chat_interval=0)
+
+
+def test_pause_does_not_refill_tokens_during_the_pause():
+    async def scenario():
+        bucket = TokenBucket(rate=10, burst=10)
+        for _ in range(10):
+            await bucket.acquire()
+        bucket.pause(0.2)
+        started = time.monotonic()
+        await bucket.acquire()
+        resumed = time.monotonic() - started
+        # После паузы корзина пуста: второй токен набирается еще 1/rate секунды
+        await bucket.acquire()
+        return resumed, time.monotonic() - started
+
+    resumed, second = asyncio.run(scenario())
+
+    assert resumed >= 0.2
+    assert second >= 0.2 + 0.09
+
+
+def test_retry_after_pauses_all_sending_and_retries_the_message():
+    bot = FakeBot(retry_after={1: 1})
+    sender = fast_sender()
+
+    async def scenario():
+        messages = ((chat_id, "text", {}) for chat_id in (1, 2, 3))
+        return await sender.fan_out(bot, messages, concurrency=1)
+
+    results = asyncio.run(scenario())
+
+    assert results == {"sent": [1, 2, 3], "blocked": [], "failed": []}
+    assert [chat_id for chat_id, _ in bot.calls] == [1, 1, 2, 3]
+    sent_at = [at for _, at in bot.calls]
+    # Повтор и следующие чаты ждут окончания паузы
+    assert sent_at[1] - sent_at[0] >= 1
+    assert sent_at[2] >= sent_at[1]
+
+
+def test_blocked_users_are_reported_without_retries():
+    bot = FakeBot(blocked={2, 4})
+
+    results = asyncio.run(fast_sender().fan_out(bot, ((chat_id, "text", {}) for chat_id in range(1, 6)), 2))
+
+    assert sorted(results["blocked"]) == [2, 4]
+    assert sorted(results["sent"]) == [1, 3, 5]
+    assert len(bot.calls) == 5
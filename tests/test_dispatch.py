@@ -0,0 +1,53 @@
+import asyncio
+
+from aiogram import Router
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, User
+
+from routers.dispatch import CallbackDispatcher
+
+
+class NumberAction(CallbackData, prefix="t"):
+    value: int
+
+
+class TextAction(CallbackData, prefix="t"):
+    value: str
+    extra: str
+
+
+def _callback(data: str) -> CallbackQuery:
+    user = User(id=1, is_bot=False, first_name="Test")
+    return CallbackQuery(id="1", from_user=user, chat_instance="chat", data=data)
+
+
+def _dispatcher():
+    dispatcher = CallbackDispatcher(Router())
+
+    @dispatcher.route(NumberAction)
+    async def number_handler(callback, callback_data):
+        return "number"
+
+    @dispatcher.route(TextAction)
+    async def text_handler(callback, callback_data):
+        return "text"
+
+    return dispatcher
+
+
+def test_match_tries_next_route_when_unpack_fails():
+    # "t:abc:def" не распаковывается в NumberAction, но подходит TextAction
+    kwargs = asyncio.run(_dispatcher()._match(_callback("t:abc:def")))
+
+    assert kwargs["callback_data"] == TextAction(value="abc", extra="def")
+    assert kwargs["handler"].callback.__name__ == "text_handler"
+
+
+def test_match_uses_first_route_that_unpacks():
+    kwargs = asyncio.run(_dispatcher()._match(_callback("t:42")))
+
+    assert kwargs["callback_data"] == NumberAction(value=42)
+
+
+def test_match_rejects_data_no_route_accepts():
+    assert asyncio.run(_dispatcher()._match(_callback("t:a:b:c"))) is False
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from utils.metrics import Counter, Histogram, MetricsRegistry, _Metric
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("abstract_metric", "Abstract", registry=MetricsRegistry())
+
+
+def test_counter_is_thread_safe():
+    counter = Counter("test_events_total", "Test events", ("source",), registry=MetricsRegistry())
+
+    def worker():
+        for _ in range(20000):
+            counter.labels("thread").inc()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.labels("thread").value == 80000
+    assert 'test_events_total{source="thread"} 80000' in counter.collect()
+
+
+def test_histogram_is_thread_safe():
+    histogram = Histogram("test_duration_seconds", "Test durations", buckets=(0.1, 1.0), registry=MetricsRegistry())
+
+    def worker():
+        for _ in range(20000):
+            histogram.observe(0.5)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts, total, count = histogram.labels().snapshot()
+    assert counts == [0, 80000, 0]
+    assert count == 80000 and total == 40000
+    assert 'test_duration_seconds_bucket{le="+Inf"} 80000' in histogram.collect()
@@ -0,0 +1,167 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from tests.resp_server import FakeRedisServer
+from utils.rate_limiter import (
+    REDIS_CONSUME_SCRIPT, MemoryRateLimiter, RateLimiterBackend, RedisRateLimiter, SQLiteRateLimiter,
+    create_rate_limiter
+)
+
+
+async def _consume_many(limiter, buckets, count):
+    return [await limiter.consume(buckets) for _ in range(count)]
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimiterBackend()
+
+
+def test_memory_limiter_checks_all_buckets():
+    limiter = MemoryRateLimiter()
+    buckets = [("1:message", 3, 0.0), ("1:cmd:quote", 2, 0.0)]
+
+    results = asyncio.run(_consume_many(limiter, buckets, 4))
+
+    assert results == [True, True, False, False]
+    # Отказ не списывает токен из корзины, где он еще был
+    assert limiter.buckets["1:message"].tokens == 1
+
+
+def test_sqlite_limiter_shares_buckets_between_instances(tmp_path):
+    path = str(tmp_path / "rate.sqlite3")
+
+    async def scenario():
+        first, second = SQLiteRateLimiter(path), SQLiteRateLimiter(path)
+        try:
+            buckets = [("1:message", 2, 0.0)]
+            return [await first.consume(buckets), await second.consume(buckets), await first.consume(buckets)]
+        finally:
+            await first.close()
+            await second.close()
+
+    assert asyncio.run(scenario()) == [True, True, False]
+
+
+def test_sqlite_limiter_fails_open_when_locked(tmp_path):
+    path = str(tmp_path / "rate.sqlite3")
+
+    async def scenario():
+        limiter = SQLiteRateLimiter(path, busy_timeout_ms=20)
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.monotonic()
+            allowed = await limiter.consume([("1:message", 1, 0.0)])
+            return allowed, time.monotonic() - started
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+            await limiter.close()
+
+    allowed, elapsed = asyncio.run(scenario())
+    assert allowed is True
+    assert elapsed < 0.5
+
+
+def test_sqlite_limiter_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / "rate.sqlite3")
+
+    async def scenario():
+        limiter = SQLiteRateLimiter(path, busy_timeout_ms=300)
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        try:
+            await limiter.consume([("1:message", 1, 0.0)])
+        finally:
+            ticker_task.cancel()
+            other.execute("ROLLBACK")
+            other.close()
+            await limiter.close()
+        return ticks
+
+    # Пока поток ждет блокировку, event loop продолжает работать
+    assert asyncio.run(scenario()) >= 5
+
+
+def test_redis_limiter_against_resp_server():
+    async def scenario():
+        server = await FakeRedisServer(REDIS_CONSUME_SCRIPT).start()
+        limiter = RedisRateLimiter(f"redis://:secret@127.0.0.1:{server.port}/2")
+        try:
+            buckets = [("1:message", 2, 0.5), ("1:cmd:quote", 5, 0.5)]
+            results = await _consume_many(limiter, buckets, 3)
+        finally:
+            await limiter.close()
+            await server.stop()
+        return server, results
+
+    server, results = asyncio.run(scenario())
+    assert results == [True, True, False]
+    assert server.commands[:2] == ["AUTH", "SELECT"]
+    # Первый EVALSHA получает NOSCRIPT, дальше скрипт уже загружен
+    assert server.commands[2:5] == ["EVALSHA", "EVAL", "EVALSHA"]
+    assert set(server.data) == {b"ratelimit:1:message", b"ratelimit:1:cmd:quote"}
+    assert server.ttls[b"ratelimit:1:cmd:quote"] == 11
+
+
+def test_redis_limiter_runs_checks_concurrently():
+    async def scenario():
+        server = await FakeRedisServer(REDIS_CONSUME_SCRIPT, delay=0.05).start()
+        limiter = RedisRateLimiter(f"redis://127.0.0.1:{server.port}/0", pool_size=4)
+        try:
+            started = time.monotonic()
+            results = await asyncio.gather(*(
+                limiter.consume([(f"{user_id}:message", 1, 1.0)]) for user_id in range(8)
+            ))
+            elapsed = time.monotonic() - started
+        finally:
+            await limiter.close()
+            await server.stop()
+        return server, results, elapsed
+
+    server, results, elapsed = asyncio.run(scenario())
+    assert all(results)
+    assert server.connections == 4
+    assert server.max_in_flight == 4
+    # 8 запросов по 50 мс через 4 соединения - две волны, а не восемь подряд
+    assert elapsed < 0.3
+
+
+def test_redis_limiter_reconnects_after_connection_loss():
+    async def scenario():
+        server = await FakeRedisServer(REDIS_CONSUME_SCRIPT).start()
+        limiter = RedisRateLimiter(f"redis://127.0.0.1:{server.port}/0")
+        buckets = [("1:message", 10, 1.0)]
+        try:
+            assert await limiter.consume(buckets)
+            server.drop_connections()
+            await asyncio.sleep(0.01)
+            with pytest.raises((ConnectionError, OSError, asyncio.IncompleteReadError)):
+                await limiter.consume(buckets)
+            # Сломанное соединение не возвращается в пул
+            return await limiter.consume(buckets), server.connections
+        finally:
+            await limiter.close()
+            await server.stop()
+
+    allowed, connections = asyncio.run(scenario())
+    assert allowed is True
+    assert connections == 2
+
+
+def test_create_rate_limiter_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        create_rate_limiter("memcached")
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import utils.favorites_pages as favorites_pages
+import utils.storage as storage
+from utils.favorites_pages import FavoritesPageCache
+
+
+@pytest.fixture
+def favorites_file(tmp_path, monkeypatch):
+    path = tmp_path / "quotes.json"
+    monkeypatch.setattr(storage, "STORAGE_PATH", str(path))
+    return path
+
+
+def _quote(quote_id):
+    return {"_id": quote_id, "content": f"Quote {quote_id}", "author": "Author"}
+
+
+def test_favorites_version_changes_only_for_the_changed_user(favorites_file):
+    before_a = storage.get_favorites_version(1)
+    before_b = storage.get_favorites_version(2)
+
+    assert storage.add_to_favorites(1, _quote("zen_1"))
+
+    assert storage.get_favorites_version(1) != before_a
+    assert storage.get_favorites_version(2) == before_b
+
+
+def test_evicted_version_reads_as_a_new_version(favorites_file, monkeypatch):
+    monkeypatch.setattr(storage, "FAVORITES_VERSIONS_SIZE", 2)
+    first = storage.get_favorites_version(1)
+    storage.get_favorites_version(2)
+    storage.get_favorites_version(3)
+
+    # Версия пользователя 1 вытеснена: новая не совпадает ни с одной выданной ранее
+    assert storage.get_favorites_version(1) > first
+    assert len(storage._favorites_versions) == 2
+
+
+def test_cached_page_of_other_user_survives_a_change(favorites_file, monkeypatch):
+    reads = []
+
+    def get_user_favorites(user_id):
+        reads.append(user_id)
+        return storage.get_user_favorites(user_id)
+
+    monkeypatch.setattr(favorites_pages, "get_user_favorites", get_user_favorites)
+    monkeypatch.setattr(favorites_pages, "get_user_language", lambda user_id: "en")
+    storage.add_to_favorites(1, _quote("zen_1"))
+    storage.add_to_favorites(2, _quote("zen_2"))
+    cache = FavoritesPageCache()
+    page_b = cache.get_page(2)
+    cache.get_page(1)
+
+    assert storage.add_to_favorites(1, _quote("zen_3"))
+
+    assert cache.get_page(2) is page_b
+    assert cache.get_page(1).text != page_b.text
+    assert reads == [2, 1, 1]
+
+
+def test_async_adds_from_worker_threads_do_not_lose_updates(favorites_file):
+    async def scenario():
+        return await asyncio.gather(*(
+            storage.add_to_favorites_async(user_id, _quote(f"zen_{user_id}")) for user_id in range(10)
+        ))
+
+    assert all(asyncio.run(scenario()))
+    assert all(storage.get_favorites_count(user_id) == 1 for user_id in range(10))
+    assert asyncio.run(storage.add_to_favorites_async(3, _quote("zen_3"))) is False
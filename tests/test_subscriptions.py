@@ -0,0 +1,65 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import utils.subscriptions as subscriptions
+from utils.subscriptions import SubscriptionIndex, resolve_timezone
+
+ZONES = ["UTC", "Europe/Moscow", "America/New_York", "Asia/Kolkata", "+05:45", "-03:00"]
+
+
+def _fill(index: SubscriptionIndex, count: int) -> dict:
+    rng = random.Random(1)
+    expected = {}
+    for user_id in range(count):
+        minute = rng.randrange(subscriptions.MINUTES_PER_DAY)
+        zone_name, zone = resolve_timezone(rng.choice(ZONES))
+        index.add(user_id, minute, zone_name, zone)
+        expected[user_id] = (minute, zone_name, zone)
+    return expected
+
+
+def test_pop_due_delivers_each_of_100k_subscriptions_once_a_day():
+    index = SubscriptionIndex()
+    expected = _fill(index, 100_000)
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+    delivered = {}
+    for step in range(subscriptions.MINUTES_PER_DAY):
+        now = start + timedelta(minutes=step)
+        for user_id in index.pop_due(now):
+            assert user_id not in delivered
+            delivered[user_id] = now
+
+    assert delivered.keys() == expected.keys()
+    # Цитата приходит в минуту подписки по местному времени пользователя
+    for user_id, now in delivered.items():
+        minute, _, zone = expected[user_id]
+        local = now.astimezone(zone)
+        assert local.hour * 60 + local.minute == minute
+
+
+def test_changes_are_flushed_atomically_in_one_write(tmp_path, monkeypatch):
+    path = tmp_path / "subscriptions.json"
+    monkeypatch.setattr(subscriptions, "SUBSCRIPTIONS_PATH", str(path))
+    monkeypatch.setattr(subscriptions, "_index", SubscriptionIndex())
+    monkeypatch.setattr(subscriptions, "_index_dirty", False)
+    _fill(subscriptions._index, 100_000)
+
+    zone_name, zone = resolve_timezone("Europe/Moscow")
+    assert subscriptions.subscribe_user(100_000, 9 * 60, zone_name, zone)
+    assert subscriptions.unsubscribe_users([0, 1, 2]) == 3
+    # До фонового сохранения файл не пишется
+    assert not path.exists()
+
+    asyncio.run(subscriptions.flush_subscriptions_async())
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert len(data) == 100_000 - 3 + 1
+    assert data["100000"] == {"time": "09:00", "timezone": "Europe/Moscow"}
+    assert not (tmp_path / "subscriptions.json.tmp").exists()
+    assert subscriptions._index_dirty is False
+
+    monkeypatch.setattr(subscriptions, "_index", None)
+    assert len(subscriptions._get_index()) == len(data)
@@ -0,0 +1,53 @@
+import asyncio
+
+from utils.task_queue import BackgroundTaskQueue
+
+
+def _job(log, key, step, delay=0.0):
+    async def run():
+        await asyncio.sleep(delay)
+        log.append((key, step))
+    return run
+
+
+def test_slow_key_does_not_block_other_keys():
+    async def scenario():
+        queue = BackgroundTaskQueue(workers=2)
+        log = []
+        queue.submit(1, "slow", _job(log, 1, 0, delay=0.3))
+        queue.submit(1, "next", _job(log, 1, 1))
+        queue.submit(3, "fast", _job(log, 3, 0))
+        await asyncio.sleep(0.1)
+        early = list(log)
+        await queue.stop()
+        return early, log, queue
+
+    early, log, queue = asyncio.run(scenario())
+
+    # Ключ 3 попал бы к тому же воркеру, что и ключ 1, при распределении по модулю
+    assert early == [(3, 0)]
+    assert log == [(3, 0), (1, 0), (1, 1)]
+    assert queue.tasks == {} and queue.queues == {} and queue.pending == 0
+
+
+def test_idle_workers_are_reaped_and_errors_reported():
+    async def scenario():
+        queue = BackgroundTaskQueue(workers=1)
+        errors = []
+
+        async def failing():
+            raise ValueError("boom")
+
+        async def report(error):
+            errors.append(str(error))
+
+        queue.submit(7, "failing", failing, report)
+        await asyncio.sleep(0.05)
+        idle = (dict(queue.tasks), dict(queue.queues))
+        await queue.stop()
+        return errors, idle
+
+    errors, idle = asyncio.run(scenario())
+
+    assert errors == ["boom"]
+    assert idle == ({}, {})
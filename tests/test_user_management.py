@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import utils.user_management as user_management
+
+
+@pytest.fixture
+def users_storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(user_management, "_users_cache", None)
+    monkeypatch.setattr(user_management, "_users_dirty", False)
+    return tmp_path / user_management.USERS_FILE
+
+
+def test_register_user_does_not_write_file(users_storage):
+    user_management.register_user(1, "alice", "Alice")
+    user_management.register_user(2, "bob", "Bob")
+
+    assert not users_storage.exists()
+    assert user_management.get_user_info(1)["username"] == "alice"
+
+
+def test_flush_users_async_writes_atomically(users_storage):
+    user_management.register_user(1, "alice", "Alice")
+
+    asyncio.run(user_management.flush_users_async())
+
+    data = json.loads(users_storage.read_text(encoding="utf-8"))
+    assert data["1"]["username"] == "alice"
+    assert os.listdir(users_storage.parent) == [users_storage.name]
+    assert user_management._users_dirty is False
+
+
+def test_save_user_language_only_marks_registry_dirty(users_storage):
+    user_management.register_user(1, "alice", "Alice")
+    asyncio.run(user_management.flush_users_async())
+    saved = users_storage.read_text(encoding="utf-8")
+
+    assert user_management.save_user_language(1, "en")
+
+    assert user_management.get_saved_language(1) == "en"
+    assert users_storage.read_text(encoding="utf-8") == saved
+    assert user_management._users_dirty is True
+
+
+def test_concurrent_writes_use_separate_temp_files(users_storage):
+    user_management.ensure_storage_dir()
+    snapshots = [{str(user_id): {"username": f"user{user_id}"}} for user_id in range(8)]
+
+    async def scenario():
+        return await asyncio.gather(*(
+            asyncio.to_thread(user_management._write_users_file, snapshot) for snapshot in snapshots
+        ))
+
+    assert all(asyncio.run(scenario()))
+    assert json.loads(users_storage.read_text(encoding="utf-8")) in snapshots
+    assert os.listdir(users_storage.parent) == [users_storage.name]
+
+
+def test_failed_write_keeps_changes_dirty(users_storage, monkeypatch):
+    user_management.register_user(1, "alice", "Alice")
+    monkeypatch.setattr(user_management, "_write_users_file", lambda users_data: False)
+
+    asyncio.run(user_management.flush_users_async())
+
+    assert user_management._users_dirty is True
+
+
+def test_users_flush_scheduler_saves_periodically(users_storage):
+    async def scenario():
+        task = asyncio.create_task(user_management.users_flush_scheduler(interval=0.01))
+        user_management.register_user(1, "alice", "Alice")
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    assert "1" in json.loads(users_storage.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def bans_storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(user_management, "_banned_cache", None)
+    monkeypatch.setattr(user_management, "_banned_mtime", None)
+    monkeypatch.setattr(user_management, "_ban_expiries", {})
+    monkeypatch.setattr(user_management, "_expiry_heap", [])
+    return tmp_path / user_management.BANNED_FILE
+
+
+def test_failed_expiry_save_keeps_bans_and_retries(bans_storage, monkeypatch):
+    assert user_management.ban_user(1, duration=10)
+    assert user_management.ban_user(2)
+    expires_at = user_management.get_ban_expiry(1)
+    save = user_management.save_banned_users
+    monkeypatch.setattr(user_management, "save_banned_users", lambda *args, **kwargs: False)
+
+    assert user_management.expire_bans(now=expires_at + 1) == []
+    assert 1 in user_management._get_banned_set()
+    assert user_management.get_ban_expiry(1) == expires_at
+    assert user_management.get_next_ban_expiry() == expires_at
+
+    monkeypatch.setattr(user_management, "save_banned_users", save)
+    assert user_management.expire_bans(now=expires_at + 1) == [1]
+    assert user_management._get_banned_set() == {2}
+    assert json.loads(bans_storage.read_text(encoding="utf-8"))["banned_users"] == [2]
@@ -0,0 +1,376 @@
+"""
+Оценка уникальных пользователей (DAU/WAU/MAU) на основе HyperLogLog
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Путь к файлу со скетчами
+ANALYTICS_FILE = "storage/analytics.json"
+
+# Точность скетчей: 2^p регистров, относительная ошибка ~1.04/sqrt(2^p)
+USERS_PRECISION = 12  # 4096 байт на день, ошибка ~1.6%
+COMMANDS_PRECISION = 10  # 1024 байта на день и команду, ошибка ~3.3%
+
+ANALYTICS_RETENTION_DAYS = 62  # Сколько дней хранятся дневные скетчи
+ANALYTICS_FLUSH_INTERVAL = 60.0  # Как часто сбрасывать скетчи на диск (сек)
+OTHER_COMMAND = "other"  # Под этим именем учитываются незарегистрированные команды
+
+
+class HyperLogLog:
+    """
+    Вероятностный счетчик уникальных элементов с постоянным объемом памяти
+    """
+    
+    def __init__(self, precision: int = USERS_PRECISION, registers: Optional[bytearray] = None):
+        """
+        Args:
+            precision: Количество бит хэша для выбора регистра (4..16)
+            registers: Готовые регистры (при загрузке из хранилища)
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError(f"Unsupported HyperLogLog precision: {precision}")
+        
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError("Register count does not match precision")
+    
+    @staticmethod
+    def _hash(value: int) -> int:
+        """64-битный хэш значения"""
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+    
+    def add(self, value: int) -> bool:
+        """
+        Добавление элемента
+        
+        Args:
+            value: Элемент (например, ID пользователя)
+        
+        Returns:
+            bool: True если состояние скетча изменилось
+        """
+        hashed = self._hash(value)
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = hashed & ((1 << rest_bits) - 1)
+        # Позиция первой единицы в оставшихся битах
+        rank = rest_bits - rest.bit_length() + 1
+        
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+    
+    def merge(self, other: "HyperLogLog") -> None:
+        """Объединение с другим скетчем той же точности"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def count(self) -> int:
+        """
+        Оценка количества уникальных элементов
+        
+        Returns:
+            int: Оценка мощности множества
+        """
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        
+        # Коррекция для малых значений (линейный подсчет)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        
+        return int(round(estimate))
+    
+    def copy(self) -> "HyperLogLog":
+        """Копия скетча"""
+        return HyperLogLog(self.precision, bytearray(self.registers))
+    
+    def to_string(self) -> str:
+        """Компактное представление для хранения"""
+        return base64.b64encode(bytes(self.registers)).decode('ascii')
+    
+    @classmethod
+    def from_string(cls, precision: int, encoded: str) -> "HyperLogLog":
+        """Восстановление скетча из строки"""
+        return cls(precision, bytearray(base64.b64decode(encoded)))
+
+
+class UniqueUsersAnalytics:
+    """
+    Дневные HLL-скетчи пользователей и команд, объединяемые по запросу
+    """
+    
+    def __init__(self, file_path: str = ANALYTICS_FILE):
+        """
+        Args:
+            file_path: Путь к файлу хранения скетчей
+        """
+        self.file_path = file_path
+        self.users: Dict[str, HyperLogLog] = {}  # день -> скетч
+        self.commands: Dict[str, Dict[str, HyperLogLog]] = {}  # день -> команда -> скетч
+        self.loaded = False
+        self.dirty = False
+        # Команды, для которых ведутся отдельные скетчи (остальные - OTHER_COMMAND)
+        self.known_commands: Set[str] = set()
+    
+    def set_known_commands(self, commands: Iterable[str]) -> None:
+        """
+        Задает команды, которые учитываются по отдельности
+        
+        Args:
+            commands: Имена команд без "/"
+        """
+        self.known_commands = {command.lower() for command in commands}
+    
+    def _ensure_loaded(self) -> None:
+        """Загрузка скетчей из файла при первом обращении"""
+        if self.loaded:
+            return
+        self.loaded = True
+        
+        try:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for day, encoded in data.get("users", {}).items():
+                    self.users[day] = HyperLogLog.from_string(USERS_PRECISION, encoded)
+                for day, commands in data.get("commands", {}).items():
+                    self.commands[day] = {
+                        command: HyperLogLog.from_string(COMMANDS_PRECISION, encoded)
+                        for command, encoded in commands.items()
+                    }
+                logger.info(f"Loaded analytics sketches for {len(self.users)} days")
+        except Exception as e:
+            logger.error(f"Error loading analytics: {e}")
+    
+    def _prune(self) -> None:
+        """Удаление скетчей старше срока хранения"""
+        oldest = (date.today() - timedelta(days=ANALYTICS_RETENTION_DAYS)).isoformat()
+        for day in [day for day in self.users if day < oldest]:
+            del self.users[day]
+        for day in [day for day in self.commands if day < oldest]:
+            del self.commands[day]
+    
+    def record(self, user_id: int, command: Optional[str] = None) -> None:
+        """
+        Учет активности пользователя
+        
+        Скетч на диск здесь не сохраняется - это делает фоновая задача
+        analytics_flush_scheduler.
+        
+        Args:
+            user_id: ID пользователя
+            command: Имя команды без "/" (если событие - команда)
+        """
+        self._ensure_loaded()
+        day = date.today().isoformat()
+        
+        sketch = self.users.get(day)
+        if sketch is None:
+            sketch = self.users[day] = HyperLogLog(USERS_PRECISION)
+            self._prune()
+        if sketch.add(user_id):
+            self.dirty = True
+        
+        if command:
+            # Произвольные /команды не должны создавать новые скетчи
+            if command not in self.known_commands:
+                command = OTHER_COMMAND
+            day_commands = self.commands.setdefault(day, {})
+            command_sketch = day_commands.get(command)
+            if command_sketch is None:
+                command_sketch = day_commands[command] = HyperLogLog(COMMANDS_PRECISION)
+            if command_sketch.add(user_id):
+                self.dirty = True
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        """Копия скетчей для сохранения (снимается в event loop, пока их никто не меняет)"""
+        return {
+            "users": {day: sketch.to_string() for day, sketch in self.users.items()},
+            "commands": {
+                day: {command: sketch.to_string() for command, sketch in commands.items()}
+                for day, commands in self.commands.items()
+            }
+        }
+    
+    @traced("storage.analytics_flush")
+    def _write(self, data: Dict[str, Any]) -> bool:
+        """
+        Атомарная запись снимка скетчей в файл
+        
+        Args:
+            data: Снимок из _snapshot()
+        
+        Returns:
+            bool: True если файл сохранен
+        """
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            tmp_path = f"{self.file_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.file_path)
+            logger.info(f"Saved analytics sketches for {len(data['users'])} days")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving analytics: {e}")
+            return False
+    
+    def flush(self) -> None:
+        """Синхронное сохранение скетчей на диск, если они изменились (при остановке бота)"""
+        if not self.dirty:
+            return
+        self.dirty = False
+        if not self._write(self._snapshot()):
+            self.dirty = True
+    
+    async def flush_async(self) -> None:
+        """Сохранение скетчей в отдельном потоке, чтобы запись не блокировала event loop"""
+        if not self.dirty:
+            return
+        self.dirty = False
+        if not await asyncio.to_thread(self._write, self._snapshot()):
+            self.dirty = True
+    
+    @staticmethod
+    def _days(start: date, end: date) -> List[str]:
+        """Список дней диапазона [start, end] в ISO-формате"""
+        return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+    
+    def unique_users(self, start: date, end: date) -> int:
+        """
+        Оценка уникальных пользователей за диапазон дат
+        
+        Args:
+            start: Первый день диапазона
+            end: Последний день диапазона (включительно)
+        
+        Returns:
+            int: Оценка количества уникальных пользователей
+        """
+        self._ensure_loaded()
+        merged = HyperLogLog(USERS_PRECISION)
+        for day in self._days(start, end):
+            if day in self.users:
+                merged.merge(self.users[day])
+        return merged.count()
+    
+    def unique_users_by_command(self, start: date, end: date) -> List[Tuple[str, int]]:
+        """
+        Оценка уникальных пользователей каждой команды за диапазон дат
+        
+        Args:
+            start: Первый день диапазона
+            end: Последний день диапазона (включительно)
+        
+        Returns:
+            List[Tuple[str, int]]: Пары (команда, уникальных пользователей) по убыванию
+        """
+        self._ensure_loaded()
+        merged: Dict[str, HyperLogLog] = {}
+        for day in self._days(start, end):
+            for command, sketch in self.commands.get(day, {}).items():
+                if command in merged:
+                    merged[command].merge(sketch)
+                else:
+                    merged[command] = sketch.copy()
+        
+        counts = [(command, sketch.count()) for command, sketch in merged.items()]
+        return sorted(counts, key=lambda item: item[1], reverse=True)
+
+
+# Глобальный экземпляр аналитики
+unique_users_analytics = UniqueUsersAnalytics()
+
+
+def record_user_activity(user_id: int, command: Optional[str] = None) -> None:
+    """
+    Учет активности пользователя в дневных скетчах
+    
+    Args:
+        user_id: ID пользователя
+        command: Имя команды без "/" (если событие - команда)
+    """
+    unique_users_analytics.record(user_id, command)
+
+
+def set_known_commands(commands: Iterable[str]) -> None:
+    """
+    Задает зарегистрированные команды бота для учета по командам
+    
+    Args:
+        commands: Имена команд без "/"
+    """
+    unique_users_analytics.set_known_commands(commands)
+
+
+def get_unique_users_stats() -> Dict[str, int]:
+    """
+    Оценки DAU/WAU/MAU
+    
+    Returns:
+        Dict[str, int]: Уникальные пользователи за день, 7 и 30 дней
+    """
+    today = date.today()
+    return {
+        "dau": unique_users_analytics.unique_users(today, today),
+        "wau": unique_users_analytics.unique_users(today - timedelta(days=6), today),
+        "mau": unique_users_analytics.unique_users(today - timedelta(days=29), today)
+    }
+
+
+def get_command_unique_users(days: int = 7) -> List[Tuple[str, int]]:
+    """
+    Уникальные пользователи команд за последние N дней
+    
+    Args:
+        days: Количество дней
+    
+    Returns:
+        List[Tuple[str, int]]: Пары (команда, уникальных пользователей) по убыванию
+    """
+    today = date.today()
+    return unique_users_analytics.unique_users_by_command(today - timedelta(days=days - 1), today)
+
+
+def flush_analytics() -> None:
+    """Принудительное сохранение скетчей (например, при остановке бота)"""
+    unique_users_analytics.flush()
+
+
+async def analytics_flush_scheduler(interval: float = ANALYTICS_FLUSH_INTERVAL) -> None:
+    """
+    Фоновая задача, периодически сохраняющая измененные скетчи
+    
+    Args:
+        interval: Период сохранения (сек)
+    """
+    logger.info("Analytics flush scheduler started")
+    
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            await unique_users_analytics.flush_async()
+        except asyncio.CancelledError:
+            logger.info("Analytics flush scheduler stopped")
+            raise
+        except Exception as e:
+            logger.error(f"Error in analytics flush scheduler: {e}")
@@ -0,0 +1,126 @@
+"""
+Кэш отрисованных страниц избранного
+"""
+import logging
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from keyboards.inline import get_favorites_navigation_keyboard
+from utils.formatters import format_favorites_list
+from utils.localization import get_user_language
+from utils.metrics import CACHE_REQUESTS_TOTAL
+from utils.storage import FavoritesVersion, get_favorites_version, get_user_favorites
+
+logger = logging.getLogger(__name__)
+
+FAVORITES_PER_PAGE = 3  # Количество цитат на странице избранного
+FAVORITES_PAGE_CACHE_SIZE = 2048  # Максимум отрисованных страниц в памяти
+
+# Ключ страницы: (user_id, версия избранного, страница, язык)
+PageKey = Tuple[int, FavoritesVersion, int, str]
+
+
+@dataclass(frozen=True)
+class FavoritesPage:
+    """Отрисованная страница избранного"""
+    text: str
+    keyboard: InlineKeyboardMarkup
+    page: int
+    total_pages: int
+
+
+class FavoritesPageCache:
+    """
+    LRU-кэш текста и клавиатуры страниц избранного
+
+    Ключ содержит версию избранного пользователя, которая увеличивается
+    при каждом изменении, поэтому устаревшие страницы не инвалидируются
+    явно: они перестают запрашиваться и вытесняются по LRU. При попадании
+    избранное не читается из хранилища вовсе.
+    """
+
+    def __init__(self, max_size: int = FAVORITES_PAGE_CACHE_SIZE):
+        """
+        Args:
+            max_size: Сколько страниц держать в памяти
+        """
+        self.max_size = max_size
+        self.pages: "OrderedDict[PageKey, FavoritesPage]" = OrderedDict()
+
+    def get_page(self, user_id: int, page: int = 0) -> Optional[FavoritesPage]:
+        """
+        Получение страницы избранного из кэша или ее отрисовка
+
+        Args:
+            user_id: ID пользователя
+            page: Номер страницы (начиная с 0)
+
+        Returns:
+            Optional[FavoritesPage]: Страница или None, если избранное пусто
+            или страницы с таким номером нет
+        """
+        key = (user_id, get_favorites_version(user_id), page, get_user_language(user_id))
+        cached = self.pages.get(key)
+        if cached is not None:
+            CACHE_REQUESTS_TOTAL.labels("favorites_page", "hit").inc()
+            self.pages.move_to_end(key)
+            return cached
+
+        CACHE_REQUESTS_TOTAL.labels("favorites_page", "miss").inc()
+        favorites = get_user_favorites(user_id)
+        total_pages = math.ceil(len(favorites) / FAVORITES_PER_PAGE)
+        if page < 0 or page >= total_pages:
+            return None
+
+        start_idx = page * FAVORITES_PER_PAGE
+        rendered = FavoritesPage(
+            text=format_favorites_list(favorites, page=page, per_page=FAVORITES_PER_PAGE, user_id=user_id),
+            keyboard=get_favorites_navigation_keyboard(
+                current_page=page,
+                total_pages=total_pages,
+                quotes_on_page=favorites[start_idx:start_idx + FAVORITES_PER_PAGE],
+                user_id=user_id
+            ),
+            page=page,
+            total_pages=total_pages
+        )
+
+        self.pages[key] = rendered
+        if len(self.pages) > self.max_size:
+            self.pages.popitem(last=False)
+        return rendered
+
+    def clear(self) -> None:
+        """Очистка кэша"""
+        self.pages.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Статистика кэша
+
+        Returns:
+            Dict[str, int]: Количество страниц и максимальный размер
+        """
+        return {"size": len(self.pages), "max_size": self.max_size}
+
+
+# Глобальный кэш страниц избранного
+favorites_page_cache = FavoritesPageCache()
+
+
+def get_favorites_page(user_id: int, page: int = 0) -> Optional[FavoritesPage]:
+    """
+    Удобная функция получения страницы избранного
+
+    Args:
+        user_id: ID пользователя
+        page: Номер страницы (начиная с 0)
+
+    Returns:
+        Optional[FavoritesPage]: Страница или None, если ее нет
+    """
+    return favorites_page_cache.get_page(user_id, page)
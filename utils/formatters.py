@@ -2,6 +2,7 @@
 Форматтеры для текстовых сообщений бота
 """
 import math
+import re
 from typing import Dict, Any, List, Optional
 from services.models import Quote
 from utils.localization import get_text
@@ -40,8 +41,12 @@ def format_quote_dict_message(quote_dict: Dict[str, Any], index: Optional[int] =
     Returns:
         str: Отформатированное сообщение с цитатой
     """
-    content = quote_dict.get('content', get_text(user_id, "formatters.no_content"))
-    author = quote_dict.get('author', get_text(user_id, "formatters.unknown_author"))
+    content = quote_dict.get('content')
+    if content is None:
+        content = get_text(user_id, "formatters.no_content")
+    author = quote_dict.get('author')
+    if author is None:
+        author = get_text(user_id, "formatters.unknown_author")
     tags = quote_dict.get('tags', [])
     
     # Добавляем номер цитаты, если указан
@@ -77,15 +82,17 @@ def format_favorites_list(favorites: List[Dict[str, Any]], page: int = 0, per_pa
     end_idx = min(start_idx + per_page, len(favorites))
     
     page_favorites = favorites[start_idx:end_idx]
-    message = f"{get_text(user_id, 'favorites_title')} {get_text(user_id, 'formatters.page_info').format(page=page + 1, total_pages=total_pages)}:\n\n"
+    parts = [
+        f"{get_text(user_id, 'favorites_title')} "
+        f"{get_text(user_id, 'formatters.page_info', page=page + 1, total_pages=total_pages)}:"
+    ]
     
     for i, quote in enumerate(page_favorites, 1):
-        message += format_quote_dict_message(quote, i, user_id) + "\n\n"
+        parts.append(format_quote_dict_message(quote, i, user_id))
     
-    total_text = get_text(user_id, "formatters.total_favorites")
-    message += total_text.format(count=len(favorites))
+    parts.append(get_text(user_id, "formatters.total_favorites", count=len(favorites)))
     
-    return message
+    return "\n\n".join(parts)
 
 
 def truncate_text(text: str, max_length: int = 100) -> str:
@@ -105,6 +112,65 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     return text[:max_length - 3] + "..."
 
 
+DURATION_UNITS = {
+    'm': 60,
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+    'w': 7 * 24 * 60 * 60,
+}
+
+DURATION_PATTERN = re.compile(r'^(\d+)\s*([mhdw])$')
+
+PERMANENT_DURATIONS = {'0', '-', 'навсегда', 'forever'}
+
+
+def parse_duration(text: str) -> Optional[int]:
+    """
+    Разбор длительности вида "30m", "12h", "7d", "2w"
+    
+    Args:
+        text: Строка с длительностью
+        
+    Returns:
+        Optional[int]: Длительность в секундах, 0 для постоянного срока
+        
+    Raises:
+        ValueError: Если строку не удалось разобрать
+    """
+    value = text.strip().lower()
+    if value in PERMANENT_DURATIONS:
+        return 0
+    
+    match = DURATION_PATTERN.match(value)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid duration: {text}")
+    
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """
+    Форматирование длительности для отображения
+    
+    Args:
+        seconds: Длительность в секундах (None или 0 - навсегда)
+        
+    Returns:
+        str: Длительность, например "2 д 3 ч"
+    """
+    if not seconds:
+        return "навсегда"
+    
+    seconds = int(seconds)
+    parts = []
+    for unit_seconds, label in ((86400, "д"), (3600, "ч"), (60, "мин")):
+        if seconds >= unit_seconds:
+            parts.append(f"{seconds // unit_seconds} {label}")
+            seconds %= unit_seconds
+    
+    return " ".join(parts) or "меньше минуты"
+
+
 def format_success_message(action: str, user_id: int = 0, quote_author: Optional[str] = None) -> str:
     """
     Форматирование сообщения об успешном действии
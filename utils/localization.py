@@ -5,7 +5,8 @@
 import json
 import os
 import logging
-from typing import Dict, Any, Optional, Union
+import string
+from typing import Dict, Any, Optional, Set, Tuple, Union
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,42 @@ SUPPORTED_LANGUAGES = {
 
 DEFAULT_LANGUAGE = 'en'
 
+_formatter = string.Formatter()
+
+
+def _flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Преобразование вложенного словаря переводов в {"keyboard.confirm": значение}"""
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _template_fields(text: str) -> Set[str]:
+    """Имена подстановок в шаблоне str.format"""
+    return {field for _, field, _, _ in _formatter.parse(text) if field is not None}
+
+
+def _compile_entry(value: Any) -> Tuple[str, Optional[str]]:
+    """
+    Подготовка перевода к поиску
+    
+    Returns:
+        Tuple[str, Optional[str]]: Текст без форматирования и результат форматирования
+            для строк без подстановок (None - шаблон, форматируется при вызове)
+    """
+    if not isinstance(value, str):
+        text = str(value)
+        return text, text
+    if _template_fields(value):
+        return value, None
+    # Статическая строка: format() только раскрывает {{ и }}
+    return value, value.format() if "{" in value or "}" in value else value
+
+
 class LocalizationManager:
     """Менеджер локализации для управления переводами"""
     
@@ -30,8 +67,10 @@ class LocalizationManager:
         """
         self.locales_dir = Path(locales_dir)
         self.translations: Dict[str, Dict[str, Any]] = {}
-        self.user_languages: Dict[int, str] = {}  # user_id -> language_code
+        # Плоские таблицы с подмешанным языком по умолчанию: язык -> {ключ: (текст, готовая строка)}
+        self.tables: Dict[str, Dict[str, Tuple[str, Optional[str]]]] = {}
         self._load_translations()
+        self._compile_tables()
     
     def _load_translations(self) -> None:
         """Загрузка всех переводов из файлов"""
@@ -47,6 +86,42 @@ class LocalizationManager:
         except Exception as e:
             logger.error(f"Error loading translations: {e}")
     
+    def _compile_tables(self) -> None:
+        """
+        Построение плоских таблиц переводов
+        
+        Ключи языка по умолчанию подмешиваются в остальные языки, поэтому
+        поиск перевода - одно обращение к словарю. Отсутствующие ключи
+        и расхождения подстановок между языками выводятся в лог при загрузке.
+        """
+        flat = {language: _flatten(data) for language, data in self.translations.items()}
+        default = flat.get(DEFAULT_LANGUAGE, {})
+        
+        self.tables = {}
+        for language in SUPPORTED_LANGUAGES:
+            translations = flat.get(language, {})
+            merged = {**default, **translations}
+            self.tables[language] = {key: _compile_entry(value) for key, value in merged.items()}
+            
+            if language == DEFAULT_LANGUAGE:
+                continue
+            
+            missing = sorted(set(default) - set(translations))
+            if missing:
+                logger.warning(f"Language {language} is missing {len(missing)} keys (using {DEFAULT_LANGUAGE}): {', '.join(missing)}")
+            extra = sorted(set(translations) - set(default))
+            if extra:
+                logger.warning(f"Language {language} has keys absent in {DEFAULT_LANGUAGE}: {', '.join(extra)}")
+            mismatched = sorted(
+                key for key in set(translations) & set(default)
+                if isinstance(translations[key], str) and isinstance(default[key], str)
+                and _template_fields(translations[key]) != _template_fields(default[key])
+            )
+            if mismatched:
+                logger.warning(f"Language {language} has placeholders different from {DEFAULT_LANGUAGE}: {', '.join(mismatched)}")
+        
+        logger.info(f"Compiled translation tables: {', '.join(f'{lang}={len(table)}' for lang, table in self.tables.items())}")
+    
     def set_user_language(self, user_id: int, language_code: str) -> bool:
         """
         Установка языка для пользователя
@@ -59,7 +134,11 @@ class LocalizationManager:
             bool: True если язык установлен успешно
         """
         if language_code in SUPPORTED_LANGUAGES:
-            self.user_languages[user_id] = language_code
+            # Импорт внутри функции, чтобы избежать циклических импортов
+            from utils.user_management import save_user_language
+            
+            if not save_user_language(user_id, language_code):
+                logger.warning(f"Language {language_code} for unregistered user {user_id} is not persisted")
             logger.info(f"Set language {language_code} for user {user_id}")
             return True
         return False
@@ -68,13 +147,20 @@ class LocalizationManager:
         """
         Получение языка пользователя
         
+        Язык хранится в записи пользователя, которая уже находится в памяти
+        (см. utils.user_management.load_users), поэтому отдельный кэш не нужен.
+        
         Args:
             user_id: ID пользователя
             
         Returns:
             str: Код языка пользователя или язык по умолчанию
         """
-        return self.user_languages.get(user_id, DEFAULT_LANGUAGE)
+        # Импорт внутри функции, чтобы избежать циклических импортов
+        from utils.user_management import get_saved_language
+        
+        language = get_saved_language(user_id)
+        return language if language in SUPPORTED_LANGUAGES else DEFAULT_LANGUAGE
     
     def get_text(self, user_id: int, key: str, **kwargs) -> str:
         """
@@ -103,31 +189,23 @@ class LocalizationManager:
         Returns:
             str: Переведенный текст
         """
+        # Вложенные ключи (например, 'keyboard.confirm') и fallback на язык
+        # по умолчанию уже разрешены в плоской таблице
+        table = self.tables.get(language) or self.tables.get(DEFAULT_LANGUAGE, {})
+        entry = table.get(key)
+        if entry is None:
+            logger.warning(f"Translation key not found: {key}")
+            return f"[{key}]"
+        
+        text, static = entry
+        if not kwargs:
+            return text
+        if static is not None:
+            return static
+        
         try:
-            # Получаем переводы для языка
-            translations = self.translations.get(language, {})
-            
-            # Поддержка вложенных ключей (например, 'keyboard.confirm')
-            keys = key.split('.')
-            current = translations
-            
-            for k in keys:
-                if isinstance(current, dict) and k in current:
-                    current = current[k]
-                else:
-                    # Fallback на английский, если ключ не найден
-                    if language != DEFAULT_LANGUAGE:
-                        return self._get_translation(DEFAULT_LANGUAGE, key, **kwargs)
-                    else:
-                        logger.warning(f"Translation key not found: {key}")
-                        return f"[{key}]"
-            
             # Форматирование строки с параметрами
-            if isinstance(current, str) and kwargs:
-                return current.format(**kwargs)
-            
-            return str(current)
-            
+            return text.format(**kwargs)
         except Exception as e:
             logger.error(f"Error getting translation for key '{key}': {e}")
             return f"[{key}]"
@@ -158,6 +236,20 @@ def get_text(user_id: int, key: str, **kwargs) -> str:
     """
     return localization_manager.get_text(user_id, key, **kwargs)
 
+def get_language_text(language: str, key: str, **kwargs) -> str:
+    """
+    Получение локализованного текста для языка (без обращения к языку пользователя)
+    
+    Args:
+        language: Код языка
+        key: Ключ перевода
+        **kwargs: Параметры для форматирования
+        
+    Returns:
+        str: Локализованный текст
+    """
+    return localization_manager._get_translation(language, key, **kwargs)
+
 def set_user_language(user_id: int, language_code: str) -> bool:
     """
     Установка языка пользователя
@@ -183,6 +275,21 @@ def get_user_language(user_id: int) -> str:
     """
     return localization_manager.get_user_language(user_id)
 
+def resolve_language(language_code: Optional[str]) -> Optional[str]:
+    """
+    Поддерживаемый язык по коду из настроек Telegram
+    
+    Args:
+        language_code: Код языка IETF (например, 'ru' или 'en-US')
+        
+    Returns:
+        Optional[str]: Код поддерживаемого языка или None
+    """
+    if not language_code:
+        return None
+    language = language_code.split('-', 1)[0].lower()
+    return language if language in SUPPORTED_LANGUAGES else None
+
 def get_supported_languages() -> Dict[str, str]:
     """
     Получение списка поддерживаемых языков
@@ -1,44 +1,170 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
+from typing import Dict, List
 
-# Настройка логирования с поддержкой UTF-8
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
+from config.settings import (
+    LOG_LEVEL, LOG_FILE, LOG_ROTATION, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+    LOG_ROTATE_WHEN, LOG_SAMPLING
 )
+from utils.metrics import COMMANDS_TOTAL
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который только кладет запись в очередь
+
+    Стандартный prepare() форматирует сообщение в вызывающем потоке,
+    здесь подстановка аргументов и форматирование выполняются слушателем.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Фильтр, пропускающий только каждую N-ю запись уровня ниже WARNING
+
+    Используется для горячих INFO-логгеров; предупреждения и ошибки
+    проходят всегда.
+    """
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: Доля пропускаемых записей (0..1], например 0.1 - каждая десятая
+        """
+        super().__init__()
+        self.every = max(int(round(1 / rate)), 1) if rate > 0 else 0
+        self.counter = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        self.counter += 1
+        return self.counter % self.every == 0
+
+
+def _create_file_handler() -> logging.Handler:
+    """Файловый обработчик с ротацией по размеру или по времени"""
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+
+
+def _setup_logging(sampling: Dict[str, float]) -> logging.handlers.QueueListener:
+    """
+    Настройка логирования через очередь
+
+    Обработчики логгеров только кладут записи в очередь, форматирование
+    и запись в файл/консоль выполняет фоновый поток QueueListener.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = _create_file_handler()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
+    root.addHandler(_DeferredQueueHandler(log_queue))
+
+    for logger_name, rate in sampling.items():
+        logging.getLogger(logger_name).addFilter(SamplingFilter(rate))
+
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
+
+# Настройка логирования с поддержкой UTF-8
+_listeners: List[logging.handlers.QueueListener] = [_setup_logging(LOG_SAMPLING)]
 
 logger = logging.getLogger(__name__)
 
 
+def create_file_logger(name: str, file_path: str, max_bytes: int, backup_count: int) -> logging.Logger:
+    """
+    Создание отдельного логгера со своим файлом и фоновым потоком записи
+
+    Записи не попадают в общий лог и пишутся как есть (только сообщение),
+    например, JSON-строки трассировки.
+
+    Args:
+        name: Имя логгера
+        file_path: Путь к файлу
+        max_bytes: Размер файла для ротации
+        backup_count: Количество архивных файлов
+
+    Returns:
+        logging.Logger: Настроенный логгер
+    """
+    file_handler = logging.handlers.RotatingFileHandler(
+        file_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    file_handler.setFormatter(logging.Formatter('%(message)s'))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    file_logger = logging.getLogger(name)
+    file_logger.setLevel(logging.INFO)
+    file_logger.propagate = False
+    file_logger.addHandler(_DeferredQueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    _listeners.append(listener)
+    return file_logger
+
+
+def stop_logging():
+    """Остановка фоновых потоков логирования с записью оставшихся сообщений"""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_logging)
+
+
 def log_command_usage(user_id: int, command: str):
     """Логирование использования команд"""
-    logger.info(f"User {user_id} used /{command}")
+    COMMANDS_TOTAL.labels(command).inc()
+    logger.info("User %s used /%s", user_id, command)
 
 
 def log_api_request(endpoint: str, status: str = "started"):
     """Логирование API запросов"""
-    logger.info(f"API request to {endpoint} - {status}")
+    logger.info("API request to %s - %s", endpoint, status)
 
 
 def log_api_success(endpoint: str, data_type: str, count: int = 1):
     """Логирование успешных API ответов"""
-    logger.info(f"API success: {endpoint} returned {count} {data_type}")
+    logger.info("API success: %s returned %s %s", endpoint, count, data_type)
 
 
 def log_api_error(endpoint: str, error: str):
     """Логирование ошибок API"""
-    logger.error(f"API error: {endpoint} - {error}")
+    logger.error("API error: %s - %s", endpoint, error)
 
 
 def log_cache_hit(cache_key: str):
     """Логирование попадания в кэш"""
-    logger.info(f"Cache hit: {cache_key}")
+    logger.info("Cache hit: %s", cache_key)
 
 
 def log_cache_miss(cache_key: str):
     """Логирование промаха кэша"""
-    logger.info(f"Cache miss: {cache_key}")
+    logger.info("Cache miss: %s", cache_key)
@@ -0,0 +1,289 @@
+"""
+Реестр метрик бота (счетчики, gauge, гистограммы) в текстовом формате Prometheus
+"""
+import logging
+import math
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек по умолчанию (сек)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    """Число в формате Prometheus"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class _CounterChild:
+    """
+    Значение счетчика для одного набора меток
+
+    Счетчики увеличиваются и из других потоков (например, watchdog event
+    loop), поэтому инкремент выполняется под блокировкой.
+    """
+
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    """Значение gauge для одного набора меток"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class _HistogramChild:
+    """
+    Гистограмма для одного набора меток
+
+    Наблюдение - поиск корзины и три сложения без выделения памяти. Длительности
+    операций записываются и из потоков asyncio.to_thread (см. utils.tracing),
+    поэтому наблюдение и снятие значений выполняются под блокировкой.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """Согласованные значения корзин, суммы и количества"""
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Metric(ABC):
+    """Базовый класс метрики с метками"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["MetricsRegistry"] = None):
+        """
+        Args:
+            name: Имя метрики
+            documentation: Описание (строка HELP)
+            labelnames: Имена меток
+            registry: Реестр (по умолчанию - глобальный)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._children_lock = threading.Lock()
+        (registry or metrics_registry).register(self)
+
+    @abstractmethod
+    def _new_child(self):
+        """Новое значение метрики для одного набора меток"""
+
+    def labels(self, *values: str):
+        """
+        Значение метрики для набора меток (создается при первом обращении)
+
+        Args:
+            *values: Значения меток в порядке labelnames
+
+        Returns:
+            Объект со значением метрики
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {values}")
+            # Два потока не должны создать разные значения для одних меток
+            with self._children_lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _label_string(self, values: Tuple[str, ...], extra: str = "") -> str:
+        """Метки в виде {name="value",...}"""
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _collect_samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._label_string(values)} {_format_value(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+    def collect(self) -> List[str]:
+        """Строки метрики в текстовом формате Prometheus"""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ] + self._collect_samples()
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличение счетчика без меток"""
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Значение, которое может расти и уменьшаться"""
+
+    type_name = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        """Установка значения без меток"""
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    """Гистограмма значений с фиксированными границами корзин"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["MetricsRegistry"] = None):
+        """
+        Args:
+            name: Имя метрики
+            documentation: Описание (строка HELP)
+            labelnames: Имена меток
+            buckets: Верхние границы корзин по возрастанию
+            registry: Реестр (по умолчанию - глобальный)
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Наблюдение без меток"""
+        self.labels().observe(value)
+
+    def _collect_samples(self) -> List[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{self._label_string(values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_string(values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_string(values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Реестр метрик"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        """
+        Регистрация метрики
+
+        Args:
+            metric: Метрика с уникальным именем
+        """
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный реестр метрик
+metrics_registry = MetricsRegistry()
+
+# Метрики бота
+UPDATES_TOTAL = Counter("bot_updates_total", "Telegram updates received, by update type", ("type",))
+UPDATE_DURATION = Histogram(
+    "bot_update_duration_seconds", "Time to process a Telegram update, by update type", ("type",)
+)
+COMMANDS_TOTAL = Counter("bot_commands_total", "Bot command invocations", ("command",))
+OPERATION_DURATION = Histogram(
+    "bot_operation_duration_seconds", "Latency of storage and external API operations", ("operation",)
+)
+ZENQUOTES_ERRORS_TOTAL = Counter("bot_zenquotes_errors_total", "Failed ZenQuotes API requests", ("reason",))
+CACHE_REQUESTS_TOTAL = Counter("bot_cache_requests_total", "Cache lookups by result", ("cache", "result"))
+BROADCAST_MESSAGES_TOTAL = Counter(
+    "bot_broadcast_messages_total", "Broadcast messages by delivery status", ("status",)
+)
+BROADCAST_IN_PROGRESS = Gauge("bot_broadcast_in_progress", "1 while a broadcast is being sent")
+BROADCAST_TARGET_USERS = Gauge("bot_broadcast_target_users", "Recipients of the current or last broadcast")
+BROADCAST_PROGRESS = Gauge("bot_broadcast_progress_ratio", "Share of recipients processed in the current broadcast")
+DAILY_QUOTES_TOTAL = Counter("bot_daily_quotes_total", "Daily quote deliveries by status", ("status",))
+DAILY_QUOTE_SUBSCRIPTIONS = Gauge("bot_daily_quote_subscriptions", "Active daily quote subscriptions")
+BACKGROUND_TASKS_TOTAL = Counter(
+    "bot_background_tasks_total", "Background tasks by task name and result", ("task", "result")
+)
+BACKGROUND_QUEUE_SIZE = Gauge("bot_background_queue_size", "Background tasks waiting to run")
+EVENT_LOOP_LAG = Histogram(
+    "bot_event_loop_lag_seconds", "Delay of event loop wakeups beyond the scheduled time",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_STALLS_TOTAL = Counter(
+    "bot_event_loop_stalls_total", "Event loop blockings longer than the watchdog threshold"
+)
+
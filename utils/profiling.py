@@ -0,0 +1,108 @@
+"""
+Профилирование работающего бота по запросу администратора
+"""
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+from datetime import datetime
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR = "storage/profiles"
+PROFILE_MAX_SECONDS = 300  # Максимальная длительность профилирования (сек)
+PROFILE_TOP_FUNCTIONS = 20  # Сколько функций показывать в ответе
+
+# Внутренности event loop, которые не несут информации о нагрузке бота
+_LOOP_INTERNALS = (os.sep + "asyncio" + os.sep, os.sep + "selectors.py")
+
+_profile_lock = asyncio.Lock()
+
+
+class ProfilerBusyError(Exception):
+    """Профилирование уже выполняется"""
+    pass
+
+
+def _short_path(filename: str) -> str:
+    """Путь к файлу относительно проекта или последние два компонента пути"""
+    if filename.startswith(os.getcwd() + os.sep):
+        return os.path.relpath(filename)
+    parts = filename.replace(os.sep, "/").rsplit("/", 2)
+    return "/".join(parts[-2:])
+
+
+def format_top_functions(profiler: cProfile.Profile, top: int = PROFILE_TOP_FUNCTIONS) -> str:
+    """
+    Список функций с наибольшим cumulative time
+
+    Args:
+        profiler: Остановленный профилировщик
+        top: Количество функций
+
+    Returns:
+        str: Строки вида "cumtime tottime вызовы файл:строка(функция)"
+    """
+    stats = pstats.Stats(profiler)
+    rows: List[Tuple[float, float, int, str]] = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        # Ожидание событий в select/epoll - простой event loop, а не нагрузка
+        if any(part in filename for part in _LOOP_INTERNALS) or (filename == "~" and "'select." in name):
+            continue
+        location = f"{_short_path(filename)}:{line}({name})" if filename != "~" else name
+        rows.append((cumtime, tottime, calls, location))
+
+    rows.sort(reverse=True)
+    lines = ["cum ms | own ms | calls | function"]
+    for cumtime, tottime, calls, location in rows[:top]:
+        lines.append(f"{cumtime * 1000:.1f} | {tottime * 1000:.1f} | {calls} | {location}")
+    return "\n".join(lines)
+
+
+def is_profiling() -> bool:
+    """Выполняется ли сейчас профилирование"""
+    return _profile_lock.locked()
+
+
+async def profile_for(seconds: float, top: int = PROFILE_TOP_FUNCTIONS) -> Tuple[str, str]:
+    """
+    Профилирование event loop бота в течение заданного времени
+
+    Используется детерминированный cProfile: он учитывает все вызовы в потоке
+    event loop, то есть обработку всех обновлений за это время.
+
+    Args:
+        seconds: Длительность профилирования (сек)
+        top: Количество функций в сводке
+
+    Returns:
+        Tuple[str, str]: Сводка по функциям и путь к сохраненному файлу профиля
+
+    Raises:
+        ProfilerBusyError: Если профилирование уже выполняется
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusyError("Profiling is already running")
+
+    async with _profile_lock:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Уже активен другой профилировщик (например, внешний)
+            raise ProfilerBusyError(str(e))
+
+        logger.info(f"Profiling started for {seconds} seconds")
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    path = os.path.join(PROFILES_DIR, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+    profiler.dump_stats(path)
+    logger.info(f"Profile saved to {path}")
+
+    return format_top_functions(profiler, top), path
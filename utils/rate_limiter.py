@@ -0,0 +1,421 @@
+"""
+Хранилища корзин токенов для ограничения частоты запросов
+
+Все реализации выполняют атомарную операцию "проверить и списать":
+токен списывается из всех переданных корзин, только если он есть в каждой.
+MemoryRateLimiter хранит состояние в процессе, SQLiteRateLimiter и
+RedisRateLimiter позволяют нескольким процессам бота делить общие лимиты.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Корзина для проверки: (ключ, burst, токенов в секунду)
+BucketSpec = Tuple[str, float, float]
+
+RATE_LIMIT_SWEEP_INTERVAL = 60.0  # Интервал очистки простаивающих корзин (сек)
+SQLITE_BUSY_TIMEOUT_MS = 50  # Сколько ждать блокировку записи другого процесса (мс)
+REDIS_POOL_SIZE = 8  # Максимум одновременных соединений с Redis
+
+
+class RateLimiterBackend(ABC):
+    """Базовый класс хранилища корзин токенов"""
+    
+    @abstractmethod
+    async def consume(self, buckets: Sequence[BucketSpec]) -> bool:
+        """
+        Атомарно проверяет и списывает по одному токену из каждой корзины
+        
+        Args:
+            buckets: Корзины (ключ, burst, токенов в секунду)
+        
+        Returns:
+            bool: True если токены списаны, False если хотя бы одна корзина пуста
+        """
+    
+    async def close(self) -> None:
+        """Освобождение ресурсов"""
+
+
+class TokenBucket:
+    """Состояние корзины токенов одного пользователя для одного типа событий"""
+    
+    __slots__ = ("burst", "rate", "tokens", "updated_at")
+    
+    def __init__(self, burst: float, rate: float, now: float):
+        """
+        Args:
+            burst: Максимальное количество токенов
+            rate: Скорость пополнения (токенов в секунду)
+            now: Текущее время (time.monotonic)
+        """
+        self.burst = burst
+        self.rate = rate
+        self.tokens = burst
+        self.updated_at = now
+    
+    def refill(self, now: float) -> None:
+        """Пополнение токенов за прошедшее время"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def is_full(self, now: float) -> bool:
+        """Полностью ли пополнилась бы корзина к моменту now"""
+        return self.tokens + (now - self.updated_at) * self.rate >= self.burst
+
+
+class MemoryRateLimiter(RateLimiterBackend):
+    """
+    Корзины в памяти процесса
+    
+    Простаивающие корзины, успевшие полностью пополниться, удаляются
+    периодической очисткой, поэтому память ограничена активными пользователями.
+    """
+    
+    def __init__(self, sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL):
+        """
+        Args:
+            sweep_interval: Интервал очистки простаивающих корзин (сек)
+        """
+        self.sweep_interval = sweep_interval
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.last_sweep = time.monotonic()
+    
+    def _sweep(self, now: float) -> None:
+        """Удаление полностью пополнившихся корзин"""
+        idle_keys = [key for key, bucket in self.buckets.items() if bucket.is_full(now)]
+        for key in idle_keys:
+            del self.buckets[key]
+        
+        self.last_sweep = now
+        if idle_keys:
+            logger.debug(f"Rate limiter sweep evicted {len(idle_keys)} idle buckets, {len(self.buckets)} left")
+    
+    async def consume(self, buckets: Sequence[BucketSpec]) -> bool:
+        now = time.monotonic()
+        if now - self.last_sweep >= self.sweep_interval:
+            self._sweep(now)
+        
+        states = []
+        for key, burst, rate in buckets:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(burst, rate, now)
+            else:
+                bucket.refill(now)
+            states.append(bucket)
+        
+        if any(bucket.tokens < 1 for bucket in states):
+            return False
+        
+        for bucket in states:
+            bucket.tokens -= 1
+        return True
+
+
+class SQLiteRateLimiter(RateLimiterBackend):
+    """
+    Корзины в общей SQLite базе для нескольких процессов на одном хосте
+    
+    Проверка и списание выполняются в одной транзакции BEGIN IMMEDIATE,
+    которая берет блокировку записи, поэтому операция атомарна между процессами.
+    Запросы к базе идут в отдельном потоке, чтобы ожидание блокировки другого
+    процесса не останавливало event loop. Блокировка ждется не дольше
+    busy_timeout_ms; если база занята дольше, событие пропускается (fail open).
+    """
+    
+    def __init__(self, path: str, sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL,
+                 busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS):
+        """
+        Args:
+            path: Путь к файлу базы
+            sweep_interval: Интервал очистки простаивающих корзин (сек)
+            busy_timeout_ms: Максимальное ожидание блокировки записи (мс)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self.last_sweep = time.time()
+        # Один поток на соединение: sqlite3 не допускает параллельных запросов через одно соединение
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limiter-sqlite")
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, timeout=busy_timeout_ms / 1000, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # В режиме WAL NORMAL не повреждает базу при сбое, теряются только последние транзакции
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, "
+            "burst REAL NOT NULL, rate REAL NOT NULL)"
+        )
+    
+    def _sweep(self, now: float) -> None:
+        """Удаление полностью пополнившихся корзин"""
+        cursor = self.connection.execute(
+            "DELETE FROM buckets WHERE tokens + (? - updated_at) * rate >= burst", (now,)
+        )
+        self.last_sweep = now
+        if cursor.rowcount:
+            logger.debug(f"Rate limiter sweep evicted {cursor.rowcount} idle buckets")
+    
+    async def consume(self, buckets: Sequence[BucketSpec]) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self._consume, buckets)
+        except sqlite3.OperationalError as e:
+            # База занята другим процессом дольше busy_timeout_ms - не задерживаем событие
+            logger.warning(f"Rate limit store is busy, letting the event through: {e}")
+            return True
+    
+    def _consume(self, buckets: Sequence[BucketSpec]) -> bool:
+        """Транзакция проверки и списания (выполняется в потоке self.executor)"""
+        # Общее для процессов время - wall clock, а не monotonic
+        now = time.time()
+        connection = self.connection
+        
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if now - self.last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            
+            states = []
+            for key, burst, rate in buckets:
+                row = connection.execute(
+                    "SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    tokens = burst
+                else:
+                    tokens = min(burst, row[0] + max(now - row[1], 0) * rate)
+                states.append((key, tokens, burst, rate))
+            
+            allowed = all(tokens >= 1 for _, tokens, _, _ in states)
+            connection.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at, burst, rate) VALUES (?, ?, ?, ?, ?)",
+                [(key, tokens - 1 if allowed else tokens, now, burst, rate) for key, tokens, burst, rate in states]
+            )
+            connection.execute("COMMIT")
+            return allowed
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.connection.close)
+        self.executor.shutdown(wait=False)
+
+
+# Lua-скрипт атомарной проверки и списания для Redis.
+# KEYS - ключи корзин, ARGV - now, ttl, затем пары (burst, rate) для каждого ключа.
+REDIS_CONSUME_SCRIPT = """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local tokens = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    local state = redis.call('HMGET', key, 't', 'u')
+    local value = burst
+    if state[1] then
+        value = math.min(burst, tonumber(state[1]) + math.max(now - tonumber(state[2]), 0) * rate)
+    end
+    tokens[i] = value
+    if value < 1 then
+        allowed = 0
+    end
+end
+for i, key in ipairs(KEYS) do
+    local value = tokens[i]
+    if allowed == 1 then
+        value = value - 1
+    end
+    redis.call('HSET', key, 't', tostring(value), 'u', tostring(now))
+    redis.call('EXPIRE', key, ttl)
+end
+return allowed
+"""
+
+
+class RedisError(Exception):
+    """Ошибка, возвращенная Redis-сервером"""
+    pass
+
+
+class RedisConnection:
+    """Одно соединение с Redis: отправка команд и разбор ответов RESP"""
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Args:
+            reader: Поток чтения соединения
+            writer: Поток записи соединения
+        """
+        self.reader = reader
+        self.writer = writer
+    
+    @staticmethod
+    def encode(*args: Any) -> bytes:
+        """Кодирование команды в формате RESP"""
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+    
+    async def read_reply(self) -> Any:
+        """Чтение одного ответа в формате RESP"""
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RedisError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+    
+    async def command(self, *args: Any) -> Any:
+        """Отправка команды и чтение ответа"""
+        self.writer.write(self.encode(*args))
+        await self.writer.drain()
+        return await self.read_reply()
+    
+    def close(self) -> None:
+        """Закрытие соединения"""
+        self.writer.close()
+
+
+class RedisRateLimiter(RateLimiterBackend):
+    """
+    Корзины в Redis (или любом сервере с протоколом RESP и поддержкой EVAL)
+    
+    Проверка и списание выполняются одним Lua-скриптом на сервере, поэтому
+    операция атомарна для всех процессов и стоит один сетевой round-trip.
+    Проверки разных событий идут параллельно через небольшой пул соединений.
+    Простаивающие корзины удаляются самим сервером по TTL.
+    """
+    
+    def __init__(self, url: str = "redis://localhost:6379/0", key_prefix: str = "ratelimit:",
+                 pool_size: int = REDIS_POOL_SIZE):
+        """
+        Args:
+            url: Адрес сервера вида redis://[:password@]host:port/db
+            key_prefix: Префикс ключей корзин
+            pool_size: Максимум одновременных соединений
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.key_prefix = key_prefix
+        # SHA1 скрипта известен заранее; если сервер его не знает, скрипт отправляется через EVAL
+        self.script_sha = hashlib.sha1(REDIS_CONSUME_SCRIPT.encode()).hexdigest()
+        self.idle: List[RedisConnection] = []
+        self.slots = asyncio.Semaphore(pool_size)
+    
+    async def _connect(self) -> RedisConnection:
+        """Открытие нового соединения пула"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = RedisConnection(reader, writer)
+        try:
+            if self.password:
+                await connection.command("AUTH", self.password)
+            if self.db:
+                await connection.command("SELECT", self.db)
+        except BaseException:
+            connection.close()
+            raise
+        logger.info(f"Connected to rate limit store at {self.host}:{self.port}")
+        return connection
+    
+    async def _eval(self, connection: RedisConnection, args: List[Any]) -> Any:
+        """Выполнение скрипта списания по SHA с откатом на EVAL"""
+        try:
+            return await connection.command("EVALSHA", self.script_sha, *args)
+        except RedisError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+            return await connection.command("EVAL", REDIS_CONSUME_SCRIPT, *args)
+    
+    async def consume(self, buckets: Sequence[BucketSpec]) -> bool:
+        now = time.time()
+        keys = [f"{self.key_prefix}{key}" for key, _, _ in buckets]
+        # Корзина гарантированно полна через burst / rate секунд простоя
+        ttl = max(int(max(burst / rate if rate > 0 else 86400 for _, burst, rate in buckets)) + 1, 1)
+        args: List[Any] = [len(keys), *keys, repr(now), ttl]
+        for _, burst, rate in buckets:
+            args.extend((repr(burst), repr(rate)))
+        
+        async with self.slots:
+            connection = self.idle.pop() if self.idle else await self._connect()
+            try:
+                result = await self._eval(connection, args)
+            except RedisError:
+                # Ошибка сервера не нарушает протокол, соединение можно использовать дальше
+                self.idle.append(connection)
+                raise
+            except BaseException:
+                # Обрыв или отмена посреди команды: непрочитанный ответ остался в соединении
+                connection.close()
+                raise
+            self.idle.append(connection)
+            return result == 1
+    
+    async def close(self) -> None:
+        for connection in self.idle:
+            connection.close()
+        self.idle = []
+
+
+def create_rate_limiter(backend: str = "memory", sqlite_path: str = "", redis_url: str = "") -> RateLimiterBackend:
+    """
+    Создание хранилища корзин по имени
+    
+    Args:
+        backend: "memory", "sqlite" или "redis"
+        sqlite_path: Путь к базе для backend="sqlite"
+        redis_url: Адрес сервера для backend="redis"
+    
+    Returns:
+        RateLimiterBackend: Хранилище корзин
+    
+    Raises:
+        ValueError: Если имя хранилища неизвестно
+    """
+    if backend == "memory":
+        return MemoryRateLimiter()
+    if backend == "sqlite":
+        return SQLiteRateLimiter(sqlite_path)
+    if backend == "redis":
+        return RedisRateLimiter(redis_url)
+    raise ValueError(f"Unknown rate limiter backend: {backend}")
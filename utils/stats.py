@@ -0,0 +1,185 @@
+"""
+Инкрементальная статистика пользователей и избранного
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Окно, за которое хранятся дневные корзины активности
+ACTIVITY_WINDOW_DAYS = 30
+
+
+class StatsTracker:
+    """
+    Счетчики статистики, которые обновляются при регистрации, активности
+    пользователей и изменении избранного, а не пересчитываются при запросе
+    """
+    
+    def __init__(self, window_days: int = ACTIVITY_WINDOW_DAYS):
+        """
+        Args:
+            window_days: Количество последних дней, для которых хранятся корзины активности
+        """
+        self.window_days = window_days
+        self.loaded = False
+        self.total_users = 0
+        self.active_users = 0
+        self.total_favorites = 0
+        self.users_with_favorites = 0
+        # Номер дня (date.toordinal) -> количество пользователей с last_seen в этот день
+        self.activity_buckets: Dict[int, int] = {}
+        
+    def _ensure_loaded(self) -> None:
+        """Однократная инициализация счетчиков из хранилища"""
+        if self.loaded:
+            return
+            
+        # Импорт внутри функции, чтобы избежать циклических импортов
+        from utils.user_management import load_users
+        from utils.storage import load_data
+        
+        users = load_users()
+        self.total_users = len(users)
+        self.active_users = sum(1 for user in users.values() if user.get("is_active", True))
+        self.activity_buckets = {}
+        for user in users.values():
+            day = self._day_of(user.get("last_seen"))
+            if day is not None:
+                self.activity_buckets[day] = self.activity_buckets.get(day, 0) + 1
+                
+        favorites = load_data()
+        self.total_favorites = sum(len(quotes) for quotes in favorites.values())
+        self.users_with_favorites = sum(1 for quotes in favorites.values() if quotes)
+        
+        self.loaded = True
+        self._prune_buckets()
+        logger.info(f"Stats initialized: {self.total_users} users, {self.total_favorites} favorites")
+        
+    @staticmethod
+    def _day_of(timestamp: Optional[str]) -> Optional[int]:
+        """Номер дня для ISO-строки времени или None если строка некорректна"""
+        if not timestamp:
+            return None
+        try:
+            return datetime.fromisoformat(timestamp).toordinal()
+        except ValueError:
+            return None
+            
+    def _prune_buckets(self) -> None:
+        """Удаляет корзины, вышедшие за пределы окна"""
+        oldest = datetime.now().toordinal() - self.window_days
+        for day in [day for day in self.activity_buckets if day < oldest]:
+            del self.activity_buckets[day]
+            
+    def on_user_seen(self, previous: Optional[Dict[str, Any]], current_time: str) -> None:
+        """
+        Учет активности пользователя
+        
+        Args:
+            previous: Данные пользователя до обновления (None для нового пользователя)
+            current_time: Новое значение last_seen в ISO-формате
+        """
+        if not self.loaded:
+            # Счетчики еще не построены, инициализация прочитает актуальные данные
+            return
+            
+        if previous is None:
+            self.total_users += 1
+            self.active_users += 1
+        else:
+            if not previous.get("is_active", True):
+                self.active_users += 1
+            old_day = self._day_of(previous.get("last_seen"))
+            if old_day in self.activity_buckets:
+                self.activity_buckets[old_day] -= 1
+                if self.activity_buckets[old_day] <= 0:
+                    del self.activity_buckets[old_day]
+                    
+        new_day = self._day_of(current_time)
+        if new_day is not None:
+            if new_day not in self.activity_buckets:
+                # Новый день появляется редко, заодно чистим устаревшие корзины
+                self._prune_buckets()
+            self.activity_buckets[new_day] = self.activity_buckets.get(new_day, 0) + 1
+            
+    def on_favorites_changed(self, old_count: int, new_count: int) -> None:
+        """
+        Учет изменения количества избранных цитат пользователя
+        
+        Args:
+            old_count: Количество избранных до изменения
+            new_count: Количество избранных после изменения
+        """
+        if not self.loaded:
+            return
+            
+        self.total_favorites += new_count - old_count
+        if old_count == 0 and new_count > 0:
+            self.users_with_favorites += 1
+        elif old_count > 0 and new_count == 0:
+            self.users_with_favorites -= 1
+            
+    def get_active_users(self, days: int) -> int:
+        """
+        Количество пользователей, активных за последние N дней
+        
+        Args:
+            days: Количество дней (не больше окна window_days)
+            
+        Returns:
+            int: Количество пользователей
+        """
+        self._ensure_loaded()
+        today = datetime.now().toordinal()
+        days = min(days, self.window_days)
+        return sum(self.activity_buckets.get(today - offset, 0) for offset in range(days))
+        
+    def get_user_stats(self) -> Dict[str, int]:
+        """Статистика пользователей"""
+        self._ensure_loaded()
+        return {
+            "total_users": self.total_users,
+            "active_users": self.active_users,
+            "recent_users": self.get_active_users(self.window_days)
+        }
+        
+    def get_favorites_stats(self) -> Dict[str, int]:
+        """Статистика избранных цитат"""
+        self._ensure_loaded()
+        return {
+            "total_favorites": self.total_favorites,
+            "users_with_favorites": self.users_with_favorites
+        }
+        
+    def reset(self) -> None:
+        """Сбрасывает счетчики, следующий запрос перестроит их из хранилища"""
+        self.loaded = False
+
+
+# Глобальный экземпляр счетчиков
+stats_tracker = StatsTracker()
+
+
+def get_favorites_stats() -> Dict[str, int]:
+    """
+    Получает статистику избранных цитат
+    
+    Returns:
+        Dict[str, int]: Всего избранных и пользователей с избранными
+    """
+    return stats_tracker.get_favorites_stats()
+
+
+def get_active_users(days: int) -> int:
+    """
+    Получает количество пользователей, активных за последние N дней
+    
+    Args:
+        days: Количество дней
+        
+    Returns:
+        int: Количество пользователей
+    """
+    return stats_tracker.get_active_users(days)
@@ -1,16 +1,80 @@
 """
 Модуль для работы с хранилищем избранных цитат пользователей
 """
+import asyncio
 import json
+import logging
 import os
+import threading
+from collections import OrderedDict
+from itertools import count
 from typing import Dict, List, Optional, Any
-from utils.logger import logger
+from utils.stats import stats_tracker
+from utils.user_index import user_index
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+# Записи о каждом обращении к избранному (сэмплируются, см. LOG_SAMPLING)
+access_logger = logging.getLogger(f"{__name__}.access")
 
 
 # Путь к файлу хранилища
 STORAGE_PATH = os.path.join(os.path.dirname(__file__), '..', 'storage', 'quotes.json')
 
+# Версия избранного пользователя, по которой инвалидируются кэши страниц и поиска
+FavoritesVersion = int
+
+FAVORITES_VERSIONS_SIZE = 10000  # Сколько версий избранного держать в памяти
+
+# Версии избранного пользователей (LRU): user_id -> номер из общего счетчика
+_favorites_versions: "OrderedDict[int, FavoritesVersion]" = OrderedDict()
+_version_counter = count(1)
+# Избранное может меняться и из потоков asyncio.to_thread
+_versions_lock = threading.Lock()
+# Чтение-изменение-запись файла избранного из разных потоков выполняется по очереди
+_data_lock = threading.RLock()
+
+
+def _assign_favorites_version(user_id: int) -> FavoritesVersion:
+    """Новая, еще не выдававшаяся версия избранного пользователя"""
+    with _versions_lock:
+        version = next(_version_counter)
+        _favorites_versions[user_id] = version
+        _favorites_versions.move_to_end(user_id)
+        if len(_favorites_versions) > FAVORITES_VERSIONS_SIZE:
+            _favorites_versions.popitem(last=False)
+        return version
+
 
+def get_favorites_version(user_id: int) -> FavoritesVersion:
+    """
+    Текущая версия избранного пользователя
+    
+    Номера берутся из общего счетчика и никогда не повторяются, поэтому
+    вытесненная из LRU версия при следующем обращении становится новой:
+    это стоит одной перестройки кэшей этого пользователя, но не отдает
+    устаревшие данные.
+    
+    Args:
+        user_id: ID пользователя
+        
+    Returns:
+        FavoritesVersion: Номер версии
+    """
+    with _versions_lock:
+        version = _favorites_versions.get(user_id)
+        if version is not None:
+            _favorites_versions.move_to_end(user_id)
+            return version
+    return _assign_favorites_version(user_id)
+
+
+def _bump_favorites_version(user_id: int) -> None:
+    """Новая версия избранного после изменения"""
+    _assign_favorites_version(user_id)
+
+
+@traced("storage.load_data")
 def load_data() -> Dict[str, List[Dict[str, Any]]]:
     """
     Загрузка данных из JSON файла
@@ -32,6 +96,7 @@ def load_data() -> Dict[str, List[Dict[str, Any]]]:
         return {}
 
 
+@traced("storage.save_data")
 def save_data(data: Dict[str, List[Dict[str, Any]]]) -> bool:
     """
     Сохранение данных в JSON файл
@@ -49,53 +114,98 @@ def save_data(data: Dict[str, List[Dict[str, Any]]]) -> bool:
         with open(STORAGE_PATH, 'w', encoding='utf-8') as file:
             json.dump(data, file, ensure_ascii=False, indent=2)
         
-        logger.info(f"Saved {len(data)} users' favorites to storage")
+        access_logger.info(f"Saved {len(data)} users' favorites to storage")
         return True
     except Exception as e:
         logger.error(f"Error saving data to storage: {e}")
         return False
 
 
-def add_to_favorites(user_id: int, quote_dict: Dict[str, Any]) -> bool:
+def _add_to_file(user_id: int, quote_dict: Dict[str, Any]) -> Optional[int]:
     """
-    Добавление цитаты в избранное пользователя
+    Запись цитаты в файл избранного (без обновления счетчиков в памяти)
     
     Args:
         user_id: ID пользователя
         quote_dict: Словарь с данными цитаты
         
     Returns:
-        bool: True если добавление успешно, False если цитата уже существует
+        Optional[int]: Новое количество избранных или None, если цитата
+        уже существует или файл не сохранен
     """
     try:
-        data = load_data()
-        user_id_str = str(user_id)
-        
-        # Инициализируем список для нового пользователя
-        if user_id_str not in data:
-            data[user_id_str] = []
-        
-        # Проверяем, есть ли уже такая цитата
-        quote_id = quote_dict.get('_id') or quote_dict.get('id')
-        if quote_id:
-            for existing_quote in data[user_id_str]:
-                if existing_quote.get('_id') == quote_id or existing_quote.get('id') == quote_id:
-                    logger.info(f"Quote {quote_id} already exists in favorites for user {user_id}")
-                    return False
-        
-        # Добавляем цитату
-        data[user_id_str].append(quote_dict)
-        
-        # Сохраняем данные
-        if save_data(data):
-            logger.info(f"Added quote to favorites for user {user_id}")
-            return True
-        else:
-            return False
+        with _data_lock:
+            data = load_data()
+            user_id_str = str(user_id)
+            
+            # Инициализируем список для нового пользователя
+            if user_id_str not in data:
+                data[user_id_str] = []
+            
+            # Проверяем, есть ли уже такая цитата
+            quote_id = quote_dict.get('_id') or quote_dict.get('id')
+            if quote_id:
+                for existing_quote in data[user_id_str]:
+                    if existing_quote.get('_id') == quote_id or existing_quote.get('id') == quote_id:
+                        access_logger.info(f"Quote {quote_id} already exists in favorites for user {user_id}")
+                        return None
+            
+            # Добавляем цитату и сохраняем данные
+            data[user_id_str].append(quote_dict)
+            if not save_data(data):
+                return None
+            return len(data[user_id_str])
             
     except Exception as e:
         logger.error(f"Error adding quote to favorites: {e}")
+        return None
+
+
+def _on_favorite_added(user_id: int, new_count: int) -> None:
+    """Обновление версии и счетчиков избранного после добавления цитаты"""
+    _bump_favorites_version(user_id)
+    stats_tracker.on_favorites_changed(new_count - 1, new_count)
+    user_index.on_favorites_changed(user_id, new_count)
+    access_logger.info(f"Added quote to favorites for user {user_id}")
+
+
+def add_to_favorites(user_id: int, quote_dict: Dict[str, Any]) -> bool:
+    """
+    Добавление цитаты в избранное пользователя
+    
+    Args:
+        user_id: ID пользователя
+        quote_dict: Словарь с данными цитаты
+        
+    Returns:
+        bool: True если добавление успешно, False если цитата уже существует
+    """
+    new_count = _add_to_file(user_id, quote_dict)
+    if new_count is None:
         return False
+    _on_favorite_added(user_id, new_count)
+    return True
+
+
+async def add_to_favorites_async(user_id: int, quote_dict: Dict[str, Any]) -> bool:
+    """
+    Добавление цитаты в избранное с чтением и записью файла в отдельном потоке
+    
+    Счетчики в памяти (статистика, индекс пользователей, версия избранного)
+    обновляются в event loop после записи.
+    
+    Args:
+        user_id: ID пользователя
+        quote_dict: Словарь с данными цитаты
+        
+    Returns:
+        bool: True если добавление успешно, False если цитата уже существует
+    """
+    new_count = await asyncio.to_thread(_add_to_file, user_id, quote_dict)
+    if new_count is None:
+        return False
+    _on_favorite_added(user_id, new_count)
+    return True
 
 
 def remove_from_favorites(user_id: int, quote_id: str) -> bool:
@@ -110,30 +220,34 @@ def remove_from_favorites(user_id: int, quote_id: str) -> bool:
         bool: True если удаление успешно, False в противном случае
     """
     try:
-        data = load_data()
-        user_id_str = str(user_id)
-        
-        if user_id_str not in data:
-            logger.info(f"User {user_id} has no favorites")
-            return False
-        
-        # Находим и удаляем цитату
-        initial_count = len(data[user_id_str])
-        data[user_id_str] = [
-            quote for quote in data[user_id_str] 
-            if quote.get('_id') != quote_id and quote.get('id') != quote_id
-        ]
-        
-        if len(data[user_id_str]) < initial_count:
-            # Сохраняем данные
-            if save_data(data):
-                logger.info(f"Removed quote {quote_id} from favorites for user {user_id}")
-                return True
+        with _data_lock:
+            data = load_data()
+            user_id_str = str(user_id)
+            
+            if user_id_str not in data:
+                access_logger.info(f"User {user_id} has no favorites")
+                return False
+            
+            # Находим и удаляем цитату
+            initial_count = len(data[user_id_str])
+            data[user_id_str] = [
+                quote for quote in data[user_id_str] 
+                if quote.get('_id') != quote_id and quote.get('id') != quote_id
+            ]
+            
+            if len(data[user_id_str]) < initial_count:
+                # Сохраняем данные
+                if save_data(data):
+                    _bump_favorites_version(user_id)
+                    stats_tracker.on_favorites_changed(initial_count, len(data[user_id_str]))
+                    user_index.on_favorites_changed(user_id, len(data[user_id_str]))
+                    access_logger.info(f"Removed quote {quote_id} from favorites for user {user_id}")
+                    return True
+                else:
+                    return False
             else:
+                access_logger.info(f"Quote {quote_id} not found in favorites for user {user_id}")
                 return False
-        else:
-            logger.info(f"Quote {quote_id} not found in favorites for user {user_id}")
-            return False
             
     except Exception as e:
         logger.error(f"Error removing quote from favorites: {e}")
@@ -155,7 +269,7 @@ def get_user_favorites(user_id: int) -> List[Dict[str, Any]]:
         user_id_str = str(user_id)
         
         favorites = data.get(user_id_str, [])
-        logger.info(f"Retrieved {len(favorites)} favorites for user {user_id}")
+        access_logger.info(f"Retrieved {len(favorites)} favorites for user {user_id}")
         return favorites
         
     except Exception as e:
@@ -209,16 +323,21 @@ def clear_user_favorites(user_id: int) -> bool:
         bool: True если очистка успешна, False в противном случае
     """
     try:
-        data = load_data()
-        user_id_str = str(user_id)
-        
-        if user_id_str in data:
-            data[user_id_str] = []
-            if save_data(data):
-                logger.info(f"Cleared all favorites for user {user_id}")
-                return True
-        
-        return False
+        with _data_lock:
+            data = load_data()
+            user_id_str = str(user_id)
+            
+            if user_id_str in data:
+                old_count = len(data[user_id_str])
+                data[user_id_str] = []
+                if save_data(data):
+                    _bump_favorites_version(user_id)
+                    stats_tracker.on_favorites_changed(old_count, 0)
+                    user_index.on_favorites_changed(user_id, 0)
+                    logger.info(f"Cleared all favorites for user {user_id}")
+                    return True
+            
+            return False
     except Exception as e:
         logger.error(f"Error clearing user favorites: {e}")
         return False
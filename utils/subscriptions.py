@@ -0,0 +1,391 @@
+"""
+Подписки на цитату дня: хранение и индекс по времени доставки
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, available_timezones
+
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Путь к файлу подписок
+SUBSCRIPTIONS_PATH = os.path.join(os.path.dirname(__file__), '..', 'storage', 'subscriptions.json')
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_TIMEZONE = "UTC"
+SUBSCRIPTIONS_FLUSH_INTERVAL = 5.0  # Как часто сохранять изменения подписок на диск (сек)
+
+_TIME_PATTERN = re.compile(r"(\d{1,2})[:.](\d{2})")
+_OFFSET_PATTERN = re.compile(r"(?:UTC|GMT)?([+-])(\d{1,2})(?::?(\d{2}))?", re.IGNORECASE)
+
+# Названия часовых поясов IANA без учета регистра (заполняется при первом обращении)
+_zone_names: Dict[str, str] = {}
+
+
+def parse_time(text: str) -> Optional[int]:
+    """
+    Разбор времени "ЧЧ:ММ"
+
+    Args:
+        text: Время
+
+    Returns:
+        Optional[int]: Минута суток или None, если формат неверный
+    """
+    match = _TIME_PATTERN.fullmatch(text.strip())
+    if not match:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def format_minute(minute: int) -> str:
+    """Минута суток в виде "ЧЧ:ММ\""""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def resolve_timezone(name: str) -> Optional[Tuple[str, tzinfo]]:
+    """
+    Часовой пояс по названию IANA (Europe/Moscow) или смещению (+03:00, UTC+3)
+
+    Args:
+        name: Название или смещение
+
+    Returns:
+        Optional[Tuple[str, tzinfo]]: Нормализованное название и часовой пояс или None
+    """
+    name = name.strip()
+    if name.upper() in ("UTC", "GMT", "Z"):
+        return DEFAULT_TIMEZONE, timezone.utc
+
+    match = _OFFSET_PATTERN.fullmatch(name)
+    if match:
+        sign, hours, minutes = match.group(1), int(match.group(2)), int(match.group(3) or 0)
+        if hours > 14 or minutes > 59:
+            return None
+        offset = timedelta(hours=hours, minutes=minutes)
+        normalized = f"{sign}{hours:02d}:{minutes:02d}"
+        return normalized, timezone(-offset if sign == "-" else offset, normalized)
+
+    if not _zone_names:
+        _zone_names.update({zone.lower(): zone for zone in available_timezones()})
+    zone_name = _zone_names.get(name.lower())
+    if zone_name is None:
+        return None
+    return zone_name, ZoneInfo(zone_name)
+
+
+class SubscriptionIndex:
+    """
+    Подписки, сгруппированные по часовому поясу и минуте суток
+
+    Для каждого часового пояса - разреженное колесо из 1440 ячеек (минута
+    местного времени -> подписчики). Раз в минуту планировщик переводит
+    текущее время в каждый используемый пояс и забирает ячейки, до которых
+    дошло время, поэтому работа за минуту зависит от числа поясов и
+    подписчиков этой минуты, а не от общего числа подписок. Курсор по каждому
+    поясу догоняет пропущенные минуты (задержка event loop, переход на летнее
+    время) и не отдает ячейки повторно при переводе часов назад.
+    """
+
+    def __init__(self):
+        self.subscriptions: Dict[int, Tuple[int, str]] = {}  # user_id -> (минута, пояс)
+        self.wheels: Dict[str, Dict[int, Set[int]]] = {}
+        self.zones: Dict[str, tzinfo] = {}
+        self.cursors: Dict[str, Tuple[date, int]] = {}  # Последняя обработанная минута пояса
+
+    def __len__(self) -> int:
+        return len(self.subscriptions)
+
+    def add(self, user_id: int, minute: int, zone_name: str, zone: tzinfo) -> None:
+        """
+        Добавление или изменение подписки
+
+        Args:
+            user_id: ID пользователя
+            minute: Минута суток местного времени
+            zone_name: Название часового пояса
+            zone: Часовой пояс
+        """
+        self.remove(user_id)
+        self.subscriptions[user_id] = (minute, zone_name)
+        self.zones.setdefault(zone_name, zone)
+        self.wheels.setdefault(zone_name, {}).setdefault(minute, set()).add(user_id)
+
+    def remove(self, user_id: int) -> bool:
+        """
+        Удаление подписки
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            bool: True если подписка была
+        """
+        subscription = self.subscriptions.pop(user_id, None)
+        if subscription is None:
+            return False
+        minute, zone_name = subscription
+        wheel = self.wheels[zone_name]
+        wheel[minute].discard(user_id)
+        if not wheel[minute]:
+            del wheel[minute]
+            if not wheel:
+                del self.wheels[zone_name]
+                del self.zones[zone_name]
+                self.cursors.pop(zone_name, None)
+        return True
+
+    def get(self, user_id: int) -> Optional[Tuple[int, str]]:
+        """Подписка пользователя: (минута суток, часовой пояс) или None"""
+        return self.subscriptions.get(user_id)
+
+    @staticmethod
+    def _minutes_since(cursor: Optional[Tuple[date, int]], today: date, minute: int) -> List[int]:
+        """Минуты местного времени после курсора до текущей включительно"""
+        if cursor is None:
+            return [minute]
+        last_day, last_minute = cursor
+        if last_day == today:
+            # При переводе часов назад минуты повторяются - их пропускаем
+            return list(range(last_minute + 1, minute + 1))
+        if last_day + timedelta(days=1) == today:
+            return list(range(last_minute + 1, MINUTES_PER_DAY)) + list(range(minute + 1))
+        return [minute]
+
+    def pop_due(self, now: datetime) -> List[int]:
+        """
+        Подписчики, время доставки которых наступило к моменту now
+
+        Args:
+            now: Текущее время (с часовым поясом)
+
+        Returns:
+            List[int]: ID пользователей
+        """
+        due: List[int] = []
+        for zone_name, wheel in self.wheels.items():
+            local = now.astimezone(self.zones[zone_name])
+            today, minute = local.date(), local.hour * 60 + local.minute
+            for due_minute in self._minutes_since(self.cursors.get(zone_name), today, minute):
+                due.extend(wheel.get(due_minute, ()))
+            cursor = self.cursors.get(zone_name)
+            if cursor is None or (today, minute) > cursor:
+                self.cursors[zone_name] = (today, minute)
+        return due
+
+
+_index: Optional[SubscriptionIndex] = None
+_index_dirty = False  # Есть изменения, еще не записанные на диск
+
+
+@traced("storage.load_subscriptions")
+def _load_index() -> SubscriptionIndex:
+    """Построение индекса из файла подписок"""
+    index = SubscriptionIndex()
+    try:
+        if os.path.exists(SUBSCRIPTIONS_PATH):
+            with open(SUBSCRIPTIONS_PATH, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            for user_id, subscription in data.items():
+                minute = parse_time(subscription.get("time", ""))
+                resolved = resolve_timezone(subscription.get("timezone", DEFAULT_TIMEZONE))
+                if minute is None or resolved is None:
+                    logger.warning(f"Skipping invalid subscription of user {user_id}: {subscription}")
+                    continue
+                index.add(int(user_id), minute, *resolved)
+            logger.info(f"Loaded {len(index)} daily quote subscriptions")
+    except Exception as e:
+        logger.error(f"Error loading subscriptions: {e}")
+    return index
+
+
+def _get_index() -> SubscriptionIndex:
+    """Индекс подписок (файл читается при первом обращении)"""
+    global _index
+    if _index is None:
+        _index = _load_index()
+    return _index
+
+
+@traced("storage.save_subscriptions")
+def _write_subscriptions_file(subscriptions: Dict[int, Tuple[int, str]]) -> bool:
+    """
+    Атомарная запись подписок в JSON файл
+
+    Данные пишутся во временный файл, который затем заменяет файл подписок,
+    поэтому при сбое во время записи остается предыдущая версия.
+
+    Args:
+        subscriptions: Копия подписок индекса (user_id -> (минута, пояс))
+
+    Returns:
+        bool: True если файл сохранен
+    """
+    data = {
+        str(user_id): {"time": format_minute(minute), "timezone": zone_name}
+        for user_id, (minute, zone_name) in subscriptions.items()
+    }
+    try:
+        os.makedirs(os.path.dirname(SUBSCRIPTIONS_PATH), exist_ok=True)
+        tmp_path = f"{SUBSCRIPTIONS_PATH}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, SUBSCRIPTIONS_PATH)
+        return True
+    except Exception as e:
+        logger.error(f"Error saving subscriptions: {e}")
+        return False
+
+
+def flush_subscriptions() -> None:
+    """Сохранение несохраненных изменений подписок (при завершении бота)"""
+    global _index_dirty
+    if _index is None or not _index_dirty:
+        return
+    _index_dirty = False
+    if not _write_subscriptions_file(_index.subscriptions):
+        _index_dirty = True
+
+
+async def flush_subscriptions_async() -> None:
+    """
+    Сохранение несохраненных изменений подписок в отдельном потоке
+
+    В event loop снимается только копия словаря подписок, а форматирование,
+    сериализация и запись выполняются в потоке.
+    """
+    global _index_dirty
+    if _index is None or not _index_dirty:
+        return
+    _index_dirty = False
+    snapshot = dict(_index.subscriptions)
+    if not await asyncio.to_thread(_write_subscriptions_file, snapshot):
+        _index_dirty = True
+
+
+async def subscriptions_flush_scheduler(interval: float = SUBSCRIPTIONS_FLUSH_INTERVAL) -> None:
+    """
+    Фоновая задача, периодически сохраняющая изменения подписок
+
+    Подписки и отписки за интервал записываются одним сохранением файла.
+
+    Args:
+        interval: Период сохранения (сек)
+    """
+    logger.info("Subscriptions flush scheduler started")
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            await flush_subscriptions_async()
+        except asyncio.CancelledError:
+            logger.info("Subscriptions flush scheduler stopped")
+            raise
+        except Exception as e:
+            logger.error(f"Error in subscriptions flush scheduler: {e}")
+
+
+def _mark_dirty() -> None:
+    """Отметка об изменении подписок (запись на диск - в subscriptions_flush_scheduler)"""
+    global _index_dirty
+    _index_dirty = True
+
+
+def subscribe_user(user_id: int, minute: int, zone_name: str, zone: tzinfo) -> bool:
+    """
+    Подписка пользователя на цитату дня
+
+    Изменение сразу попадает в индекс, а на диск записывается задачей
+    subscriptions_flush_scheduler.
+
+    Args:
+        user_id: ID пользователя
+        minute: Минута суток местного времени
+        zone_name: Название часового пояса
+        zone: Часовой пояс
+
+    Returns:
+        bool: True если подписка добавлена
+    """
+    _get_index().add(user_id, minute, zone_name, zone)
+    _mark_dirty()
+    logger.info(f"User {user_id} subscribed to daily quote at {format_minute(minute)} {zone_name}")
+    return True
+
+
+def unsubscribe_users(user_ids: Iterable[int]) -> int:
+    """
+    Отмена подписок нескольких пользователей
+
+    Args:
+        user_ids: ID пользователей
+
+    Returns:
+        int: Количество отмененных подписок
+    """
+    index = _get_index()
+    removed = sum(1 for user_id in user_ids if index.remove(user_id))
+    if removed:
+        _mark_dirty()
+        logger.info(f"Removed {removed} daily quote subscriptions")
+    return removed
+
+
+def unsubscribe_user(user_id: int) -> bool:
+    """
+    Отмена подписки пользователя
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        bool: True если подписка была
+    """
+    return unsubscribe_users([user_id]) > 0
+
+
+def get_subscription(user_id: int) -> Optional[Tuple[int, str]]:
+    """
+    Подписка пользователя
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        Optional[Tuple[int, str]]: (минута суток, часовой пояс) или None
+    """
+    return _get_index().get(user_id)
+
+
+def get_subscription_timezone(user_id: int) -> Optional[Tuple[str, tzinfo]]:
+    """Часовой пояс текущей подписки пользователя или None"""
+    subscription = _get_index().get(user_id)
+    if subscription is None:
+        return None
+    return resolve_timezone(subscription[1])
+
+
+def pop_due_subscribers(now: datetime) -> List[int]:
+    """
+    Подписчики, которым пора отправить цитату дня
+
+    Args:
+        now: Текущее время (с часовым поясом)
+
+    Returns:
+        List[int]: ID пользователей
+    """
+    return _get_index().pop_due(now)
+
+
+def get_subscription_count() -> int:
+    """Количество подписок"""
+    return len(_get_index())
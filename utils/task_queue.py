@@ -0,0 +1,164 @@
+"""
+Очередь фоновых задач обработчиков
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from config.settings import BACKGROUND_WORKERS
+from utils.metrics import BACKGROUND_QUEUE_SIZE, BACKGROUND_TASKS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+ErrorHandler = Callable[[Exception], Awaitable[None]]
+QueuedJob = Tuple[str, Job, Optional[ErrorHandler]]
+
+
+class BackgroundTaskQueue:
+    """
+    Очереди фоновых задач по ключу с воркерами под наблюдением
+
+    Обработчик callback отвечает на нажатие сразу, а запись в хранилище и
+    редактирование сообщения ставит в очередь. У каждого ключа (ID
+    пользователя) своя очередь и свой воркер, поэтому задачи одного
+    пользователя выполняются строго по порядку, а медленная задача одного
+    пользователя не задерживает остальных. Воркер завершается, когда его
+    очередь опустела, а одновременно выполняется не больше workers задач.
+    Ошибка задачи передается ее обработчику ошибок (например, для сообщения
+    пользователю), а упавший воркер перезапускается.
+    """
+
+    def __init__(self, workers: int = BACKGROUND_WORKERS):
+        """
+        Args:
+            workers: Максимум одновременно выполняемых задач
+        """
+        self.workers = workers
+        self.queues: Dict[int, Deque[QueuedJob]] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.stopping = False
+
+    def start(self) -> None:
+        """Подготовка очереди (в работающем event loop)"""
+        if self.slots is not None:
+            return
+        self.stopping = False
+        self.slots = asyncio.Semaphore(max(1, self.workers))
+        logger.info(f"Background task queue started with {self.workers} workers")
+
+    def _spawn(self, key: int) -> None:
+        """Запуск воркера ключа с перезапуском при аварийном завершении"""
+        task = asyncio.create_task(self._worker(key), name=f"background-worker-{key}")
+        task.add_done_callback(lambda done: self._on_worker_done(key, done))
+        self.tasks[key] = task
+
+    def _on_worker_done(self, key: int, task: asyncio.Task) -> None:
+        """Перезапуск воркера, завершившегося не по опустевшей очереди"""
+        if self.tasks.get(key) is not task:
+            return  # Воркер завершился штатно и уже снял себя
+        del self.tasks[key]
+        if self.stopping:
+            return
+        if not self.queues.get(key):
+            self.queues.pop(key, None)
+            return
+        reason = "cancelled" if task.cancelled() else repr(task.exception())
+        logger.error(f"Background worker for key {key} stopped unexpectedly ({reason}), restarting")
+        self._spawn(key)
+
+    def _update_queue_size(self) -> None:
+        BACKGROUND_QUEUE_SIZE.set(self.pending)
+
+    def submit(self, key: int, name: str, job: Job, on_error: Optional[ErrorHandler] = None) -> None:
+        """
+        Постановка задачи в очередь
+
+        Args:
+            key: Ключ упорядочивания (задачи с одним ключом выполняются по порядку)
+            name: Имя задачи для логов и метрик
+            job: Функция без аргументов, возвращающая корутину задачи
+            on_error: Обработчик исключения задачи
+        """
+        if self.slots is None:
+            self.start()
+        self.queues.setdefault(key, deque()).append((name, job, on_error))
+        self.pending += 1
+        self._update_queue_size()
+        if key not in self.tasks:
+            self._spawn(key)
+
+    async def _worker(self, key: int) -> None:
+        """Воркер: последовательное выполнение задач ключа, пока очередь не опустеет"""
+        queue = self.queues[key]
+        while queue:
+            async with self.slots:
+                name, job, on_error = queue[0]
+                try:
+                    await job()
+                    BACKGROUND_TASKS_TOTAL.labels(name, "ok").inc()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    BACKGROUND_TASKS_TOTAL.labels(name, "error").inc()
+                    logger.error(f"Background task {name} failed: {e}")
+                    if on_error is not None:
+                        try:
+                            await on_error(e)
+                        except Exception as report_error:
+                            logger.error(f"Error reporting failure of background task {name}: {report_error}")
+                finally:
+                    # Задача снимается с очереди после выполнения, чтобы пустая очередь
+                    # означала отсутствие работы у ключа
+                    queue.popleft()
+                    self.pending -= 1
+                    self._update_queue_size()
+        # Между проверкой и удалением нет await, поэтому новая задача ключа
+        # либо попадет в эту очередь, либо запустит нового воркера
+        del self.queues[key]
+        del self.tasks[key]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Остановка воркеров после выполнения поставленных задач
+
+        Args:
+            timeout: Сколько ждать выполнения оставшихся задач (сек)
+        """
+        if self.slots is None:
+            return
+        if self.tasks:
+            _, running = await asyncio.wait(list(self.tasks.values()), timeout=timeout)
+            if running:
+                logger.warning(f"Background task queue stopped with {self.pending} pending tasks")
+        self.stopping = True
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks = {}
+        self.queues = {}
+        self.pending = 0
+        self._update_queue_size()
+        self.slots = None
+        logger.info("Background task queue stopped")
+
+
+# Глобальная очередь фоновых задач
+background_tasks = BackgroundTaskQueue()
+
+
+def submit_task(key: int, name: str, job: Job, on_error: Optional[ErrorHandler] = None) -> None:
+    """
+    Удобная функция постановки фоновой задачи
+
+    Args:
+        key: Ключ упорядочивания (обычно ID пользователя)
+        name: Имя задачи для логов и метрик
+        job: Функция без аргументов, возвращающая корутину задачи
+        on_error: Обработчик исключения задачи
+    """
+    background_tasks.submit(key, name, job, on_error)
@@ -0,0 +1,232 @@
+"""
+Трассировка обработки обновлений: ID трассы и длительность этапов (spans)
+"""
+import asyncio
+import functools
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config.settings import (
+    TRACE_FILE, TRACE_MAX_BYTES, TRACE_BACKUP_COUNT, TRACE_SLOW_UPDATE_MS
+)
+from utils.logger import create_file_logger
+from utils.metrics import OPERATION_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Трасса обновления, которое обрабатывается в текущей задаче
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+# Логгер файла трасс создается при первой записи
+_trace_logger: Optional[logging.Logger] = None
+
+
+class Trace:
+    """
+    Трасса обработки одного обновления
+
+    Этапы записываются относительно начала трассы. После завершения
+    трассы новые этапы (например, из фоновых задач) игнорируются.
+    """
+
+    __slots__ = (
+        "trace_id", "update_id", "event_type", "user_id",
+        "started_at", "started", "routing_started", "spans", "finished"
+    )
+
+    def __init__(self, update_id: Optional[int] = None, event_type: Optional[str] = None,
+                 user_id: Optional[int] = None):
+        """
+        Args:
+            update_id: ID обновления Telegram
+            event_type: Тип события (message, callback_query и т.д.)
+            user_id: ID пользователя
+        """
+        self.trace_id = uuid.uuid4().hex
+        self.update_id = update_id
+        self.event_type = event_type
+        self.user_id = user_id
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.routing_started: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.finished = False
+
+    def add_span(self, name: str, start: float, duration: float, **attrs: Any) -> None:
+        """
+        Добавление этапа
+
+        Args:
+            name: Название этапа
+            start: Начало этапа (time.perf_counter)
+            duration: Длительность в секундах
+            **attrs: Дополнительные поля этапа
+        """
+        if self.finished:
+            return
+        span_data = {
+            "name": name,
+            "start_ms": round((start - self.started) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+        }
+        span_data.update(attrs)
+        self.spans.append(span_data)
+
+    def end_routing(self, now: float) -> None:
+        """Запись этапа фильтров: от передачи обновления роутерам до первого внутреннего middleware"""
+        if self.routing_started is not None:
+            self.add_span("filters", self.routing_started, now - self.routing_started)
+            self.routing_started = None
+
+    def to_dict(self, duration: float, status: str) -> Dict[str, Any]:
+        """Представление трассы для записи в файл"""
+        return {
+            "trace_id": self.trace_id,
+            "ts": datetime.fromtimestamp(self.started_at).isoformat(),
+            "update_id": self.update_id,
+            "event_type": self.event_type,
+            "user_id": self.user_id,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "spans": self.spans,
+        }
+
+
+class _LazyJson:
+    """JSON-строка, сериализуемая только при записи в фоновом потоке логирования"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, ensure_ascii=False, default=str)
+
+
+def _get_trace_logger() -> logging.Logger:
+    """Логгер файла трасс (создается при первом обращении)"""
+    global _trace_logger
+    if _trace_logger is None:
+        _trace_logger = create_file_logger("bot.trace", TRACE_FILE, TRACE_MAX_BYTES, TRACE_BACKUP_COUNT)
+    return _trace_logger
+
+
+def current_trace() -> Optional[Trace]:
+    """Трасса текущего обновления или None"""
+    return _current_trace.get()
+
+
+def start_trace(update_id: Optional[int] = None, event_type: Optional[str] = None,
+                user_id: Optional[int] = None) -> Token:
+    """
+    Начало трассы обновления в текущем контексте
+
+    Args:
+        update_id: ID обновления Telegram
+        event_type: Тип события
+        user_id: ID пользователя
+
+    Returns:
+        Token: Токен для восстановления контекста в finish_trace
+    """
+    return _current_trace.set(Trace(update_id, event_type, user_id))
+
+
+def finish_trace(token: Token, status: str = "ok") -> None:
+    """
+    Завершение трассы текущего обновления и запись ее в файл
+
+    Args:
+        token: Токен из start_trace
+        status: Итог обработки (ok, unhandled, error)
+    """
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is None:
+        return
+
+    duration = time.perf_counter() - trace.started
+    trace.finished = True
+
+    _get_trace_logger().info("%s", _LazyJson(trace.to_dict(duration, status)))
+
+    if duration * 1000 >= TRACE_SLOW_UPDATE_MS:
+        slowest = max(trace.spans, key=lambda item: item["duration_ms"], default=None)
+        logger.warning(
+            "Slow update %s (%s) took %.1f ms, slowest span: %s, trace %s",
+            trace.update_id, trace.event_type, duration * 1000,
+            slowest["name"] if slowest else "-", trace.trace_id
+        )
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """
+    Запись этапа текущей трассы
+
+    Вне трассы (фоновые задачи, запуск бота) ничего не делает.
+
+    Args:
+        name: Название этапа
+        **attrs: Дополнительные поля этапа
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, start, time.perf_counter() - start, **attrs)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """
+    Декоратор, записывающий вызов функции как этап текущей трассы
+
+    Длительность каждого вызова (и вне трассы) также попадает
+    в гистограмму bot_operation_duration_seconds с меткой operation=name.
+
+    Args:
+        name: Название этапа
+
+    Returns:
+        Callable: Декоратор для обычных и асинхронных функций
+    """
+    def decorator(func: Callable) -> Callable:
+        histogram = OPERATION_DURATION.labels(name)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    with span(name):
+                        return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with span(name):
+                    return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
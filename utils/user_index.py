@@ -0,0 +1,285 @@
+"""
+Отсортированные индексы пользователей для постраничного просмотра в админ-панели
+"""
+import logging
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ключи сортировки: название -> поле записи пользователя
+SORT_FIELDS = {
+    'fav': 'favorites',
+    'seen': 'last_seen',
+    'msg': 'message_count',
+}
+
+# Фильтры списка пользователей
+FILTERS = ('all', 'active', 'banned')
+
+ACTIVE_DAYS = 30  # Пользователь активен, если заходил за последние N дней
+ADMIN_USERS_PAGE_SIZE = 15  # Пользователей на странице
+
+# Поля с отдельными индексами активных пользователей (активные по last_seen - хвост общего индекса)
+ACTIVE_INDEX_FIELDS = ('favorites', 'message_count')
+
+
+class UserIndex:
+    """
+    Индексы пользователей, отсортированные по количеству избранных,
+    времени последней активности и количеству сообщений
+    
+    Каждый индекс - отсортированный по возрастанию список пар (значение, user_id),
+    страница по убыванию берется срезом с конца, поэтому стоит O(размер страницы).
+    Для фильтра активных пользователей по избранным и сообщениям ведутся
+    отдельные индексы только активных; пользователи, чей last_seen вышел за
+    границу активности, удаляются из них по индексу last_seen при запросе.
+    """
+    
+    def __init__(self):
+        self.loaded = False
+        self.records: Dict[int, Dict[str, Any]] = {}
+        self.indexes: Dict[str, List[Tuple[Any, int]]] = {field: [] for field in SORT_FIELDS.values()}
+        self.active: Set[int] = set()
+        self.active_indexes: Dict[str, List[Tuple[Any, int]]] = {field: [] for field in ACTIVE_INDEX_FIELDS}
+        self.active_cutoff = ''  # Граница last_seen, по которой построены индексы активных
+    
+    def _ensure_loaded(self) -> None:
+        """Однократное построение индексов из хранилища"""
+        if self.loaded:
+            return
+        
+        # Импорт внутри функции, чтобы избежать циклических импортов
+        from utils.user_management import load_users
+        from utils.storage import load_data
+        
+        self.records = {}
+        for user_id_str, user in load_users().items():
+            self.records[int(user_id_str)] = self._make_record(user, 0)
+        for user_id_str, favorites in load_data().items():
+            record = self.records.setdefault(int(user_id_str), self._make_record({}, 0))
+            record['favorites'] = len(favorites)
+        
+        self.indexes = {
+            field: sorted((record[field], user_id) for user_id, record in self.records.items())
+            for field in SORT_FIELDS.values()
+        }
+        self.active_cutoff = self._active_cutoff()
+        self.active = {
+            user_id for user_id, record in self.records.items() if record['last_seen'] >= self.active_cutoff
+        }
+        self.active_indexes = {
+            field: sorted((self.records[user_id][field], user_id) for user_id in self.active)
+            for field in ACTIVE_INDEX_FIELDS
+        }
+        self.loaded = True
+        logger.info(f"User index built for {len(self.records)} users")
+    
+    @staticmethod
+    def _make_record(user: Dict[str, Any], favorites: int) -> Dict[str, Any]:
+        """Запись индекса из данных пользователя"""
+        return {
+            'username': user.get('username'),
+            'first_name': user.get('first_name'),
+            'last_seen': user.get('last_seen') or '',
+            'message_count': user.get('message_count', 0),
+            'favorites': favorites,
+        }
+    
+    @staticmethod
+    def _remove_entry(index: List[Tuple[Any, int]], entry: Tuple[Any, int]) -> None:
+        """Удаление пары из отсортированного индекса"""
+        position = bisect_left(index, entry)
+        if position < len(index) and index[position] == entry:
+            del index[position]
+    
+    def _set_field(self, user_id: int, field: str, value: Any) -> None:
+        """Обновление поля записи с перестановкой в индексе"""
+        record = self.records[user_id]
+        old_entry = (record[field], user_id)
+        self._remove_entry(self.indexes[field], old_entry)
+        insort(self.indexes[field], (value, user_id))
+        if user_id in self.active and field in self.active_indexes:
+            self._remove_entry(self.active_indexes[field], old_entry)
+            insort(self.active_indexes[field], (value, user_id))
+        record[field] = value
+    
+    def _add_record(self, user_id: int, record: Dict[str, Any]) -> None:
+        """Добавление новой записи во все индексы"""
+        self.records[user_id] = record
+        for field in SORT_FIELDS.values():
+            insort(self.indexes[field], (record[field], user_id))
+        self._mark_active(user_id)
+    
+    def _mark_active(self, user_id: int) -> None:
+        """Добавление пользователя в индексы активных, если он стал активным"""
+        record = self.records[user_id]
+        if user_id in self.active or record['last_seen'] < self.active_cutoff:
+            return
+        self.active.add(user_id)
+        for field, index in self.active_indexes.items():
+            insort(index, (record[field], user_id))
+    
+    def _refresh_active(self) -> None:
+        """
+        Сдвиг границы активности: пользователи, чей last_seen оказался между
+        старой и новой границей, удаляются из индексов активных
+        """
+        cutoff = self._active_cutoff()
+        if cutoff <= self.active_cutoff:
+            return
+        
+        last_seen_index = self.indexes['last_seen']
+        start = bisect_left(last_seen_index, (self.active_cutoff, 0))
+        end = bisect_left(last_seen_index, (cutoff, 0))
+        for _, user_id in last_seen_index[start:end]:
+            if user_id in self.active:
+                self.active.discard(user_id)
+                record = self.records[user_id]
+                for field, index in self.active_indexes.items():
+                    self._remove_entry(index, (record[field], user_id))
+        self.active_cutoff = cutoff
+    
+    def on_user_seen(self, user_id: int, user: Dict[str, Any]) -> None:
+        """
+        Обновление индексов после регистрации или активности пользователя
+        
+        Args:
+            user_id: ID пользователя
+            user: Актуальные данные пользователя из users.json
+        """
+        if not self.loaded:
+            return
+        
+        if user_id not in self.records:
+            self._add_record(user_id, self._make_record(user, 0))
+            return
+        
+        record = self.records[user_id]
+        record['username'] = user.get('username')
+        record['first_name'] = user.get('first_name')
+        self._set_field(user_id, 'last_seen', user.get('last_seen') or '')
+        self._set_field(user_id, 'message_count', user.get('message_count', 0))
+        self._mark_active(user_id)
+    
+    def on_favorites_changed(self, user_id: int, count: int) -> None:
+        """
+        Обновление индекса избранных после изменения избранного пользователя
+        
+        Args:
+            user_id: ID пользователя
+            count: Новое количество избранных цитат
+        """
+        if not self.loaded:
+            return
+        
+        if user_id not in self.records:
+            self._add_record(user_id, self._make_record({}, count))
+        else:
+            self._set_field(user_id, 'favorites', count)
+    
+    def get_favorites_count(self, user_id: int) -> int:
+        """
+        Количество избранных цитат пользователя из памяти
+        
+        Args:
+            user_id: ID пользователя
+        
+        Returns:
+            int: Количество избранных цитат
+        """
+        self._ensure_loaded()
+        record = self.records.get(user_id)
+        return record['favorites'] if record else 0
+    
+    def _active_cutoff(self) -> str:
+        """Минимальное значение last_seen активного пользователя"""
+        return (datetime.now() - timedelta(days=ACTIVE_DAYS)).isoformat()
+    
+    def get_page(
+        self,
+        sort: str = 'fav',
+        user_filter: str = 'all',
+        page: int = 0,
+        per_page: int = ADMIN_USERS_PAGE_SIZE,
+        banned_ids: Optional[Set[int]] = None
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """
+        Получение страницы пользователей
+        
+        Args:
+            sort: Ключ сортировки ('fav', 'seen', 'msg')
+            user_filter: Фильтр ('all', 'active', 'banned')
+            page: Номер страницы (начиная с 0)
+            per_page: Пользователей на странице
+            banned_ids: Множество заблокированных пользователей
+        
+        Returns:
+            Tuple[List[Tuple[int, Dict]], int]: Пользователи страницы и общее количество
+        """
+        self._ensure_loaded()
+        field = SORT_FIELDS.get(sort, SORT_FIELDS['fav'])
+        index = self.indexes[field]
+        banned_ids = banned_ids or set()
+        start = page * per_page
+        
+        if user_filter == 'banned':
+            # Заблокированных немного, сортируем их отдельно
+            empty = self._make_record({}, 0)
+            banned = sorted(
+                banned_ids,
+                key=lambda user_id: (self.records.get(user_id, empty)[field], user_id),
+                reverse=True
+            )
+            total = len(banned)
+            user_ids = banned[start:start + per_page]
+        elif user_filter == 'active':
+            self._refresh_active()
+            total = len(self.active)
+            if field == 'last_seen':
+                # Активные пользователи - это хвост индекса по last_seen
+                end = len(index) - start
+                lower = max(end - per_page, len(index) - total)
+                user_ids = [user_id for _, user_id in reversed(index[lower:max(end, lower)])]
+            else:
+                active_index = self.active_indexes[field]
+                end = total - start
+                user_ids = [user_id for _, user_id in reversed(active_index[max(end - per_page, 0):max(end, 0)])]
+        else:
+            total = len(index)
+            end = total - start
+            user_ids = [user_id for _, user_id in reversed(index[max(end - per_page, 0):max(end, 0)])]
+        
+        return [(user_id, self.records.get(user_id) or self._make_record({}, 0)) for user_id in user_ids], total
+    
+    def reset(self) -> None:
+        """Сбрасывает индексы, следующий запрос перестроит их из хранилища"""
+        self.loaded = False
+
+
+# Глобальный экземпляр индексов
+user_index = UserIndex()
+
+
+def get_users_page(
+    sort: str = 'fav',
+    user_filter: str = 'all',
+    page: int = 0,
+    per_page: int = ADMIN_USERS_PAGE_SIZE,
+    banned_ids: Optional[Set[int]] = None
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+    """
+    Получение страницы пользователей для админ-панели
+    
+    Args:
+        sort: Ключ сортировки ('fav', 'seen', 'msg')
+        user_filter: Фильтр ('all', 'active', 'banned')
+        page: Номер страницы (начиная с 0)
+        per_page: Пользователей на странице
+        banned_ids: Множество заблокированных пользователей
+    
+    Returns:
+        Tuple[List[Tuple[int, Dict]], int]: Пользователи страницы и общее количество
+    """
+    return user_index.get_page(sort, user_filter, page, per_page, banned_ids)
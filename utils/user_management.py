@@ -1,11 +1,19 @@
 """
 Управление пользователями и системой банов
 """
+import asyncio
+import heapq
 import json
 import logging
 import os
+import tempfile
+import time
 from datetime import datetime
-from typing import Dict, List, Set, Optional
+from typing import Dict, Iterable, List, Set, Optional, Tuple
+
+from utils.stats import stats_tracker
+from utils.user_index import user_index
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -13,15 +21,40 @@ logger = logging.getLogger(__name__)
 USERS_FILE = "storage/users.json"
 BANNED_FILE = "storage/banned.json"
 
+# Пользователи в памяти: файл читается один раз, изменения сбрасываются на диск периодически
+_users_cache: Optional[Dict[str, dict]] = None
+_users_dirty = False
+USERS_FLUSH_INTERVAL = 30.0  # Как часто сохранять изменения пользователей на диск (сек)
+
+# Кэш заблокированных пользователей в памяти
+_banned_cache: Optional[Set[int]] = None
+_banned_mtime: Optional[float] = None
+_banned_checked_at = 0.0
+BANNED_RECHECK_INTERVAL = 5.0  # Как часто проверять mtime файла банов (сек)
+
+# Временные баны: ID пользователя -> unix time окончания, и min-куча (время, ID)
+_ban_expiries: Dict[int, float] = {}
+_expiry_heap: List[Tuple[float, int]] = []
+_ban_schedule_changed: Optional[asyncio.Event] = None  # Создается планировщиком в работающем event loop
+BAN_SCHEDULER_MAX_SLEEP = 60.0  # Максимальный интервал проверки истекших банов (сек)
+BAN_SAVE_RETRY_DELAY = 5.0  # Пауза перед повтором снятия банов, если файл не сохранился (сек)
+
+
+def _notify_ban_scheduler():
+    """Будит планировщик снятия банов, если он запущен"""
+    if _ban_schedule_changed is not None:
+        _ban_schedule_changed.set()
+
 
 def ensure_storage_dir():
     """Создает директорию storage если её нет"""
     os.makedirs("storage", exist_ok=True)
 
 
-def load_users() -> Dict[str, dict]:
+@traced("storage.load_users")
+def _read_users_file() -> Dict[str, dict]:
     """
-    Загружает данные о пользователях из users.json
+    Читает данные о пользователях из users.json
     
     Returns:
         Dict[str, dict]: Словарь с данными пользователей
@@ -42,40 +75,138 @@ def load_users() -> Dict[str, dict]:
         return {}
 
 
-def save_users(users_data: Dict[str, dict]):
+def load_users() -> Dict[str, dict]:
     """
-    Сохраняет данные о пользователях в users.json
+    Загружает данные о пользователях
+    
+    Файл users.json читается только при первом обращении, дальше данные
+    берутся из памяти. Возвращаемый словарь не копируется - не изменяйте его.
+    
+    Returns:
+        Dict[str, dict]: Словарь с данными пользователей
+    """
+    global _users_cache
+    if _users_cache is None:
+        _users_cache = _read_users_file()
+    return _users_cache
+
+
+@traced("storage.save_users")
+def _write_users_file(users_data: Dict[str, dict]) -> bool:
+    """
+    Атомарно записывает данные о пользователях в users.json
+    
+    Данные пишутся в уникальный временный файл рядом с users.json, который
+    затем заменяет его, поэтому при сбое во время записи остается
+    предыдущая версия файла, а одновременные записи не смешиваются.
     
     Args:
         users_data: Словарь с данными пользователей
+    
+    Returns:
+        bool: True если файл сохранен
     """
     ensure_storage_dir()
     
+    tmp_path = None
     try:
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(USERS_FILE)}.", suffix=".tmp", dir=os.path.dirname(USERS_FILE)
+        )
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
             json.dump(users_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, USERS_FILE)
         logger.info(f"Saved {len(users_data)} users to storage")
+        return True
     except Exception as e:
         logger.error(f"Error saving users: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
 
 
-def register_user(user_id: int, username: str = None, first_name: str = None, last_name: str = None):
+def save_users(users_data: Dict[str, dict]):
+    """
+    Сохраняет данные о пользователях в users.json
+    
+    Args:
+        users_data: Словарь с данными пользователей
+    """
+    global _users_dirty
+    _users_dirty = False
+    if not _write_users_file(users_data):
+        _users_dirty = True
+
+
+def flush_users():
+    """Сохраняет несохраненные изменения пользователей на диск"""
+    if _users_cache is not None and _users_dirty:
+        save_users(_users_cache)
+
+
+async def flush_users_async():
+    """
+    Сохраняет несохраненные изменения пользователей в отдельном потоке
+    
+    Копия записей снимается в event loop, а сериализация и запись
+    выполняются в потоке, поэтому обработка событий не блокируется.
+    """
+    global _users_dirty
+    if _users_cache is None or not _users_dirty:
+        return
+    
+    _users_dirty = False
+    snapshot = {user_id: dict(user) for user_id, user in _users_cache.items()}
+    if not await asyncio.to_thread(_write_users_file, snapshot):
+        _users_dirty = True
+
+
+async def users_flush_scheduler(interval: float = USERS_FLUSH_INTERVAL) -> None:
+    """
+    Фоновая задача, периодически сохраняющая изменения пользователей
+    
+    Args:
+        interval: Период сохранения (сек)
+    """
+    logger.info("Users flush scheduler started")
+    
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            await flush_users_async()
+        except asyncio.CancelledError:
+            logger.info("Users flush scheduler stopped")
+            raise
+        except Exception as e:
+            logger.error(f"Error in users flush scheduler: {e}")
+
+
+def register_user(user_id: int, username: str = None, first_name: str = None, last_name: str = None,
+                  language: Optional[str] = None):
     """
     Регистрирует нового пользователя или обновляет существующего
     
+    Данные обновляются только в памяти, на диск их сохраняет фоновая
+    задача users_flush_scheduler раз в USERS_FLUSH_INTERVAL секунд.
+    
     Args:
         user_id: ID пользователя
         username: Имя пользователя
         first_name: Имя
         last_name: Фамилия
+        language: Язык из настроек Telegram - сохраняется, только если язык еще не выбран
     """
+    global _users_dirty
     users = load_users()
     user_id_str = str(user_id)
     
     current_time = datetime.now().isoformat()
+    previous = users.get(user_id_str)
+    previous = dict(previous) if previous is not None else None
     
     # Если пользователь новый
-    if user_id_str not in users:
+    is_new = user_id_str not in users
+    if is_new:
         users[user_id_str] = {
             "user_id": user_id,
             "username": username,
@@ -86,6 +217,8 @@ def register_user(user_id: int, username: str = None, first_name: str = None, la
             "message_count": 1,
             "is_active": True
         }
+        if language:
+            users[user_id_str]["language"] = language
         logger.info(f"Registered new user: {user_id} (@{username})")
     else:
         # Обновляем данные существующего пользователя
@@ -97,40 +230,64 @@ def register_user(user_id: int, username: str = None, first_name: str = None, la
             "message_count": users[user_id_str].get("message_count", 0) + 1,
             "is_active": True
         })
+        if language and not users[user_id_str].get("language"):
+            users[user_id_str]["language"] = language
     
-    save_users(users)
+    _users_dirty = True
+    stats_tracker.on_user_seen(previous, current_time)
+    user_index.on_user_seen(user_id, users[user_id_str])
 
 
-def get_user_stats() -> Dict[str, int]:
+def get_saved_language(user_id: int) -> Optional[str]:
     """
-    Получает статистику пользователей
+    Получает сохраненный язык пользователя
+    
+    Args:
+        user_id: ID пользователя
     
     Returns:
-        Dict[str, int]: Статистика пользователей
+        Optional[str]: Код языка или None если язык не сохранен
     """
-    users = load_users()
+    user = load_users().get(str(user_id))
+    return user.get("language") if user else None
+
+
+def save_user_language(user_id: int, language: str) -> bool:
+    """
+    Сохраняет язык пользователя в реестре
     
-    total_users = len(users)
-    active_users = sum(1 for user in users.values() if user.get("is_active", True))
+    Изменение сразу видно в памяти, а в users.json его записывает
+    задача users_flush_scheduler, как и изменения register_user.
+    
+    Args:
+        user_id: ID пользователя
+        language: Код языка
     
-    # Подсчитываем пользователей за последний месяц
-    from datetime import datetime, timedelta
-    one_month_ago = datetime.now() - timedelta(days=30)
+    Returns:
+        bool: True если язык записан, False если пользователь не зарегистрирован
+    """
+    global _users_dirty
+    users = load_users()
+    user = users.get(str(user_id))
+    if user is None:
+        return False
     
-    recent_users = 0
-    for user in users.values():
-        try:
-            last_seen = datetime.fromisoformat(user.get("last_seen", ""))
-            if last_seen > one_month_ago:
-                recent_users += 1
-        except:
-            continue
+    user["language"] = language
+    _users_dirty = True
+    return True
+
+
+def get_user_stats() -> Dict[str, int]:
+    """
+    Получает статистику пользователей
     
-    return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "recent_users": recent_users
-    }
+    Счетчики поддерживаются инкрементально (см. utils.stats), поэтому
+    вызов не читает users.json, кроме самой первой инициализации.
+    
+    Returns:
+        Dict[str, int]: Статистика пользователей
+    """
+    return stats_tracker.get_user_stats()
 
 
 def get_all_user_ids() -> List[int]:
@@ -144,12 +301,22 @@ def get_all_user_ids() -> List[int]:
     return [int(user_id) for user_id in users.keys()]
 
 
-def load_banned_users() -> Set[int]:
+def _get_banned_mtime() -> Optional[float]:
+    """Возвращает время изменения файла банов или None если файла нет"""
+    try:
+        return os.path.getmtime(BANNED_FILE)
+    except OSError:
+        return None
+
+
+@traced("storage.load_banned")
+def _read_banned_file() -> Tuple[Set[int], Dict[int, float]]:
     """
-    Загружает список заблокированных пользователей
+    Читает файл банов
     
     Returns:
-        Set[int]: Множество ID заблокированных пользователей
+        Tuple[Set[int], Dict[int, float]]: Заблокированные пользователи
+            и время окончания временных банов (unix time)
     """
     ensure_storage_dir()
     
@@ -158,58 +325,149 @@ def load_banned_users() -> Set[int]:
             with open(BANNED_FILE, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 banned_ids = set(data.get("banned_users", []))
+                expiries = {
+                    int(user_id): float(expires_at)
+                    for user_id, expires_at in data.get("ban_expiries", {}).items()
+                    if int(user_id) in banned_ids
+                }
                 logger.info(f"Loaded {len(banned_ids)} banned users from storage")
-                return banned_ids
+                return banned_ids, expiries
         else:
             logger.info("Banned users file not found, creating empty set")
-            return set()
+            return set(), {}
     except Exception as e:
         logger.error(f"Error loading banned users: {e}")
-        return set()
+        return set(), {}
+
+
+def load_banned_users() -> Set[int]:
+    """
+    Загружает список заблокированных пользователей
+    
+    Returns:
+        Set[int]: Множество ID заблокированных пользователей
+    """
+    banned_ids, _ = _read_banned_file()
+    return banned_ids
 
 
-def save_banned_users(banned_users: Set[int]):
+@traced("storage.save_banned")
+def save_banned_users(banned_users: Set[int], ban_expiries: Optional[Dict[int, float]] = None):
     """
     Сохраняет список заблокированных пользователей
     
+    Запись атомарная: данные пишутся во временный файл, который затем
+    заменяет banned.json, поэтому файл никогда не бывает записан наполовину.
+    
     Args:
         banned_users: Множество ID заблокированных пользователей
+        ban_expiries: Время окончания временных банов (по умолчанию - из кэша)
+    
+    Returns:
+        bool: True если файл сохранен
     """
+    global _banned_mtime
     ensure_storage_dir()
     
+    if ban_expiries is None:
+        ban_expiries = _ban_expiries
+    
     try:
         data = {
             "banned_users": list(banned_users),
+            "ban_expiries": {
+                str(user_id): expires_at
+                for user_id, expires_at in ban_expiries.items()
+                if user_id in banned_users
+            },
             "last_updated": datetime.now().isoformat()
         }
         
-        with open(BANNED_FILE, 'w', encoding='utf-8') as f:
+        tmp_path = f"{BANNED_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, BANNED_FILE)
         
+        # Запоминаем mtime собственной записи, чтобы не перечитывать файл
+        _banned_mtime = _get_banned_mtime()
         logger.info(f"Saved {len(banned_users)} banned users to storage")
+        return True
     except Exception as e:
         logger.error(f"Error saving banned users: {e}")
+        return False
+
+
+def _get_banned_set() -> Set[int]:
+    """
+    Возвращает множество заблокированных пользователей из памяти
+    
+    Файл читается только при первом обращении и при изменении его mtime
+    (например, при ручном редактировании). Сам mtime проверяется не чаще
+    одного раза в BANNED_RECHECK_INTERVAL секунд.
+    
+    Returns:
+        Set[int]: Множество ID заблокированных пользователей (не копия)
+    """
+    global _banned_cache, _banned_mtime, _banned_checked_at, _ban_expiries, _expiry_heap
+    
+    now = time.monotonic()
+    if _banned_cache is not None and now - _banned_checked_at < BANNED_RECHECK_INTERVAL:
+        return _banned_cache
+    
+    _banned_checked_at = now
+    mtime = _get_banned_mtime()
+    if _banned_cache is None or mtime != _banned_mtime:
+        _banned_cache, _ban_expiries = _read_banned_file()
+        _banned_mtime = mtime
+        _expiry_heap = [(expires_at, user_id) for user_id, expires_at in _ban_expiries.items()]
+        heapq.heapify(_expiry_heap)
+        _notify_ban_scheduler()
+    
+    return _banned_cache
+
+
+def invalidate_banned_cache():
+    """Сбрасывает кэш банов, следующий запрос перечитает файл"""
+    global _banned_cache, _banned_mtime
+    _banned_cache = None
+    _banned_mtime = None
 
 
-def ban_user(user_id: int) -> bool:
+def ban_user(user_id: int, duration: Optional[float] = None) -> bool:
     """
     Блокирует пользователя
     
     Args:
         user_id: ID пользователя для блокировки
+        duration: Длительность блокировки в секундах (None - навсегда)
         
     Returns:
         bool: True если пользователь заблокирован, False если уже был заблокирован
+            или файл банов не удалось сохранить
     """
-    banned_users = load_banned_users()
+    banned_users = _get_banned_set()
     
     if user_id in banned_users:
         return False  # Уже заблокирован
     
+    # Кэш меняется только после успешной записи файла
+    expires_at = time.time() + duration if duration else None
+    ban_expiries = dict(_ban_expiries)
+    if expires_at is not None:
+        ban_expiries[user_id] = expires_at
+    if not save_banned_users(banned_users | {user_id}, ban_expiries):
+        return False
+    
     banned_users.add(user_id)
-    save_banned_users(banned_users)
+    if expires_at is not None:
+        _ban_expiries[user_id] = expires_at
+        heapq.heappush(_expiry_heap, (expires_at, user_id))
+        _notify_ban_scheduler()
     
-    logger.info(f"User {user_id} has been banned")
+    if duration:
+        logger.info(f"User {user_id} has been banned for {int(duration)} seconds")
+    else:
+        logger.info(f"User {user_id} has been banned")
     return True
 
 
@@ -222,19 +480,137 @@ def unban_user(user_id: int) -> bool:
         
     Returns:
         bool: True если пользователь разблокирован, False если не был заблокирован
+            или файл банов не удалось сохранить
     """
-    banned_users = load_banned_users()
+    banned_users = _get_banned_set()
     
     if user_id not in banned_users:
         return False  # Не был заблокирован
     
+    if not save_banned_users(banned_users - {user_id}):
+        return False
+    
     banned_users.remove(user_id)
-    save_banned_users(banned_users)
+    # Запись в куче остается и будет пропущена при извлечении
+    _ban_expiries.pop(user_id, None)
     
     logger.info(f"User {user_id} has been unbanned")
     return True
 
 
+def get_ban_expiry(user_id: int) -> Optional[float]:
+    """
+    Получает время окончания блокировки пользователя
+    
+    Args:
+        user_id: ID пользователя
+    
+    Returns:
+        Optional[float]: Unix time окончания бана или None для постоянного бана
+    """
+    _get_banned_set()
+    return _ban_expiries.get(user_id)
+
+
+def get_next_ban_expiry() -> Optional[float]:
+    """
+    Получает ближайшее время окончания временного бана
+    
+    Returns:
+        Optional[float]: Unix time ближайшего окончания или None если временных банов нет
+    """
+    _get_banned_set()
+    
+    # Удаляем устаревшие записи (после разблокировки или повторного бана)
+    while _expiry_heap:
+        expires_at, user_id = _expiry_heap[0]
+        if _ban_expiries.get(user_id) == expires_at:
+            return expires_at
+        heapq.heappop(_expiry_heap)
+    return None
+
+
+def expire_bans(now: Optional[float] = None) -> List[int]:
+    """
+    Снимает истекшие временные баны
+    
+    Из кучи извлекаются только истекшие записи, поэтому стоимость
+    O(k log n) для k снятых банов, без просмотра всех банов. Кэш меняется
+    только после успешной записи файла; при ошибке записи возвращаются
+    в кучу и будут сняты при следующей попытке.
+    
+    Args:
+        now: Текущее время (unix time), по умолчанию time.time()
+    
+    Returns:
+        List[int]: ID разблокированных пользователей (пустой, если файл не сохранен)
+    """
+    banned_users = _get_banned_set()
+    now = time.time() if now is None else now
+    entries = []
+    
+    while _expiry_heap and _expiry_heap[0][0] <= now:
+        expires_at, user_id = heapq.heappop(_expiry_heap)
+        if _ban_expiries.get(user_id) != expires_at:
+            continue  # Устаревшая запись
+        entries.append((expires_at, user_id))
+    
+    if not entries:
+        return []
+    
+    expired = [user_id for _, user_id in entries]
+    if not save_banned_users(banned_users - set(expired)):
+        for entry in entries:
+            heapq.heappush(_expiry_heap, entry)
+        logger.warning(f"Failed to save expired bans, will retry for users: {expired}")
+        return []
+    
+    for user_id in expired:
+        del _ban_expiries[user_id]
+        banned_users.discard(user_id)
+    logger.info(f"Temporary bans expired for users: {expired}")
+    return expired
+
+
+async def ban_expiry_scheduler(max_sleep: float = BAN_SCHEDULER_MAX_SLEEP) -> None:
+    """
+    Фоновая задача, снимающая временные баны по истечении срока
+    
+    Спит до ближайшего окончания бана из кучи; новый бан будит задачу
+    через событие, чтобы более ранний срок не был пропущен.
+    
+    Args:
+        max_sleep: Максимальное время сна между проверками (сек)
+    """
+    global _ban_schedule_changed
+    _ban_schedule_changed = asyncio.Event()
+    logger.info("Ban expiry scheduler started")
+    
+    while True:
+        try:
+            expire_bans()
+            next_expiry = get_next_ban_expiry()
+            if next_expiry is None:
+                timeout = max_sleep
+            elif next_expiry <= time.time():
+                # Истекшие баны остались в куче - файл не сохранился, повторяем позже
+                timeout = min(BAN_SAVE_RETRY_DELAY, max_sleep)
+            else:
+                timeout = min(next_expiry - time.time(), max_sleep)
+            
+            _ban_schedule_changed.clear()
+            try:
+                await asyncio.wait_for(_ban_schedule_changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        except asyncio.CancelledError:
+            logger.info("Ban expiry scheduler stopped")
+            raise
+        except Exception as e:
+            logger.error(f"Error in ban expiry scheduler: {e}")
+            await asyncio.sleep(max_sleep)
+
+
 def is_user_banned(user_id: int) -> bool:
     """
     Проверяет, заблокирован ли пользователь
@@ -245,8 +621,25 @@ def is_user_banned(user_id: int) -> bool:
     Returns:
         bool: True если заблокирован
     """
-    banned_users = load_banned_users()
-    return user_id in banned_users
+    if user_id not in _get_banned_set():
+        return False
+    
+    # Истекший бан не действует, даже если планировщик еще не успел его снять
+    expires_at = _ban_expiries.get(user_id)
+    return expires_at is None or expires_at > time.time()
+
+
+def are_users_banned(user_ids: Iterable[int]) -> Dict[int, bool]:
+    """
+    Проверяет статус блокировки сразу для нескольких пользователей
+    
+    Args:
+        user_ids: ID пользователей
+        
+    Returns:
+        Dict[int, bool]: Словарь {ID пользователя: заблокирован ли}
+    """
+    return {user_id: is_user_banned(user_id) for user_id in user_ids}
 
 
 def get_banned_users_list() -> List[int]:
@@ -256,8 +649,17 @@ def get_banned_users_list() -> List[int]:
     Returns:
         List[int]: Список ID заблокированных пользователей
     """
-    banned_users = load_banned_users()
-    return list(banned_users)
+    return list(_get_banned_set())
+
+
+def get_banned_users_count() -> int:
+    """
+    Получает количество заблокированных пользователей без копирования списка
+    
+    Returns:
+        int: Количество заблокированных пользователей
+    """
+    return len(_get_banned_set())
 
 
 def get_user_info(user_id: int) -> Optional[dict]:
@@ -272,3 +674,17 @@ def get_user_info(user_id: int) -> Optional[dict]:
     """
     users = load_users()
     return users.get(str(user_id))
+
+
+def get_users_info(user_ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+    """
+    Получает информацию сразу о нескольких пользователях за одно чтение users.json
+    
+    Args:
+        user_ids: ID пользователей
+        
+    Returns:
+        Dict[int, Optional[dict]]: Словарь {ID пользователя: информация или None}
+    """
+    users = load_users()
+    return {user_id: users.get(str(user_id)) for user_id in user_ids}
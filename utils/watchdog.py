@@ -0,0 +1,179 @@
+"""
+Контроль задержки event loop и поиск блокирующих вызовов
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from utils.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = 0.5  # Период замера задержки (сек)
+LOOP_LAG_WINDOW = 7200  # Сколько последних замеров хранить для перцентилей (~1 час)
+LOOP_STACK_LIMIT = 30  # Максимальная глубина сохраняемого стека
+
+# Каталог проекта: по нему в стеке ищется функция бота, вызвавшая блокировку
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+
+class EventLoopWatchdog:
+    """
+    Измерение задержки event loop и захват стека при его блокировке
+
+    Задача в event loop обновляет heartbeat и измеряет, насколько позже
+    запланированного она просыпается. Отдельный поток проверяет heartbeat:
+    если loop не отвечает дольше порога, поток снимает стек потока event loop
+    (sys._current_frames) - это и есть стек блокирующего вызова - и логирует его
+    вместе с именем обработчика. Каждая блокировка логируется один раз.
+    """
+
+    def __init__(self, threshold: float, interval: float = LOOP_LAG_INTERVAL, window: int = LOOP_LAG_WINDOW):
+        """
+        Args:
+            threshold: Задержка, после которой снимается стек (сек)
+            interval: Период замера задержки (сек)
+            window: Количество последних замеров для перцентилей
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.lags: Deque[float] = deque(maxlen=window)
+        self.stalls = 0
+        self.heartbeat = time.perf_counter()
+        self.loop_thread_id: Optional[int] = None
+        self._reported_heartbeat: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    async def run(self) -> None:
+        """Фоновая задача замера задержки (запускается в event loop бота)"""
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started (threshold {self.threshold * 1000:.0f} ms)")
+
+        try:
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(self.interval)
+                now = time.perf_counter()
+                lag = max(now - started - self.interval, 0.0)
+                self.heartbeat = now
+                self.lags.append(lag)
+                EVENT_LOOP_LAG.observe(lag)
+        except asyncio.CancelledError:
+            logger.info("Event loop watchdog stopped")
+            raise
+        finally:
+            self._stop.set()
+
+    def _watch(self) -> None:
+        """Поток, проверяющий heartbeat event loop"""
+        check_interval = max(self.threshold / 2, 0.01)
+        while not self._stop.wait(check_interval):
+            heartbeat = self.heartbeat
+            stalled_for = time.perf_counter() - heartbeat - self.interval
+            if stalled_for >= self.threshold and heartbeat != self._reported_heartbeat:
+                self._reported_heartbeat = heartbeat
+                try:
+                    self._report_stall(stalled_for)
+                except Exception as e:
+                    logger.error(f"Error capturing event loop stack: {e}")
+
+    def _report_stall(self, stalled_for: float) -> None:
+        """Захват и логирование стека заблокированного event loop"""
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+
+        stack = traceback.extract_stack(frame, limit=LOOP_STACK_LIMIT)
+        self.stalls += 1
+        EVENT_LOOP_STALLS_TOTAL.inc()
+        logger.warning(
+            "Event loop blocked for over %.0f ms in %s, stack:\n%s",
+            stalled_for * 1000,
+            self._find_handler(stack),
+            "".join(traceback.format_list(stack)).rstrip()
+        )
+
+    @staticmethod
+    def _find_handler(stack: traceback.StackSummary) -> str:
+        """
+        Обработчик, в котором произошла блокировка
+
+        Ищется внешний кадр из routers/, иначе - самый внутренний кадр кода бота
+        (middleware, utils). Кадр bot.py (asyncio.run) пропускается.
+        """
+        project_frames = [
+            frame for frame in stack
+            if frame.filename.startswith(_PROJECT_DIR) and os.path.basename(frame.filename) != "bot.py"
+        ]
+        for frame in project_frames:
+            if frame.filename.startswith(os.path.join(_PROJECT_DIR, "routers")):
+                break
+        else:
+            if not project_frames:
+                return "unknown"
+            frame = project_frames[-1]
+        return f"{os.path.relpath(frame.filename, _PROJECT_DIR)}:{frame.lineno} ({frame.name})"
+
+    def get_percentiles(self) -> Dict[str, float]:
+        """
+        Перцентили задержки event loop за окно замеров
+
+        Returns:
+            Dict[str, float]: p50, p95, p99 и max в миллисекундах, количество блокировок
+        """
+        lags = sorted(self.lags)
+        if not lags:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "stalls": self.stalls}
+
+        def percentile(q: float) -> float:
+            return lags[min(int(q * len(lags)), len(lags) - 1)] * 1000
+
+        return {
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": lags[-1] * 1000,
+            "stalls": self.stalls,
+        }
+
+
+# Глобальный экземпляр (создается при запуске бота)
+loop_watchdog: Optional[EventLoopWatchdog] = None
+
+
+def start_loop_watchdog(threshold: float) -> asyncio.Task:
+    """
+    Запуск контроля задержки event loop
+
+    Args:
+        threshold: Задержка, после которой снимается стек (сек)
+
+    Returns:
+        asyncio.Task: Фоновая задача (остановка - task.cancel())
+    """
+    global loop_watchdog
+    loop_watchdog = EventLoopWatchdog(threshold)
+    return asyncio.create_task(loop_watchdog.run())
+
+
+def get_loop_lag_stats() -> Optional[Dict[str, float]]:
+    """
+    Перцентили задержки event loop
+
+    Returns:
+        Optional[Dict[str, float]]: Статистика или None, если контроль не запущен
+    """
+    if loop_watchdog is None:
+        return None
+    return loop_watchdog.get_percentiles()